@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+'''
+Benchmarks FifoSimulator over a matrix of payload sizes, quantum sizes, bandwidth ratios
+and engines. Each case records its throughput (datums and operations per second) and its
+peak traced memory, and the results are compared against a stored JSON baseline.
+'''
+
+import os
+import sys
+import json
+import math
+import time
+import platform
+import itertools
+import tracemalloc
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fifo_pkg.WinWrap       import WinWrap
+from fifo_pkg.FifoSimulator import FifoSimulator
+from fifo_pkg.SimConfig     import SimConfig
+from fifo_pkg.SweepRunner   import parse_values
+from fifo_pkg.CLargs        import proc_bench_cla
+
+VERSION = 1
+
+# Engines which are driven by the quantum. The other engines run once per payload size and
+# bandwidth ratio
+QUANTUM_ENGINES = ('threaded','asyncio')
+
+# Largest exact analysis (payload size x depth) of a case
+MAX_EXACT_CELLS = 2000000
+
+def parse_quanta(spec:str)->list:
+    '''
+    Parses a comma separated list of quantum sizes, where 'auto' (or 0) selects the
+    auto quantum mode
+    '''
+    return [0 if q.strip() in ('auto','0') else int(q) for q in spec.split(',')]
+
+def parse_ratios(spec:str)->list:
+    '''
+    Parses a comma separated list of write:read bandwidth pairs (e.g. "90:100,110:100")
+    '''
+    ratios = []
+    for pair in spec.split(','):
+        fields = [int(x) for x in pair.split(':')]
+        assert len(fields) == 2, f"Bandwidth ratio '{pair}' must be writebw:readbw"
+        ratios.append(tuple(fields))
+    return ratios
+
+def case_sizing(plsize:int,writebw:int,readbw:int)->tuple:
+    '''
+    Returns an (initial level, depth) pair which lets a case run to completion with a
+    margin of several standard deviations of the level random walk
+    '''
+    margin = 6*math.ceil(math.sqrt(plsize)) + 16
+    drain  = math.ceil(plsize*max(0.0,1.0-writebw/readbw))
+    fill   = math.ceil(plsize*max(0.0,1.0-readbw/writebw))
+    initLevel = min(drain + margin,plsize-1)
+    return (initLevel,initLevel + fill + margin)
+
+def case_key(case:dict)->tuple:
+    return (case['engine'],case['plsize'],case['quantum'],case['writebw'],case['readbw'])
+
+def cases(engines:list,plsizes:list,quanta:list,ratios:list,maxEvents:int)->tuple:
+    '''
+    Returns the (runnable, skipped) cases of the benchmark matrix. Quantum driven engines
+    skip cases of more than maxEvents quanta, and the exact engine skips cases beyond
+    MAX_EXACT_CELLS
+    '''
+    runnable,skipped = [],[]
+    for engine,plsize,(writebw,readbw) in itertools.product(engines,plsizes,ratios):
+        initLevel,depth = case_sizing(plsize,writebw,readbw)
+        for quantum in (quanta if engine in QUANTUM_ENGINES else [1]):
+            case = {
+                'engine'    : engine,
+                'plsize'    : plsize,
+                'quantum'   : quantum if engine in QUANTUM_ENGINES else None,
+                'writebw'   : writebw,
+                'readbw'    : readbw,
+                'depth'     : depth,
+                'initlevel' : initLevel}
+            if quantum >= plsize:
+                skipped.append(case)
+            elif engine in QUANTUM_ENGINES:
+                steps = plsize/(max(1,plsize//1000) if quantum == 0 else quantum)
+                (runnable if steps <= maxEvents else skipped).append(case)
+            elif engine == 'exact':
+                (runnable if plsize*depth <= MAX_EXACT_CELLS else skipped).append(case)
+            else:
+                runnable.append(case)
+    return (runnable,skipped)
+
+def simulate_case(case:dict,seed:int):
+    '''
+    Runs one case (without a report) and returns the SimMetrics of the run
+    '''
+    config = SimConfig(
+        depth=case['depth'],
+        pl_size=case['plsize'],
+        writeBandwidth=case['writebw'],
+        readBandwidth=case['readbw'],
+        initLevel=case['initlevel'],
+        simQuantum=1 if case['quantum'] is None else case['quantum'],
+        engine=case['engine'],
+        seed=seed)
+    with FifoSimulator.from_config(config) as sim:
+        return sim.run().metrics
+
+def run_case(case:dict,seed:int,repeat:int=1,memory:bool=True)->dict:
+    '''
+    Benchmarks one case. Throughput is taken from the fastest of repeat runs. The peak
+    memory is measured with tracemalloc in a separate run, so that tracing does not
+    slow down the timed runs
+    '''
+    best = None
+    for _ in range(repeat):
+        metrics = simulate_case(case,seed)
+        if best is None or metrics.wallTime < best.wallTime:
+            best = metrics
+    peak = None
+    if memory:
+        tracemalloc.start()
+        simulate_case(case,seed)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    result = dict(case)
+    result.update({
+        'sim_quantum'    : best.quantum if case['engine'] in QUANTUM_ENGINES else None,
+        'wall_time'      : best.wallTime,
+        'cpu_time'       : best.cpuTime,
+        'datums_per_sec' : case['plsize']/max(best.wallTime,1e-9),
+        'ops_per_sec'    : best.opsPerSec if best.ops else None,
+        'kernel_events'  : best.kernelEvents,
+        'peak_mem_bytes' : peak})
+    return result
+
+def compare(results:list,baseline:dict,threshold:float)->list:
+    '''
+    Returns a description of each regression of results against a baseline: a drop in
+    throughput, or a rise in peak memory, of more than the threshold fraction
+    '''
+    reference   = {case_key(r):r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        base = reference.get(case_key(result))
+        if base is None:
+            continue
+        name = describe(result)
+        if result['datums_per_sec'] < base['datums_per_sec']*(1.0-threshold):
+            regressions.append(f"{name}: throughput {result['datums_per_sec']:.0f} datums/s "
+                               f"vs baseline {base['datums_per_sec']:.0f} datums/s")
+        if result['peak_mem_bytes'] is not None and base.get('peak_mem_bytes') is not None and \
+           result['peak_mem_bytes'] > base['peak_mem_bytes']*(1.0+threshold):
+            regressions.append(f"{name}: peak memory {result['peak_mem_bytes']} bytes "
+                               f"vs baseline {base['peak_mem_bytes']} bytes")
+    return regressions
+
+def describe(case:dict)->str:
+    if case['engine'] not in QUANTUM_ENGINES:
+        quantum = '-'
+    elif case['quantum'] == 0:
+        quantum = f"auto({case['sim_quantum']})" if case.get('sim_quantum') else 'auto'
+    else:
+        quantum = str(case['quantum'])
+    return f"{case['engine']:<10} plsize={case['plsize']:<9} quantum={quantum:<10} bw={case['writebw']}:{case['readbw']}"
+
+def main():
+
+    args = proc_bench_cla(iparser=None,descr='FIFO simulator engine and quantum benchmark')
+
+    runnable,skipped = cases(
+        engines=args.engines.split(','),
+        plsizes=parse_values(args.plsizes),
+        quanta=parse_quanta(args.quanta),
+        ratios=parse_ratios(args.ratios),
+        maxEvents=args.max_events)
+
+    print(f"Benchmarking {len(runnable)} cases ({len(skipped)} skipped, {args.repeat} timed runs each)...")
+    results = []
+    t0 = time.perf_counter()
+    for case in runnable:
+        result = run_case(case,seed=args.seed,repeat=args.repeat,memory=not args.no_memory)
+        results.append(result)
+        ops    = f"{result['ops_per_sec']:>12.0f}" if result['ops_per_sec'] else f"{'-':>12}"
+        peak   = f"{result['peak_mem_bytes']/2**20:>8.1f}MB" if result['peak_mem_bytes'] is not None else ''
+        print(f"{describe(result)} {result['datums_per_sec']:>12.0f} datums/s {ops} ops/s {peak}")
+
+    report = {
+        'version' : VERSION,
+        'python'  : platform.python_version(),
+        'machine' : platform.machine(),
+        'seed'    : args.seed,
+        'results' : results}
+    if args.output:
+        with open(args.output,'w') as f:
+            json.dump(report,f,indent=2)
+
+    print("\nBenchmark Summary:")
+    print("------------------")
+    print(f"Cases run              = {len(results)}")
+    print(f"Cases skipped          = {len(skipped)}")
+    print(f"Total time (seconds)   = {time.perf_counter()-t0:.1f}")
+
+    if args.save:
+        with open(args.baseline,'w') as f:
+            json.dump(report,f,indent=2)
+        print(f"Saved baseline         = {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results,baseline,args.threshold)
+        print(f"Baseline               = {args.baseline}")
+        print(f"Regressions            = {len(regressions)} (threshold {args.threshold:.0%})")
+        for regression in regressions:
+            print(f"  {regression}")
+        if regressions:
+            sys.exit(1)
+    else:
+        print(f"No baseline found at {args.baseline} (use --save to create it)")
+
+if __name__ == '__main__':
+    with WinWrap(main) as wmain:
+        wmain()
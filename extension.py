@@ -8,6 +8,9 @@ First, we extend the semantics of Fifo to create BetterFifo which is more robust
 and actually implements data-storage so push and pop methods are overriden.
 We then use a couple of BetterFifo objects to run through push and pop operations on two different types of data.
 
+BetterFifo keeps its data in a list for clarity. See fifo_pkg.RingFifo for a preallocated ring-buffer
+store which supports bulk pushes from arrays and zero-copy bulk pops.
+
 '''
 
 # Copyright 2021 Sebastian Ahmed
@@ -30,34 +33,33 @@ from fifo_pkg.WinWrap import WinWrap
 class BetterFifo(Fifo):
     '''
     Example extension of the Fifo class, adding the following:
-    - Override bwratio to handle ZeroDivisionError exception
     - Add a local data store
     - Override push() and pop() to support data
-    - Add bulk_pop() to perform an arbitrary numnber of pop() operations
+    - Add bulk_pops() to perform an arbitrary numnber of pops in a single pop_n() call
     '''
     def __init__(self,*args,**kwargs):
         super().__init__(*args,**kwargs)
 
         self._data = [] # This FiFo actually holds data of any type
 
-    @property
-    def bwratio(self)->float:
+    def bulk_pops(self,num_pops:int)->list:
         '''
-        Override property to handle case where nop-counts result in a zero-division exception
+        Class extension which adds the ability to do a bulk set of pops, and returns the
+        popped data
         '''
-        try:
-            return super().bwratio
-        except ZeroDivisionError:
-            return 0.0
-        except:
-            raise
-
-    def bulk_pops(self,num_pops:int):
+        popped_data = self._data[:min(num_pops,self.level)]
+        self.pop_n(num_pops)
+        return popped_data
+
+    def pop_n(self,count:int)->int:
         '''
-        Class extension which adds the ability to do a bulk set of pops 
+        Override:
+        Bulk pops also remove their data from the internal store
         '''
-        for _ in range(num_pops):
-            self.pop()
+        popped = super().pop_n(count)
+        print(f"Popped data = {self._data[:popped]}")
+        del self._data[:popped]
+        return popped
 
     def pop(self):
         '''
@@ -108,7 +110,7 @@ def doFifoStuff(fifo:BetterFifo,datagenfunc):
     assert fifo.level == 0, f"Expected to have zero entries, but got {fifo.level} instead"
     assert fifo.error == False, f"Got a FIFO error ({fifo.errorType})"
 
-    print(fifo) # Won't get a ZeroDivisionError exception
+    print(fifo) # No no-operations were done, so the W:R BW ratio is reported as inf
 
 def main():
     print(__doc__)
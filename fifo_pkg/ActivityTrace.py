@@ -0,0 +1,110 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import os
+import numpy as np
+
+class ActivityTrace(object):
+    '''
+    Per-cycle activity of a FIFO port (e.g. valid&ready of a producer, or ready of a
+    consumer) captured from an RTL simulation or silicon, read back from disk in chunks.
+    The file is memory-mapped, so only the chunk being replayed is resident and traces
+    larger than memory can be replayed.
+
+    Supported formats:
+    - bits  : packed bits, one bit per cycle (as written by np.packbits, MSB first unless
+              bitorder='little'). The trailing pad bits can be dropped with cycles=
+    - bytes : one byte per cycle, non-zero bytes are active cycles
+    - npy   : a one-dimensional NumPy .npy array, non-zero elements are active cycles
+    When fmt is None the format follows the file extension (.npy, .bits, and bytes for
+    any other extension).
+    '''
+
+    FORMATS = ('bits','bytes','npy')
+
+    def __init__(self,path:str,fmt:str=None,cycles:int=None,bitorder:str='big'):
+        if fmt is None:
+            ext = os.path.splitext(path)[1].lower()
+            fmt = 'npy' if ext == '.npy' else 'bits' if ext == '.bits' else 'bytes'
+        assert fmt in self.FORMATS, f"Unknown trace format '{fmt}', expected one of {self.FORMATS}"
+        self._path     = path
+        self._fmt      = fmt
+        self._bitorder = bitorder
+        if fmt == 'npy':
+            self._data = np.load(path,mmap_mode='r')
+            assert self._data.ndim == 1, f"{path} must hold a one-dimensional array"
+            length = self._data.size
+        elif os.path.getsize(path) == 0:
+            self._data = np.zeros(0,dtype=np.uint8) # Empty files can't be memory-mapped
+            length = 0
+        else:
+            self._data = np.memmap(path,dtype=np.uint8,mode='r')
+            length = self._data.size*8 if fmt == 'bits' else self._data.size
+        if cycles is not None:
+            assert 0 <= cycles <= length, f"{path} holds {length} cycles, {cycles} requested"
+            length = cycles
+        self._length = length
+        self._pos    = 0
+
+    @property
+    def path(self)->str:
+        return self._path
+
+    @property
+    def format(self)->str:
+        return self._fmt
+
+    @property
+    def length(self)->int:
+        return self._length
+
+    @property
+    def position(self)->int:
+        return self._pos
+
+    def read(self,count:int)->np.ndarray:
+        '''
+        Returns the activity of the next count cycles as a boolean array, which is shorter
+        than count at the end of the trace
+        '''
+        start = self._pos
+        stop  = min(self._length,start+count)
+        if self._fmt == 'bits':
+            packed = self._data[start//8:(stop+7)//8]
+            chunk  = np.unpackbits(packed,bitorder=self._bitorder)[start%8:start%8+stop-start].view(bool)
+        elif self._data.dtype == bool:
+            chunk  = np.array(self._data[start:stop])
+        else:
+            chunk  = self._data[start:stop] != 0
+        self._pos = stop
+        return chunk
+
+    def readPacked(self,count:int)->tuple:
+        '''
+        Returns the activity of the next count cycles packed 8 per byte (first cycle in the
+        MSB, and any unused bits of the last byte cleared) and the number of cycles read.
+        Byte aligned reads of an MSB first bits trace are copied without unpacking
+        '''
+        start = self._pos
+        if self._fmt == 'bits' and self._bitorder == 'big' and start % 8 == 0:
+            stop   = min(self._length,start+count)
+            packed = np.array(self._data[start//8:(stop+7)//8])
+            if (stop-start) % 8:
+                packed[-1] &= np.uint8((0xff << (8 - (stop-start) % 8)) & 0xff)
+            self._pos = stop
+            return (packed,stop-start)
+        chunk = self.read(count)
+        return (np.packbits(chunk),chunk.size)
+
+    def rewind(self):
+        self._pos = 0
+
+    def __str__(self):
+        return f"{self._path} ({self._fmt}, {self._length} cycles)"
@@ -0,0 +1,272 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import math
+import time
+from statistics import NormalDist
+import numpy as np
+
+from fifo_pkg.VectorEngine import VectorEngine
+
+class AdaptiveMonteCarlo(object):
+    '''
+    Estimates the overrun/underrun probability of a FIFO configuration to a requested
+    precision. Independent trials are simulated in rounds of VectorEngine batches (each
+    round with its own child seed), and the run stops as soon as the confidence interval
+    of the estimated probability is within relError of the estimate, or when the trial
+    or time budget runs out.
+
+    The first round has firstRound trials. Each next round is sized to the number of trials
+    which the current estimate predicts to be missing (z^2 (1-p) / (p relError^2) in
+    total), but at most doubles the trials so far, at most maxRound trials (which bounds
+    the memory of a batch) and within the remaining budget. The time budget is checked
+    before each round against the trial rate of the previous rounds.
+
+    The interval is either the Wilson score interval or the (conservative) Clopper-Pearson
+    interval. The event is 'overrun', 'underrun' or 'failure' (either of them).
+    '''
+
+    INTERVALS = ('wilson','clopper-pearson')
+    EVENTS    = ('overrun','underrun','failure')
+
+    def __init__(
+        self,
+        depth:int,
+        pl_size:int,
+        writeBandwidth:int,
+        readBandwidth:int,
+        initLevel:int,
+        relError:float=0.1,
+        confidence:float=0.95,
+        interval:str='wilson',
+        event:str='failure',
+        maxTrials:int=10000000,
+        maxTime:float=None,
+        firstRound:int=1000,
+        maxRound:int=1<<18,
+        seed=None,
+        chunkSteps:int=None):
+        assert relError > 0.0, f"Relative error ({relError}) must be positive"
+        assert 0.0 < confidence < 1.0, f"Confidence ({confidence}) must be in (0,1)"
+        assert interval in self.INTERVALS, f"Unknown interval '{interval}', expected one of {self.INTERVALS}"
+        assert event in self.EVENTS, f"Unknown event '{event}', expected one of {self.EVENTS}"
+        assert 0 < firstRound <= maxTrials, f"First round ({firstRound}) outside of (0,maxTrials={maxTrials}]"
+        self._depth      = depth
+        self._pl_size    = pl_size
+        self._wrate      = writeBandwidth
+        self._rrate      = readBandwidth
+        self._init_level = initLevel
+        self._relError   = relError
+        self._confidence = confidence
+        self._interval   = interval
+        self._event      = event
+        self._maxTrials  = maxTrials
+        self._maxTime    = maxTime
+        self._firstRound = firstRound
+        self._maxRound   = max(maxRound,firstRound)
+        self._seedSeq    = seed if isinstance(seed,np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self._chunkSteps = chunkSteps
+
+        self.trials        = 0
+        self.rounds        = 0
+        self.overrunCount  = 0
+        self.underrunCount = 0
+        self.ops           = 0   # Port operations and no-operations simulated
+        self.wallTime      = 0.0
+        self.stopReason    = ''  # 'precision', 'trials' or 'time'
+
+    @staticmethod
+    def wilson(count:int,trials:int,confidence:float=0.95)->tuple:
+        '''
+        Wilson score interval of a binomial proportion
+        '''
+        if trials == 0:
+            return (0.0,1.0)
+        z      = NormalDist().inv_cdf(0.5 + confidence/2)
+        p      = count/trials
+        denom  = 1.0 + z*z/trials
+        center = (p + z*z/(2*trials))/denom
+        half   = z*math.sqrt(p*(1.0-p)/trials + z*z/(4*trials*trials))/denom
+        return (max(0.0,center-half),min(1.0,center+half))
+
+    @staticmethod
+    def clopperPearson(count:int,trials:int,confidence:float=0.95)->tuple:
+        '''
+        Clopper-Pearson (exact) interval of a binomial proportion, from the quantiles of
+        the beta distribution
+        '''
+        if trials == 0:
+            return (0.0,1.0)
+        alpha = 1.0 - confidence
+        lo = 0.0 if count == 0 else _betaQuantile(count,trials-count+1,alpha/2)
+        hi = 1.0 if count == trials else _betaQuantile(count+1,trials-count,1.0-alpha/2)
+        return (lo,hi)
+
+    def count(self,event:str=None)->int:
+        event = self._event if event is None else event
+        if event == 'overrun':
+            return self.overrunCount
+        if event == 'underrun':
+            return self.underrunCount
+        return self.overrunCount + self.underrunCount
+
+    def probability(self,event:str=None)->float:
+        return self.count(event)/self.trials if self.trials else 0.0
+
+    def confidenceInterval(self,event:str=None)->tuple:
+        method = self.wilson if self._interval == 'wilson' else self.clopperPearson
+        return method(self.count(event),self.trials,self._confidence)
+
+    def relativeError(self,event:str=None)->float:
+        '''
+        Largest distance of the interval bounds to the estimate, relative to the estimate
+        (infinite while no event was observed)
+        '''
+        p = self.probability(event)
+        if p == 0.0:
+            return math.inf
+        lo,hi = self.confidenceInterval(event)
+        return max(hi-p,p-lo)/p
+
+    @property
+    def converged(self)->bool:
+        return self.relativeError() <= self._relError
+
+    @property
+    def trialsPerSec(self)->float:
+        return self.trials/max(self.wallTime,1e-9)
+
+    @property
+    def opsPerSec(self)->float:
+        return self.ops/max(self.wallTime,1e-9)
+
+    def nextRound(self)->int:
+        '''
+        Size of the next round (0 when the trial budget is spent)
+        '''
+        if self.trials == 0:
+            size = self._firstRound
+        else:
+            p    = self.probability()
+            size = self.trials # Doubling while no event was observed
+            if p > 0.0:
+                z      = NormalDist().inv_cdf(0.5 + self._confidence/2)
+                needed = math.ceil(z*z*(1.0-p)/(p*self._relError**2))
+                size   = min(size,max(needed - self.trials,self._firstRound))
+        return min(size,self._maxRound,self._maxTrials - self.trials)
+
+    def run(self,progress=None):
+        '''
+        Simulates rounds of trials until the precision is met or a budget runs out. The
+        optional progress callback is called after each round with this object
+        '''
+        t0 = time.perf_counter()
+        while True:
+            if self.trials > 0 and self.converged:
+                self.stopReason = 'precision'
+                break
+            size = self.nextRound()
+            if size <= 0:
+                self.stopReason = 'trials'
+                break
+            if self._maxTime is not None:
+                remaining = self._maxTime - (time.perf_counter() - t0)
+                if self.trials > 0:
+                    size = min(size,int(remaining*self.trials/max(self.wallTime,1e-9)))
+                if remaining <= 0 or size <= 0:
+                    self.stopReason = 'time'
+                    break
+
+            engine = VectorEngine(
+                depth=self._depth,
+                pl_size=self._pl_size,
+                writeBandwidth=self._wrate,
+                readBandwidth=self._rrate,
+                initLevel=self._init_level,
+                rng=np.random.default_rng(self._seedSeq.spawn(1)[0]),
+                chunkSteps=self._chunkSteps)
+            engine.run(trials=size)
+            self.trials        += size
+            self.rounds        += 1
+            self.overrunCount  += int(np.count_nonzero(engine.errorType == 1))
+            self.underrunCount += int(np.count_nonzero(engine.errorType == 2))
+            self.ops           += int(engine.pushCount.sum() + engine.popCount.sum() + engine.wnopCount.sum() + engine.rnopCount.sum())
+            self.wallTime       = time.perf_counter() - t0
+            if progress is not None:
+                progress(self)
+        self.wallTime = time.perf_counter() - t0
+
+    def __str__(self):
+        rstr  = f"target relative error  = {self._relError:g} ({self._event}, {self._confidence:.1%} {self._interval} interval)\n"
+        rstr += f"stop reason            = {self.stopReason}\n"
+        rstr += f"rounds                 = {self.rounds}\n"
+        rstr += f"trials                 = {self.trials}\n"
+        for event in self.EVENTS:
+            lo,hi = self.confidenceInterval(event)
+            rstr += f"{event+' probability':<23}= {self.probability(event):.6e} [{lo:.6e}, {hi:.6e}]\n"
+        rstr += f"relative error         = {self.relativeError():.4f}\n"
+        rstr += f"trials per second      = {self.trialsPerSec:.0f}\n"
+        rstr += f"operations per second  = {self.opsPerSec:.0f}\n"
+        rstr += f"wall time (seconds)    = {self.wallTime:.2f}\n"
+        return rstr
+
+def _betaFraction(a:float,b:float,x:float)->float:
+    '''
+    Continued fraction of the regularized incomplete beta function (modified Lentz)
+    '''
+    tiny = 1e-300
+    qab,qap,qam = a+b,a+1.0,a-1.0
+    c,d = 1.0,1.0 - qab*x/qap
+    d = 1.0/(d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1,1000000):
+        m2 = 2*m
+        aa = m*(b-m)*x/((qam+m2)*(a+m2))
+        d  = 1.0 + aa*d
+        d  = 1.0/(d if abs(d) > tiny else tiny)
+        c  = 1.0 + aa/c
+        c  = c if abs(c) > tiny else tiny
+        h *= d*c
+        aa = -(a+m)*(qab+m)*x/((a+m2)*(qap+m2))
+        d  = 1.0 + aa*d
+        d  = 1.0/(d if abs(d) > tiny else tiny)
+        c  = 1.0 + aa/c
+        c  = c if abs(c) > tiny else tiny
+        delta = d*c
+        h *= delta
+        if abs(delta-1.0) < 1e-15:
+            break
+    return h
+
+def _betaCdf(a:float,b:float,x:float)->float:
+    '''
+    Regularized incomplete beta function I_x(a,b)
+    '''
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a+b) - math.lgamma(a) - math.lgamma(b) + a*math.log(x) + b*math.log1p(-x))
+    if x < (a+1.0)/(a+b+2.0):
+        return front*_betaFraction(a,b,x)/a
+    return 1.0 - front*_betaFraction(b,a,1.0-x)/b
+
+def _betaQuantile(a:float,b:float,q:float)->float:
+    '''
+    Quantile of the beta distribution by bisection
+    '''
+    lo,hi = 0.0,1.0
+    for _ in range(100):
+        mid = (lo+hi)/2
+        if _betaCdf(a,b,mid) < q:
+            lo = mid
+        else:
+            hi = mid
+    return (lo+hi)/2
@@ -0,0 +1,27 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import numpy as np
+
+from fifo_pkg.TrafficModel import TrafficModel
+
+class BernoulliStream(TrafficModel):
+    '''
+    Stream of Bernoulli(p) outcomes owned by a single producer or consumer. Outcomes are
+    drawn in blocks from the stream's own generator and handed out one at a time, so the
+    per-operation cost is a buffer read rather than a generator call, and the sequence of
+    outcomes only depends on the seed (not on how threads interleave).
+    '''
+
+    def _generate(self,count:int)->np.ndarray:
+        return self._rng.random(count) < self._p
+
+    def __str__(self):
+        return f"Bernoulli(p={self._p:.4f})"
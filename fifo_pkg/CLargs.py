@@ -28,7 +28,98 @@ def proc_cla(iparser:argparse.ArgumentParser=None,descr:str='')->argparse.Argume
     parser.add_argument('--readbw',    metavar='<integer>', type=int,  help='Read bandwidth in datums/unit time',                  default=1280)
     parser.add_argument('--initlevel', metavar='<integer>', type=int,  help='Initial FIFO level (simulation only)',                default=1)
     parser.add_argument('--quantum',   metavar='<integer>', type=int,  help='Number of sim steps per sim quantum (0=auto-mode)',   default=1)
+    parser.add_argument('--adaptive',  action='store_true',            help='Adapt the quantum to the FIFO level, up to --quantum (0=no limit)')
+    parser.add_argument('--engine',    metavar='<name>',    type=str,  help='Simulation engine (threaded|vectorized|asyncio|exact)', default='threaded',
+                        choices=['threaded','vectorized','asyncio','exact'])
+    parser.add_argument('--exact-levels',metavar='<integer>',type=int,help='Depths evaluated for the max-level distribution of the exact engine (each costs a full analysis)', default=0)
+    parser.add_argument('--write-model',metavar='<spec>',  type=str,  help='Write port traffic model (bernoulli|burst[:len]|onoff[:mean-on]|periodic[:period])', default='bernoulli')
+    parser.add_argument('--read-model',metavar='<spec>',   type=str,  help='Read port traffic model (same choices as --write-model)', default='bernoulli')
+    parser.add_argument('--trials',    metavar='<integer>', type=int,  help='Number of independent Monte Carlo trials',            default=1)
+    parser.add_argument('--seed',      metavar='<integer>', type=int,  help='Random seed (default is non-deterministic)',          default=None)
+    parser.add_argument('--solve',     action='store_true',            help='Search the min depth and initial level whose failure probability meets --target')
+    parser.add_argument('--target',    metavar='<float>',   type=float,help='Target failure probability of --solve (overrun probability with --index)', default=1e-4)
+    parser.add_argument('--precision', metavar='<float>',   type=float,help='Estimate the failure probability to this relative error', default=None)
+    parser.add_argument('--confidence',metavar='<float>',   type=float,help='Confidence level of the --precision interval',        default=0.95)
+    parser.add_argument('--interval',  metavar='<name>',    type=str,  help='Confidence interval of --precision (wilson|clopper-pearson)', default='wilson',
+                        choices=['wilson','clopper-pearson'])
+    parser.add_argument('--event',     metavar='<name>',    type=str,  help='Probability estimated by --precision (overrun|underrun|failure)', default='failure',
+                        choices=['overrun','underrun','failure'])
+    parser.add_argument('--max-trials',metavar='<integer>', type=int,  help='Trial budget of --precision',                         default=10000000)
+    parser.add_argument('--max-time',  metavar='<float>',   type=float,help='Time budget of --precision in seconds',               default=None)
+    parser.add_argument('--rare',      action='store_true',            help='Estimate small overrun/underrun probabilities with importance sampling')
+    parser.add_argument('--index',     metavar='<file>',    type=str,  help='Build (or load) a depth-query index file and query it',  default=None)
+    parser.add_argument('--query-depths',metavar='<values>',type=str, help='Depths queried from --index (list or start:stop[:step], default=--depth)', default=None)
+    parser.add_argument('--query-levels',metavar='<values>',type=str, help='Initial levels queried from --index (default=--initlevel)', default=None)
+    parser.add_argument('--pipeline',  metavar='<file>',    type=str,  help='Simulate a multi-FIFO pipeline from a JSON file',     default=None)
+    parser.add_argument('--multiport', metavar='<file>',    type=str,  help='Simulate a FIFO shared by arbitrated producers/consumers from a JSON file', default=None)
+    parser.add_argument('--wclk',      metavar='<integer>', type=int,  help='Write clock frequency, enables CDC mode with --rclk',  default=None)
+    parser.add_argument('--rclk',      metavar='<integer>', type=int,  help='Read clock frequency, enables CDC mode with --wclk',  default=None)
+    parser.add_argument('--wprob',     metavar='<float>',   type=float,help='Write activity probability per write clock (CDC mode)', default=1.0)
+    parser.add_argument('--rprob',     metavar='<float>',   type=float,help='Read activity probability per read clock (CDC mode)',  default=1.0)
+    parser.add_argument('--sync',      metavar='<integer>', type=int,  help='Synchronizer stages of the pointer crossings (CDC mode)', default=2)
     parser.add_argument('--nosim',     action='store_true',            help='Skip simulation, and only perform formulaic analysis')
+    parser.add_argument('--no-cache',  action='store_true',            help='Bypass the result cache of seeded/exact runs')
+    parser.add_argument('--clear-cache',action='store_true',           help='Remove all entries from the result cache first')
+    parser.add_argument('--cache-dir', metavar='<dir>',     type=str,  help='Result cache directory (default=~/.cache/fifo_tools)', default=None)
+    parser.add_argument('--trace',     metavar='<file>',    type=str,  help='Record a binary level trace (threaded/asyncio engines)', default=None)
+    parser.add_argument('--trace-every',metavar='<integer>',type=int,  help='Only trace every Nth operation',                      default=1)
+    parser.add_argument('--trace-max', action='store_true',            help='Only trace pushes which reach a new max level')
+    parser.add_argument('--chunk',     metavar='<integer>', type=int,  help='Steps per chunk of the vectorized engine, with progress per chunk', default=None)
+    parser.add_argument('--producer-trace',metavar='<file>',type=str,help='Replay producer activity from a trace file',        default=None)
+    parser.add_argument('--consumer-trace',metavar='<file>',type=str,help='Replay consumer activity from a trace file',        default=None)
+    parser.add_argument('--trace-format',metavar='<name>',type=str, help='Activity trace format (bits|bytes|npy, default=by extension)', default=None,
+                        choices=['bits','bytes','npy'])
+    parser.add_argument('--metrics-json',metavar='<file>',type=str, help='Write the run\'s performance metrics to a JSON file',   default=None)
     parser.add_argument('--verbose',   action='store_true',            help='Report all operations (simulation only)')
 
     return parser.parse_args()
+
+def proc_sweep_cla(iparser:argparse.ArgumentParser=None,descr:str='')->argparse.ArgumentParser:
+    '''
+    Process command line arguments of the parameter sweep runner. Each grid axis takes a
+    comma separated list of integers or an inclusive start:stop[:step] range
+    '''
+    if iparser:
+        assert isinstance(iparser,argparse.ArgumentParser), "Object is not an argument parser"
+        parser = iparser
+    else:
+        parser = argparse.ArgumentParser(description=descr)
+
+    parser.add_argument('--depth',     metavar='<values>',  type=str,  help='Depth axis (e.g. 64,128 or 64:512:64)',               default='128')
+    parser.add_argument('--plsize',    metavar='<values>',  type=str,  help='Payload size axis',                                   default='512')
+    parser.add_argument('--writebw',   metavar='<values>',  type=str,  help='Write bandwidth axis',                                default='1024')
+    parser.add_argument('--readbw',    metavar='<values>',  type=str,  help='Read bandwidth axis',                                 default='1280')
+    parser.add_argument('--initlevel', metavar='<values>',  type=str,  help='Initial FIFO level axis',                             default='1')
+    parser.add_argument('--grid',      metavar='<file>',    type=str,  help='JSON grid spec (overrides the axis options it names)', default=None)
+    parser.add_argument('--trials',    metavar='<integer>', type=int,  help='Monte Carlo trials per grid point',                   default=1000)
+    parser.add_argument('--seed',      metavar='<integer>', type=int,  help='Base random seed of the sweep',                       default=0)
+    parser.add_argument('--workers',   metavar='<integer>', type=int,  help='Number of worker processes (default=all cores)',      default=None)
+    parser.add_argument('--output',    metavar='<file>',    type=str,  help='Results file (.csv or .jsonl), resumed if it exists', required=True)
+
+    return parser.parse_args()
+
+def proc_bench_cla(iparser:argparse.ArgumentParser=None,descr:str='')->argparse.ArgumentParser:
+    '''
+    Process command line arguments of the benchmark suite. The payload sizes take a comma
+    separated list of integers or an inclusive start:stop[:step] range
+    '''
+    if iparser:
+        assert isinstance(iparser,argparse.ArgumentParser), "Object is not an argument parser"
+        parser = iparser
+    else:
+        parser = argparse.ArgumentParser(description=descr)
+
+    parser.add_argument('--engines',   metavar='<names>',   type=str,  help='Engines to benchmark',                                default='threaded,vectorized,asyncio,exact')
+    parser.add_argument('--plsizes',   metavar='<values>',  type=str,  help='Payload sizes',                                       default='1000,10000,100000,1000000,10000000')
+    parser.add_argument('--quanta',    metavar='<values>',  type=str,  help='Quantum sizes of the threaded/asyncio engines',       default='1,10,100,auto')
+    parser.add_argument('--ratios',    metavar='<values>',  type=str,  help='Write:read bandwidth pairs',                          default='90:100,100:100,110:100')
+    parser.add_argument('--max-events',metavar='<integer>', type=int,  help='Skip threaded/asyncio cases of more quanta than this', default=100000)
+    parser.add_argument('--repeat',    metavar='<integer>', type=int,  help='Timed runs per case (the fastest is kept)',           default=3)
+    parser.add_argument('--seed',      metavar='<integer>', type=int,  help='Random seed of every case',                           default=1)
+    parser.add_argument('--no-memory', action='store_true',            help='Skip the peak memory measurement')
+    parser.add_argument('--output',    metavar='<file>',    type=str,  help='Write the results to a JSON file',                    default=None)
+    parser.add_argument('--baseline',  metavar='<file>',    type=str,  help='Baseline JSON file',                                  default='benchmarks/baseline.json')
+    parser.add_argument('--save',      action='store_true',            help='Save the results as the new baseline')
+    parser.add_argument('--threshold', metavar='<float>',   type=float,help='Regression threshold as a fraction of the baseline',  default=0.2)
+
+    return parser.parse_args()
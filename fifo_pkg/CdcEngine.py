@@ -0,0 +1,218 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import math
+import time
+import numpy as np
+
+from fifo_pkg.Fifo import Fifo
+
+class CdcEngine(object):
+    '''
+    Simulates an asynchronous (clock-domain-crossing) FIFO with independent write and read
+    clocks. The clock frequencies are integers (e.g. in MHz), so their ratio is rational
+    and edges fall on an integer timeline: write edge k (k >= 1) at time k*Tw and read edge
+    j at time j*Tr, with Tw = rclk/g and Tr = wclk/g (g = gcd of the clocks). Coinciding
+    edges sequence the write before the read, as FifoSimulator sequences the producer
+    before the consumer.
+
+    The producer is active on a write edge and the consumer on a read edge according to
+    their traffic models (e.g. a BernoulliStream with the per-domain activity probability).
+    Pointers cross the clock domains through synchronizers of syncStages flops:
+    - the write side sees the read pointer of syncStages write cycles ago, so the FIFO
+      looks full early, and a push which finds the FIFO full (as seen by the write side)
+      is an overrun
+    - the read side sees the write pointer of syncStages read cycles ago, so the FIFO looks
+      empty early, and a pop which finds it empty (as seen by the read side) is an underrun
+    With syncStages=0 and equal clocks this is the step model of FifoSimulator.
+
+    The run is advanced in chunks of time on the merged edge timeline. Each chunk derives
+    the pushed and popped counts of its edges with cumulative sums, and the pointer values
+    each side sees are looked up from those counts (keeping the last few counts of the
+    previous chunk). The run ends at the final push, as in FifoSimulator, or at the first
+    error.
+    '''
+
+    ERROR_TYPES = ('','overrun','underrun')
+    CHUNK_EDGES = 1<<20 # Edges of the faster clock per chunk
+
+    def __init__(
+        self,
+        depth:int,
+        pl_size:int,
+        initLevel:int,
+        writeClock:int,
+        readClock:int,
+        writeSource,
+        readSource,
+        syncStages:int=2,
+        chunkEdges:int=None):
+        assert writeClock > 0 and readClock > 0, "Clock frequencies must be positive"
+        assert syncStages >= 0, f"Number of synchronizer stages ({syncStages}) must not be negative"
+        assert 0 <= initLevel < depth, f"Specified init_level={initLevel} outside of [0,depth={depth})"
+        assert initLevel < pl_size, f"Specified init_level={initLevel} greater or equal to pl_size={pl_size}"
+        g = math.gcd(writeClock,readClock)
+        self._depth      = depth
+        self._pl_size    = pl_size
+        self._init_level = initLevel
+        self._wclk       = writeClock
+        self._rclk       = readClock
+        self._tw         = readClock//g  # Write clock period on the integer timeline
+        self._tr         = writeClock//g # Read clock period on the integer timeline
+        self._wsource    = writeSource
+        self._rsource    = readSource
+        self._sync       = syncStages
+        self._chunkEdges = chunkEdges if chunkEdges else self.CHUNK_EDGES
+
+        self.pushCount     = 0  # Excludes the initial level
+        self.popCount      = 0
+        self.wnopCount     = 0
+        self.rnopCount     = 0
+        self.maxLevel      = initLevel # Highest actual occupancy
+        self.maxWriteLevel = initLevel # Highest occupancy as seen by the write side
+        self.errorType     = 0
+        self.errorEdge     = -1 # Index of the failing edge in its own clock domain
+        self.writeEdges    = 0  # Edges simulated per clock domain
+        self.readEdges     = 0
+        self.wallTime      = 0.0
+
+    def calcDepth(self,syncStages:int=None)->int:
+        '''
+        Formulaic depth of the configuration: the rate ratio formula of FifoSimulator applied
+        to the per-domain datum rates (clock x activity), plus the entries hidden by the
+        synchronizers: reads which the write side has not seen yet (syncStages write cycles
+        of reads) and writes which the read side has not seen yet (syncStages read cycles
+        of writes)
+        '''
+        sync  = self._sync if syncStages is None else syncStages
+        wrate = self._wclk*self._wsource.p
+        rrate = self._rclk*self._rsource.p
+        drift = 0.0
+        if wrate > 0 and rrate > 0:
+            drift = self._pl_size*max(1.0 - rrate/wrate,1.0 - wrate/rrate)
+        return math.ceil(drift) + math.ceil(sync*rrate/self._wclk) + math.ceil(sync*wrate/self._rclk)
+
+    def run(self,progress=None):
+        '''
+        Simulates until the final push or the first error. The optional progress callback
+        is called after each chunk with the number of write edges simulated, and the pushes
+        done and due
+        '''
+        t0 = time.perf_counter()
+        tw,tr,sync,il = self._tw,self._tr,self._sync,self._init_level
+        npush = self._pl_size - il
+
+        # Each write edge sees the popped count of the reads strictly before it, and each
+        # read edge the pushed count of the writes up to and including it (writes go first).
+        # Through a synchronizer, an edge sees the count of syncStages edges ago instead, so
+        # the last syncStages counts are carried over to the next chunk
+        plast,qlast = 0,0
+        phist = np.zeros(sync,dtype=np.int64)
+        qhist = np.zeros(sync,dtype=np.int64)
+        kw0,jr0,now = 0,0,0
+        span  = self._chunkEdges*min(tw,tr) # Chunk length on the timeline
+
+        while not self.errorType and self.pushCount < npush:
+            end = now + span
+            kw1,jr1 = end//tw,end//tr
+            w = np.asarray(self._wsource.read(kw1-kw0),dtype=bool)
+            r = np.asarray(self._rsource.read(jr1-jr0),dtype=bool)
+
+            pc = plast + np.cumsum(w,dtype=np.int64) # Pushed count after each write edge
+            qc = qlast + np.cumsum(r,dtype=np.int64) # Popped count after each read edge
+            if pc.size and pc[-1] >= npush:
+                # Cut the chunk at the final push. A read edge coinciding with it still runs
+                kw1 = kw0 + 1 + int(np.searchsorted(pc,npush))
+                jr1 = (kw1*tw)//tr
+                w,pc = w[:kw1-kw0],pc[:kw1-kw0]
+                r,qc = r[:jr1-jr0],qc[:jr1-jr0]
+            pext = np.concatenate(((plast,),pc)) # Indexed by write edge - kw0
+            qext = np.concatenate(((qlast,),qc)) # Indexed by read edge - jr0
+
+            # Write edges: the level after the edge as seen by the write side, which is full
+            # when a push would take it beyond the depth
+            qnow  = qext[np.arange((kw0+1)*tw-1,kw1*tw,tw)//tr - jr0]
+            qsync = np.concatenate((qhist,qnow))[:qnow.size]
+            wview = il + pc - qsync
+            over  = np.flatnonzero(w & (wview > self._depth))
+
+            # Read edges: the level after the edge as seen by the read side, which is empty
+            # when a pop would take it below zero
+            pnow  = pext[np.arange((jr0+1)*tr,jr1*tr+1,tr)//tw - kw0]
+            psync = np.concatenate((phist,pnow))[:pnow.size]
+            rview = il + psync - qc
+            under = np.flatnonzero(r & (rview < 0))
+
+            nw,nr = kw1-kw0,jr1-jr0 # Edges which execute
+            if over.size or under.size:
+                to = (kw0+1+over[0])*tw if over.size else None
+                tu = (jr0+1+under[0])*tr if under.size else None
+                if tu is None or (to is not None and to <= tu):
+                    nw = int(over[0])
+                    nr = min(jr1,(to-1)//tr) - jr0
+                    self.errorType,self.errorEdge = 1,kw0 + nw
+                else:
+                    nr = int(under[0])
+                    nw = min(kw1,tu//tw) - kw0
+                    self.errorType,self.errorEdge = 2,jr0 + nr
+
+            pushes = int(pc[nw-1]) - plast if nw > 0 else 0
+            pops   = int(qc[nr-1]) - qlast if nr > 0 else 0
+            if nw > 0:
+                self.maxLevel      = max(self.maxLevel,int((il + pc[:nw] - qnow[:nw]).max()))
+                self.maxWriteLevel = max(self.maxWriteLevel,int(wview[:nw].max()))
+            self.pushCount  += pushes
+            self.popCount   += pops
+            self.wnopCount  += nw - pushes
+            self.rnopCount  += nr - pops
+            self.writeEdges += nw
+            self.readEdges  += nr
+
+            plast,qlast = int(pext[-1]),int(qext[-1])
+            if sync:
+                phist = np.concatenate((phist,pnow))[-sync:]
+                qhist = np.concatenate((qhist,qnow))[-sync:]
+            kw0,jr0,now = kw1,jr1,end
+            if progress is not None:
+                progress(self.writeEdges,self.pushCount,npush)
+
+        # Drain phase: the consumer pops the remainder of the payload without failing
+        if self.errorType == 0:
+            self.popCount = self._pl_size
+        self.wallTime = time.perf_counter() - t0
+
+    def annotate(self,fifo:Fifo):
+        '''
+        Back-annotates the statistics onto a Fifo object which was primed with the initial
+        level. The error step is the index of the failing edge in its own clock domain
+        '''
+        fifo.bulk_ops(
+            pushes=self.pushCount,
+            pops=self.popCount,
+            wnops=self.wnopCount,
+            rnops=self.rnopCount,
+            maxLevel=self.maxLevel)
+        if self.errorType:
+            fifo.setError(self.ERROR_TYPES[self.errorType],self.errorEdge)
+
+    def __str__(self):
+        g = math.gcd(self._wclk,self._rclk)
+        rstr  = f"write clock            = {self._wclk} ({self._wsource})\n"
+        rstr += f"read clock             = {self._rclk} ({self._rsource})\n"
+        rstr += f"W:R clock ratio        = {self._wclk//g}:{self._rclk//g}\n"
+        rstr += f"synchronizer stages    = {self._sync}\n"
+        rstr += f"write/read edges       = {self.writeEdges}/{self.readEdges}\n"
+        rstr += f"edges per second       = {(self.writeEdges+self.readEdges)/max(self.wallTime,1e-9):.0f}\n"
+        rstr += f"max actual level       = {self.maxLevel}\n"
+        rstr += f"max write-side level   = {self.maxWriteLevel}\n"
+        if self.errorType:
+            clock = self._wclk if self.errorType == 1 else self._rclk
+            rstr += f"first {self.ERROR_TYPES[self.errorType]:<17}= {'write' if self.errorType == 1 else 'read'} edge {self.errorEdge} (time {(self.errorEdge+1)/clock:.6g})\n"
+        return rstr
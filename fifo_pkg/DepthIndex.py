@@ -0,0 +1,251 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import json
+import time
+import numpy as np
+
+from fifo_pkg.VectorEngine import VectorEngine
+
+class DepthIndex(object):
+    '''
+    Answers overrun/underrun rates of one payload and bandwidth configuration at any depth
+    D and initial level L from a single batch of stored trials, with the step semantics of
+    the VectorEngine.
+
+    Each trial is simulated once without bounds, for the whole payload, as a level path
+    relative to the initial level. With an initial level L the producer pushes pl_size-L
+    entries, so the run ends at the step of push K = pl_size-L, and the trial
+    - underruns at the first step (up to push K) at which the relative level drops below -L
+    - overruns at the first step (up to push K) at which the relative level after the
+      producer operation rises above D-L
+    whichever comes first. Only the record levels of a path matter for this: each new
+    highest level after a producer operation and each new lowest level, stored with its
+    step and its push count. A query looks up the first low record below -L within K
+    pushes, and the last high record within K pushes before it, for all trials at once.
+
+    Records are kept up to maxDepth (no level beyond pl_size matters), which bounds the
+    index size for paths with a strong drift: queries are valid for depths up to maxDepth.
+    '''
+
+    CHUNK_SIZE     = VectorEngine.CHUNK_SIZE # Max number of (step x trial) elements per chunk
+    DEFAULT_TRIALS = 10000
+
+    def __init__(
+        self,
+        pl_size:int,
+        writeBandwidth:int,
+        readBandwidth:int,
+        trials:int=DEFAULT_TRIALS,
+        maxDepth:int=None,
+        seed:int=None):
+        assert trials > 0, f"Number of trials ({trials}) must be positive"
+        self.pl_size        = pl_size
+        self.writeBandwidth = writeBandwidth
+        self.readBandwidth  = readBandwidth
+        self.trials         = trials
+        self.maxDepth       = min(maxDepth,pl_size) if maxDepth is not None else pl_size
+        self.seed           = seed
+        self.buildTime      = 0.0
+        self.highs          = None # (offsets,steps,values,counts) of the high records
+        self.lows           = None # (offsets,steps,values,counts) of the low records
+
+    def build(self,progress=None):
+        '''
+        Simulates the trials and extracts their records. The optional progress callback is
+        called after each chunk with the number of steps simulated, and the pushes done and
+        due over all trials
+        '''
+        t0   = time.perf_counter()
+        rng  = np.random.default_rng(self.seed)
+        pw   = self.writeBandwidth/(self.writeBandwidth+self.readBandwidth)
+        pr   = self.readBandwidth/(self.writeBandwidth+self.readBandwidth)
+        cap  = self.maxDepth
+        npush = self.pl_size
+
+        level = np.zeros(self.trials,dtype=np.int64) # Relative level
+        P     = np.zeros(self.trials,dtype=np.int64) # Pushes so far
+        hi    = np.zeros(self.trials,dtype=np.int64) # Highest level after a producer operation
+        lo    = np.zeros(self.trials,dtype=np.int64) # Lowest level
+        highs,lows = [],[]
+        active = np.arange(self.trials)
+        step   = 0
+        while active.size > 0:
+            rows = active.size
+            n    = min(VectorEngine.MAX_STEPS,max(1,self.CHUNK_SIZE//rows))
+            w    = rng.random((n,rows),dtype=np.float32) < pw
+            r    = rng.random((n,rows),dtype=np.float32) < pr
+            base = level[active]
+            need = npush - P[active]
+
+            # Levels relative to the start of the chunk
+            lvl  = VectorEngine._cumsum(w.view(np.int8) - r.view(np.int8)) # After each step
+            obs  = lvl + r                                                 # After the producer operation
+            cw   = VectorEngine._cumsum(w.view(np.int8))                   # Pushes
+
+            # Steps after the final push of a trial are not simulated
+            last = np.full(rows,n-1)
+            fin  = np.flatnonzero(cw[-1] >= need)
+            if fin.size > 0:
+                last[fin] = (cw[:,fin] >= need[fin]).argmax(axis=0)
+
+            # Records: levels beyond the previous extreme, as long as that was within the cap
+            # (the first record beyond the cap is kept). The extremes so far are at or beyond
+            # the current level, and only matter within the range of the chunk
+            limit = np.iinfo(lvl.dtype).max
+            for rel,ext,ufunc,out in ((obs,hi,np.maximum,highs),(lvl,lo,np.minimum,lows)):
+                first = np.clip(ext[active] - base,-limit,limit).astype(lvl.dtype)
+                run   = self._accumulate(ufunc,rel,first)
+                prev  = np.vstack((first[None],run[:-1]))
+                si,ti = np.nonzero(rel > prev if ufunc is np.maximum else rel < prev)
+                keep  = (si <= last[ti]) & (np.abs(prev[si,ti] + base[ti]) <= cap)
+                si,ti = si[keep],ti[keep]
+                out.append((active[ti],step + si,rel[si,ti] + base[ti],P[active[ti]] + cw[si,ti]))
+                ext[active] = ufunc(ext[active],run[last,np.arange(rows)] + base)
+
+            cols = np.arange(rows)
+            P[active]     += cw[last,cols]
+            level[active]  = base + lvl[last,cols]
+            active = active[P[active] < npush]
+            step  += n
+            if progress is not None:
+                progress(step,int(P.sum()),self.trials*npush)
+
+        self.highs = self._pack(highs)
+        self.lows  = self._pack(lows)
+        self.buildTime = time.perf_counter() - t0
+        return self
+
+    @staticmethod
+    def _accumulate(ufunc,a:np.ndarray,first:np.ndarray)->np.ndarray:
+        '''
+        Running maximum/minimum (ufunc) along the step axis of a (step,trial) array, starting
+        from first. As in VectorEngine._cumsum, wide batches are accumulated one step at a
+        time so that each operation is a contiguous vector operation across all trials
+        '''
+        acc = a.copy()
+        ufunc(acc[0],first,out=acc[0])
+        if acc.shape[1] < 64:
+            return ufunc.accumulate(acc,axis=0)
+        for i in range(1,acc.shape[0]):
+            ufunc(acc[i-1],acc[i],out=acc[i])
+        return acc
+
+    def _pack(self,chunks:list)->tuple:
+        '''
+        Sorts records by trial and step into (offsets,steps,values,counts) arrays
+        '''
+        trial,steps,values,counts = (np.concatenate(x) for x in zip(*chunks))
+        order  = np.lexsort((steps,trial))
+        offsets = np.searchsorted(trial[order],np.arange(self.trials+1))
+        return (offsets,steps[order],values[order],counts[order])
+
+    @staticmethod
+    def _segmentSearch(offsets:np.ndarray,keys:np.ndarray,targets:np.ndarray,side:str)->np.ndarray:
+        '''
+        Searches each trial's segment of a per-segment sorted keys array for the trial's
+        target, by offsetting every segment into its own disjoint key range
+        '''
+        trials = offsets.size - 1
+        span   = int(max(int(np.abs(keys).max()) if keys.size else 0,int(np.abs(targets).max())))*2 + 2
+        seg    = np.repeat(np.arange(trials,dtype=np.int64),np.diff(offsets))
+        return np.searchsorted(seg*span + keys + span//2,np.arange(trials,dtype=np.int64)*span + targets + span//2,side=side)
+
+    def outcomes(self,initLevel:int)->tuple:
+        '''
+        Returns per-trial arrays for an initial level: the highest level relative to the
+        initial level reached before any underrun (so the trial overruns at depth D when
+        this exceeds D-initLevel), and whether the trial underruns unless it overruns first
+        '''
+        assert 0 <= initLevel < self.pl_size, f"Initial level {initLevel} outside of [0,pl_size={self.pl_size})"
+        K = self.pl_size - initLevel # Pushes of the run
+        trials = np.arange(self.trials)
+        never  = np.iinfo(np.int64).max//4
+
+        # First low record below -initLevel, which must lie before push K
+        off,steps,values,counts = self.lows
+        i = self._segmentSearch(off,-values,np.full(self.trials,initLevel+1),'left')
+        found = i < off[1:]
+        ic    = np.minimum(i,max(steps.size-1,0))
+        under = found & (counts[ic] < K) if steps.size else found
+        tu    = np.where(under,steps[ic] if steps.size else 0,never)
+
+        # Last high record up to push K and before the underrun
+        off,steps,values,counts = self.highs
+        if steps.size == 0:
+            return (np.zeros(self.trials,dtype=np.int64),under)
+        j = np.minimum(
+            self._segmentSearch(off,steps,np.minimum(tu,int(steps.max())+1),'left'),
+            self._segmentSearch(off,counts,np.full(self.trials,K),'right'))
+        peak = np.where(j > off[:-1],values[np.maximum(j-1,0)],0)
+        return (peak,under)
+
+    def query(self,depth:int,initLevel:int)->tuple:
+        '''
+        Returns the (overrun,underrun) rates at a depth and initial level
+        '''
+        assert initLevel < depth <= self.maxDepth, f"Depth {depth} outside of (initLevel={initLevel},maxDepth={self.maxDepth}]"
+        peak,under = self.outcomes(initLevel)
+        over = peak > depth - initLevel
+        return (float(np.mean(over)),float(np.mean(under & ~over)))
+
+    def failureRate(self,depth:int,initLevel:int)->float:
+        return sum(self.query(depth,initLevel))
+
+    def depthCurve(self,initLevel:int,depths=None)->tuple:
+        '''
+        Overrun and underrun rates over a range of depths (all depths from initLevel+1 to
+        maxDepth by default) at one initial level. Returns (depths,overrun,underrun) arrays
+        '''
+        depths = np.arange(initLevel+1,self.maxDepth+1) if depths is None else np.asarray(depths,dtype=np.int64)
+        assert depths.size == 0 or (depths.min() > initLevel and depths.max() <= self.maxDepth), f"Depths outside of (initLevel={initLevel},maxDepth={self.maxDepth}]"
+        peak,under = self.outcomes(initLevel)
+        rel   = depths - initLevel
+        over  = self.trials - np.searchsorted(np.sort(peak),rel,side='right')
+        undr  = np.searchsorted(np.sort(peak[under]),rel,side='right')
+        return (depths,over/self.trials,undr/self.trials)
+
+    def minDepth(self,initLevel:int,target:float)->int:
+        '''
+        Smallest depth whose overrun rate at an initial level is at most target, or None
+        when no depth up to maxDepth meets it
+        '''
+        depths,over,_ = self.depthCurve(initLevel)
+        ok = np.flatnonzero(over <= target)
+        return int(depths[ok[0]]) if ok.size else None
+
+    @property
+    def records(self)->int:
+        return int(self.highs[1].size + self.lows[1].size)
+
+    def save(self,path:str):
+        meta = {k:getattr(self,k) for k in ('pl_size','writeBandwidth','readBandwidth','trials','maxDepth','seed','buildTime')}
+        arrays = {f"{name}_{i}":a for name,recs in (('highs',self.highs),('lows',self.lows)) for i,a in enumerate(recs)}
+        with open(path,'wb') as f:
+            np.savez_compressed(f,meta=np.array(json.dumps(meta)),**arrays)
+
+    @classmethod
+    def load(cls,path:str)->'DepthIndex':
+        with np.load(path) as data:
+            meta  = json.loads(str(data['meta']))
+            index = cls(**{k:meta[k] for k in ('pl_size','writeBandwidth','readBandwidth','trials','maxDepth','seed')})
+            index.buildTime = meta['buildTime']
+            index.highs = tuple(data[f"highs_{i}"] for i in range(4))
+            index.lows  = tuple(data[f"lows_{i}"] for i in range(4))
+        return index
+
+    def __str__(self):
+        rstr  = f"payload size           = {self.pl_size}\n"
+        rstr += f"write/read bandwidth   = {self.writeBandwidth}/{self.readBandwidth}\n"
+        rstr += f"trials                 = {self.trials}\n"
+        rstr += f"max depth              = {self.maxDepth}\n"
+        rstr += f"records (per trial)    = {self.records} ({self.records/self.trials:.1f})\n"
+        rstr += f"build time (seconds)   = {self.buildTime:.2f}\n"
+        return rstr
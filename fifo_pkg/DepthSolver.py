@@ -0,0 +1,167 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import numpy as np
+
+from fifo_pkg.VectorEngine import VectorEngine
+
+class DepthSolver(object):
+    '''
+    Searches the smallest initial level and the smallest depth for which the simulated
+    failure (overrun or underrun) probability is below a target, using batched trials of
+    the VectorEngine. Half of the target is budgeted to underruns when searching the
+    initial level, and the depth search then uses the rest of it: the solution's total
+    failure probability is below the target.
+
+    Every candidate initial level is simulated with the same seed (common random numbers)
+    and an unbounded depth. A single batch then answers every candidate depth, since a
+    trial fails at depth D exactly when it underruns or its unbounded max level exceeds D.
+    '''
+
+    DEFAULT_TRIALS = 10000
+
+    def __init__(
+        self,
+        pl_size:int,
+        writeBandwidth:int,
+        readBandwidth:int,
+        target:float=1e-4,
+        trials:int=DEFAULT_TRIALS,
+        seed:int=None,
+        initLevel:int=None):
+        assert 0.0 < target < 1.0, f"Target probability ({target}) must be in (0,1)"
+        self._pl_size    = pl_size
+        self._wrate      = writeBandwidth
+        self._rrate      = readBandwidth
+        self._target     = target
+        self._trials     = trials
+        self._init_level = initLevel # None means search for it
+        # Common random numbers: every batch replays the same seed
+        self._seed       = seed if seed is not None else int(np.random.SeedSequence().generate_state(1)[0])
+
+        self._batches    = {}   # Unbounded batch per simulated initial level
+        self._depth      = None # Solution
+        self._level      = None # Solution
+
+    def batch(self,initLevel:int)->VectorEngine:
+        '''
+        Returns the unbounded-depth batch for an initial level, simulating it on first use
+        '''
+        if initLevel not in self._batches:
+            engine = VectorEngine(
+                depth=None,
+                pl_size=self._pl_size,
+                writeBandwidth=self._wrate,
+                readBandwidth=self._rrate,
+                initLevel=initLevel,
+                rng=np.random.default_rng(self._seed))
+            engine.run(trials=self._trials)
+            self._batches[initLevel] = engine
+        return self._batches[initLevel]
+
+    def _below(self,count:int,target:float)->bool:
+        return count < target*self._trials
+
+    def underrunProbability(self,initLevel:int)->float:
+        return float(np.mean(self.batch(initLevel).errorType == 2))
+
+    def overrunProbability(self,initLevel:int,depth:int)->float:
+        return float(np.mean(self.batch(initLevel).maxLevel > depth))
+
+    def failureProbability(self,initLevel:int,depth:int)->float:
+        batch = self.batch(initLevel)
+        return float(np.mean((batch.maxLevel > depth) | (batch.errorType == 2)))
+
+    def minInitLevel(self)->int:
+        '''
+        Bisection for the smallest initial level whose underrun probability is below half
+        of the target
+        '''
+        def ok(level):
+            return self._below(np.count_nonzero(self.batch(level).errorType == 2),self._target/2)
+
+        lo,hi = 0,1
+        while not ok(hi):
+            lo = hi
+            assert hi < self._pl_size - 1, f"No initial level below pl_size={self._pl_size} meets the target"
+            hi = min(2*hi,self._pl_size - 1)
+        if ok(lo):
+            return lo
+        while hi - lo > 1:
+            mid = (lo + hi)//2
+            if ok(mid):
+                hi = mid
+            else:
+                lo = mid
+        return hi
+
+    def minDepth(self,initLevel:int)->int:
+        '''
+        Bisection over depth for the smallest depth whose failure probability (overrun or
+        underrun) is below target, answered from the max levels of a single batch
+        '''
+        maxLevel = self.batch(initLevel).maxLevel
+        under    = self.batch(initLevel).errorType == 2
+        def ok(depth):
+            return self._below(np.count_nonzero((maxLevel > depth) | under),self._target)
+
+        lo,hi = initLevel,int(maxLevel.max()) # A depth of hi never overruns
+        if ok(lo):
+            return initLevel + 1 # The depth must exceed the initial level
+        while hi - lo > 1:
+            mid = (lo + hi)//2
+            if ok(mid):
+                hi = mid
+            else:
+                lo = mid
+        return hi
+
+    def solve(self)->tuple:
+        '''
+        Returns the (depth,initLevel) solution
+        '''
+        self._level = self._init_level if self._init_level is not None else self.minInitLevel()
+        self._depth = self.minDepth(self._level)
+        return (self._depth,self._level)
+
+    def __str__(self):
+        rstr  = f"target probability     = {self._target:g} (failure, {self._target/2:g} for underruns)\n"
+        rstr += f"trials per batch       = {self._trials}\n"
+        rstr += f"batches simulated      = {len(self._batches)}\n"
+        if self._depth is not None:
+            rstr += f"min initial level      = {self._level}\n"
+            rstr += f"min depth              = {self._depth}\n"
+            rstr += f"underrun probability   = {self.underrunProbability(self._level):.6f}\n"
+            rstr += f"overrun probability    = {self.overrunProbability(self._level,self._depth):.6f}\n"
+            rstr += f"failure probability    = {self.failureProbability(self._level,self._depth):.6f}\n"
+        if self._target*self._trials < 1.0:
+            rstr += f"Note: target is below the batch resolution (1/{self._trials}), increase --trials for confidence\n"
+        return rstr
+
+def solve_depth(
+    pl_size:int,
+    writeBandwidth:int,
+    readBandwidth:int,
+    target:float=1e-4,
+    trials:int=DepthSolver.DEFAULT_TRIALS,
+    seed:int=None,
+    initLevel:int=None)->tuple:
+    '''
+    Library entry point which returns the smallest (depth,initLevel) pair for which the
+    simulated failure (overrun or underrun) probability is below target
+    '''
+    return DepthSolver(
+        pl_size=pl_size,
+        writeBandwidth=writeBandwidth,
+        readBandwidth=readBandwidth,
+        target=target,
+        trials=trials,
+        seed=seed,
+        initLevel=initLevel).solve()
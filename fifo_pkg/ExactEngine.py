@@ -0,0 +1,151 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+class ExactEngine(object):
+    '''
+    Exact (sampling free) analysis of the FifoSimulator producer/consumer model, with the
+    same step semantics as the VectorEngine: on every step the producer pushes with
+    probability p(W), then the consumer pops with probability p(R), until the producer
+    has pushed its share of the payload (the drain phase that follows cannot fail).
+
+    The level distribution is propagated from one push to the next by dynamic programming.
+    Between two pushes the consumer makes a geometrically distributed number of pop
+    attempts, so the number of pops J has a closed form distribution which does not depend
+    on the level. Each push is therefore one vectorized correlation of the level
+    distribution with the distribution of J, where the mass that would pop an empty FIFO
+    is absorbed as underrun and the mass that would push into a full FIFO is absorbed as
+    overrun. The cost is O(pushes x depth x K) where K is the number of pop counts with
+    non-negligible probability (K <= depth).
+
+    The same recursion is evaluated for a set of depths at once. As a trial overruns at
+    depth b exactly when its max level exceeds b, the overrun probabilities over a range
+    of depths give the max-level distribution of the configured FIFO. This is opt-in:
+    maxLevelPoints (0 by default) sets the number of such depths, and each one costs as
+    much as the configured depth.
+    '''
+
+    TAIL_EPS = 1e-18 # Pop counts whose tail probability is below this are dropped
+
+    def __init__(
+        self,
+        depth:int,
+        pl_size:int,
+        writeBandwidth:int,
+        readBandwidth:int,
+        initLevel:int,
+        maxLevelPoints:int=0,
+        extraDepths:list=None):
+        assert 0 <= initLevel < depth, f"Specified init_level={initLevel} outside of [0,depth={depth})"
+        assert initLevel < pl_size, f"Specified init_level={initLevel} greater or equal to pl_size={pl_size}"
+        self._depth      = depth
+        self._pl_size    = pl_size
+        self._init_level = initLevel
+        self._pw = float(writeBandwidth/(writeBandwidth+readBandwidth))
+        self._pr = float(readBandwidth/(writeBandwidth+readBandwidth))
+
+        # Depths to evaluate: the configured depth, up to maxLevelPoints levels for the
+        # max-level distribution, and any extra depths of interest
+        levels = np.unique(np.linspace(initLevel,depth-1,num=max(0,min(maxLevelPoints,depth-initLevel))).round().astype(np.int64))
+        extra  = [d for d in (extraDepths or []) if initLevel < d <= depth]
+        self.depths = np.unique(np.concatenate([levels,extra,[depth]]).astype(np.int64))
+
+    def _popKernel(self,first:bool):
+        '''
+        Returns (g,T) where g[j] is the probability of j pops between two pushes and T[l] the
+        probability of at least l+1 pops (which underruns a FIFO at level l)
+        '''
+        pw,pr = self._pw,self._pr
+        # Ignoring steps on which neither port operates, each step before the next push
+        # either ends with the push (s) or pops without a push (q)
+        s = pw/(pw+(1.0-pw)*pr)
+        q = 1.0-s
+        n = self._depth+1
+        j = np.arange(n,dtype=np.float64)
+        g = s*q**j
+        T = q**(j+1)
+        if not first:
+            # The consumer also operates on the step of the previous push
+            g = (1.0-pr)*g + pr*np.concatenate([[0.0],g[:-1]])
+            T = (1.0-pr)*T + pr*q**j
+        tail = np.flatnonzero(np.concatenate([[1.0],T]) < self.TAIL_EPS)
+        K = int(tail[0]) if tail.size > 0 else n
+        return g[:max(K,1)],T
+
+    def run(self):
+        '''
+        Computes the overrun and underrun probabilities for every depth in self.depths
+        '''
+        depths = self.depths
+        rows   = np.arange(depths.size)
+        n      = self._depth+1
+        kernels = [self._popKernel(first=True),self._popKernel(first=False)]
+        K = max(kernels[0][0].size,kernels[1][0].size)
+
+        # W[row,l] is the probability of being at level l (and not having failed) right
+        # before the pops that precede the next push. Columns beyond the depth are padding.
+        W = np.zeros((depths.size,n+K),dtype=np.float64)
+        W[:,self._init_level] = 1.0
+        self.overrun  = np.zeros(depths.size)
+        self.underrun = np.zeros(depths.size)
+
+        for push in range(self._pl_size - self._init_level):
+            g,T = kernels[0] if push == 0 else kernels[1]
+            self.underrun += W[:,:n] @ T
+            U = np.einsum('rlj,j->rl',sliding_window_view(W,g.size,axis=1)[:,:n,:],g) # Level before the push
+            self.overrun += U[rows,depths]
+            U[rows,depths] = 0.0
+            U[np.arange(n) > depths[:,None]] = 0.0
+            W[:,:] = 0.0
+            W[:,1:n+1] = U
+
+        self.completed = W.sum(axis=1)
+
+    def _index(self,depth:int)->int:
+        idx = np.flatnonzero(self.depths == depth)
+        assert idx.size == 1, f"Depth {depth} was not evaluated"
+        return int(idx[0])
+
+    @property
+    def overrunProbability(self)->float:
+        return float(self.overrun[self._index(self._depth)])
+
+    @property
+    def underrunProbability(self)->float:
+        return float(self.underrun[self._index(self._depth)])
+
+    def failureProbability(self,depth:int=None)->float:
+        idx = self._index(depth if depth is not None else self._depth)
+        return float(self.overrun[idx] + self.underrun[idx])
+
+    @property
+    def maxLevelSurvival(self)->tuple:
+        '''
+        Returns (levels,probs) where probs[i] is the probability that the configured FIFO
+        reaches a max level of at least levels[i] (empty without maxLevelPoints)
+        '''
+        sel = self.depths < self._depth
+        return (self.depths[sel]+1,self.overrun[sel])
+
+    def __str__(self):
+        rstr  = f"overrun probability    = {self.overrunProbability:.6e}\n"
+        rstr += f"underrun probability   = {self.underrunProbability:.6e}\n"
+        rstr += f"success probability    = {float(self.completed[self._index(self._depth)]):.6e}\n"
+        levels,probs = self.maxLevelSurvival
+        if levels.size == 0:
+            return rstr
+        for pct in (50.0,90.0,99.0,99.9):
+            # Smallest level whose probability of being exceeded is below 1-pct
+            above = levels[probs <= 1.0-pct/100.0]
+            value = int(above[0])-1 if above.size > 0 else self._depth
+            rstr += f"max-level p{pct:<5g}       <= {value}\n"
+        return rstr
@@ -8,17 +8,29 @@
 # distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
 # See the License for the specific language governing permissions and limitations under the License.
 
-import threading
+from fifo_pkg.TraceRecorder import TraceRecorder
 
 class Fifo(object):
     '''
     A simple class to model a FIFO construct which can be
     simulated with independent producer/consumer threads.
+
+    Each counter is only updated by one port (pushes and write no-operations by the
+    producer, pops and read no-operations by the consumer) and the simulation kernel
+    runs one port at a time, so counters are read without a lock. push_n()/pop_n()
+    move a whole batch of entries in one call.
+
+    An optional TraceRecorder records every operation in binary form.
     '''
 
-    def __init__(self,depth:int,verbose:bool=False):
+    __slots__ = (
+        '_depth','_verbose','_popCount','_pushCount','_error','_errorType',
+        '_wnopCount','_rnopCount','_maxLevel','_bulkCount','_errorStep','_trace','quiet')
+
+    def __init__(self,depth:int,verbose:bool=False,trace:TraceRecorder=None):
         self._depth = depth
         self._verbose = verbose
+        self._trace = trace
 
         self._popCount  = 0     # Total pops on this object
         self._pushCount = 0     # Total pushes on this object
@@ -27,12 +39,62 @@ class Fifo(object):
         self._wnopCount = 0     # Write(push) no-operation count
         self._rnopCount = 0     # Read(pop)   no-operation count
         self._maxLevel  = 0     # Maximum level of Fifo during its lifetime
-    
-        # Thread synchronization lock (bound)
-        self.__lock = threading.Lock()
+        self._bulkCount = 0     # Entries pre-loaded via bulk_pushes() (not counted as port ops)
+        self._errorStep = None  # Port step index at which the error occurred
+        self.quiet      = False # Suppresses the error messages (errors are still flagged)
+
+    def reset(self,depth:int=None):
+        '''
+        Empties the FIFO and clears its counters and error flag, so that the object can be
+        reused by another simulation, optionally with another depth. The verbose, quiet and
+        trace settings are kept
+        '''
+        if depth is not None:
+            self._depth = depth
+        self._popCount  = 0
+        self._pushCount = 0
+        self._error     = False
+        self._errorType = ''
+        self._wnopCount = 0
+        self._rnopCount = 0
+        self._maxLevel  = 0
+        self._bulkCount = 0
+        self._errorStep = None
 
     def bulk_pushes(self,num_pushes:int):
         self._pushCount = num_pushes
+        self._bulkCount = num_pushes
+        if self.level > self._maxLevel:
+            self._maxLevel = self.level
+
+    def bulk_ops(self,pushes:int=0,pops:int=0,wnops:int=0,rnops:int=0,maxLevel:int=0):
+        '''
+        Account for a batch of port operations which were sequenced outside of this
+        object (e.g. by a vectorized simulation engine). The caller is responsible
+        for having checked the batch against the depth and empty conditions
+        '''
+        self._pushCount += pushes
+        self._popCount  += pops
+        self._wnopCount += wnops
+        self._rnopCount += rnops
+        if maxLevel > self._maxLevel:
+            self._maxLevel = maxLevel
+
+    def setMaxLevel(self,maxLevel:int):
+        '''
+        Overrides the maximum level, for callers which applied operations out of step
+        order (e.g. a quantum of pushes before a quantum of pops) and know the max level
+        of the operations in step order
+        '''
+        self._maxLevel = maxLevel
+
+    def setError(self,errorType:str,step:int=None):
+        '''
+        Flag an error which was detected outside of push()/pop()
+        '''
+        self._error     = True
+        self._errorType = errorType
+        self._errorStep = step
 
     @property
     def depth(self)->int:
@@ -54,47 +116,142 @@ class Fifo(object):
     def errorType(self)->str:
         return self._errorType
 
+    @property
+    def errorStep(self)->int:
+        '''
+        Port step index (0-based, counting both operations and no-operations of the
+        failing port) at which the error occurred, or None
+        '''
+        return self._errorStep
+
     @property
     def level(self)->int:
-        self.__lock.acquire()
-        tmp = self._pushCount - self._popCount
-        if tmp > self._maxLevel:
-            self._maxLevel = tmp 
-        self.__lock.release()
-        return tmp
-        
+        return self._pushCount - self._popCount
+
+    @property
+    def maxLevel(self)->int:
+        return self._maxLevel
+
+    @property
+    def pushCount(self)->int:
+        '''
+        Number of pushes, excluding the entries pre-loaded with bulk_pushes()
+        '''
+        return self._pushCount - self._bulkCount
+
+    @property
+    def popCount(self)->int:
+        return self._popCount
+
+    @property
+    def wnopCount(self)->int:
+        return self._wnopCount
+
+    @property
+    def rnopCount(self)->int:
+        return self._rnopCount
+
+    @property
+    def opCount(self)->int:
+        '''
+        Number of port operations and no-operations so far (excluding bulk_pushes())
+        '''
+        return self._pushCount - self._bulkCount + self._popCount + self._wnopCount + self._rnopCount
+
     @property
     def bwratio(self)->float:
         '''
-        Write to Read effective bandwidth ratio
+        Write to Read effective bandwidth ratio (infinite when the writer never idled)
         '''
+        if self._wnopCount == 0:
+            return float('inf')
         return (self._rnopCount/self._wnopCount)
 
     def push(self):
-        if self.full:
-            print("Error: FIFO is full!")
-            self._error = True
-            self._errorType = 'overrun'
+        level = self._pushCount - self._popCount
+        if level == self._depth:
+            if not self.quiet:
+                print("Error: FIFO is full!")
+            if self._trace is not None:
+                self._trace.record(self.opCount,level,TraceRecorder.OVERRUN)
+            self.setError('overrun',self._pushCount-self._bulkCount+self._wnopCount)
         else:
+            if self._trace is not None:
+                self._trace.record(self.opCount,level+1,TraceRecorder.PUSH)
             self._pushCount +=1
+            if level >= self._maxLevel:
+                self._maxLevel = level + 1
             if self._verbose:
-                print(f"Pushed entry (level = {self.level})\n")
+                print(f"Pushed entry (level = {level+1})\n")
 
     def pop(self):
-        if self.empty:
-            print("Error: FIFO is empty!")
-            self._error = True
-            self._errorType = 'underrun'
+        level = self._pushCount - self._popCount
+        if level == 0:
+            if not self.quiet:
+                print("Error: FIFO is empty!")
+            if self._trace is not None:
+                self._trace.record(self.opCount,level,TraceRecorder.UNDERRUN)
+            self.setError('underrun',self._popCount+self._rnopCount)
         else:
+            if self._trace is not None:
+                self._trace.record(self.opCount,level-1,TraceRecorder.POP)
             self._popCount +=1
             if self._verbose:
-                print(f"Popped entry (level = {self.level})\n")
+                print(f"Popped entry (level = {level-1})\n")
+
+    def push_n(self,count:int)->int:
+        '''
+        Performs count pushes in one call. When the FIFO fills up first, the push at that
+        index flags an overrun (at the same error step as count calls of push() would)
+        and the remaining pushes are dropped. Returns the number of entries pushed
+        '''
+        level  = self._pushCount - self._popCount
+        pushed = min(count,self._depth - level)
+        if self._trace is not None:
+            self._trace.record_n(self.opCount,level,pushed,TraceRecorder.PUSH)
+            if pushed < count:
+                self._trace.record(self.opCount+pushed,self._depth,TraceRecorder.OVERRUN)
+        self._pushCount += pushed
+        if level + pushed > self._maxLevel:
+            self._maxLevel = level + pushed
+        if self._verbose and pushed > 0:
+            print(f"Pushed {pushed} entries (level = {level+pushed})\n")
+        if pushed < count:
+            if not self.quiet:
+                print("Error: FIFO is full!")
+            self.setError('overrun',self._pushCount-self._bulkCount+self._wnopCount)
+        return pushed
+
+    def pop_n(self,count:int)->int:
+        '''
+        Performs count pops in one call. When the FIFO empties first, the pop at that
+        index flags an underrun (at the same error step as count calls of pop() would)
+        and the remaining pops are dropped. Returns the number of entries popped
+        '''
+        level  = self._pushCount - self._popCount
+        popped = min(count,level)
+        if self._trace is not None:
+            self._trace.record_n(self.opCount,level,popped,TraceRecorder.POP)
+            if popped < count:
+                self._trace.record(self.opCount+popped,0,TraceRecorder.UNDERRUN)
+        self._popCount += popped
+        if self._verbose and popped > 0:
+            print(f"Popped {popped} entries (level = {level-popped})\n")
+        if popped < count:
+            if not self.quiet:
+                print("Error: FIFO is empty!")
+            self.setError('underrun',self._popCount+self._rnopCount)
+        return popped
 
-    def wnop(self):
-        self._wnopCount += 1
+    def wnop(self,count:int=1):
+        if self._trace is not None:
+            self._trace.record_n(self.opCount,self.level,count,TraceRecorder.WNOP)
+        self._wnopCount += count
 
-    def rnop(self):
-        self._rnopCount += 1
+    def rnop(self,count:int=1):
+        if self._trace is not None:
+            self._trace.record_n(self.opCount,self.level,count,TraceRecorder.RNOP)
+        self._rnopCount += count
 
     def __str__(self):
         rstr  = f"depth                  = {self._depth}\n"
@@ -106,4 +263,6 @@ class Fifo(object):
         rstr += f"Fifo max-level reached = {self._maxLevel}\n"
         rstr += f"Simulated W:R BW ratio = {self.bwratio:.2f}\n"
         rstr += f"error-status flag      = {self.error} ({self.errorType})\n"
+        if self._errorStep is not None:
+            rstr += f"error step             = {self._errorStep}\n"
         return rstr
@@ -0,0 +1,213 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import json
+import numpy as np
+
+class FifoPipeline(object):
+    '''
+    Simulates a chain of FIFOs:
+
+        producer -> FIFO[0] -> stage[1] -> FIFO[1] -> ... -> FIFO[N-1] -> consumer
+
+    Every port (producer, intermediate stages and consumer) is active on a step with a
+    probability proportional to its bandwidth. Ports are evaluated from upstream to
+    downstream within a step, so with a single FIFO this is the same model as
+    FifoSimulator. Port activity is drawn in bulk and the whole chain is advanced by a
+    single loop (no thread per stage).
+
+    A port which honors backpressure (stall=True) waits when its upstream FIFO is empty
+    (starve) or its downstream FIFO is full (stall). A port which does not honor
+    backpressure flags an underrun/overrun error instead, which ends the simulation.
+    By default intermediate stages stall while the producer and consumer do not.
+
+    As in FifoSimulator, once the producer has pushed its payload, every downstream port
+    operates on each step until the consumer has popped the full payload, and the drain
+    phase cannot fail.
+    '''
+
+    CHUNK_STEPS = 1<<14 # Number of steps of port activity drawn at once
+
+    def __init__(
+        self,
+        depths:list,
+        bandwidths:list,
+        pl_size:int,
+        initLevels:list=None,
+        stall:list=None,
+        seed:int=None):
+        nfifo = len(depths)
+        assert nfifo > 0, "A pipeline needs at least one FIFO"
+        assert len(bandwidths) == nfifo+1, f"Expected {nfifo+1} port bandwidths (producer, stages and consumer), got {len(bandwidths)}"
+        self._depths     = list(depths)
+        self._bandwidths = list(bandwidths)
+        self._pl_size    = pl_size
+        self._initLevels = list(initLevels) if initLevels is not None else [1]+[0]*(nfifo-1)
+        self._stall      = list(stall) if stall is not None else [False]+[True]*(nfifo-1)+[False]
+        self._rng        = np.random.default_rng(seed)
+
+        assert len(self._initLevels) == nfifo, "Expected one initial level per FIFO"
+        assert len(self._stall) == nfifo+1, "Expected one stall flag per port"
+        for depth,level in zip(self._depths,self._initLevels):
+            assert 0 <= level < depth, f"Initial level {level} outside of [0,depth={depth})"
+        assert sum(self._initLevels) < pl_size, "Initial levels exceed the payload size"
+
+        # Steps are normalized like FifoSimulator: the adjacent port pair with the highest
+        # combined bandwidth has per-step probabilities that sum to 1
+        scale = max(a+b for a,b in zip(self._bandwidths[:-1],self._bandwidths[1:]))
+        self._probs = np.array(self._bandwidths,dtype=np.float64)/scale
+
+        self._reset()
+
+    @classmethod
+    def from_config(cls,path:str,pl_size:int=None,seed:int=None):
+        '''
+        Builds a pipeline from a JSON description of the form:
+
+        {
+          "plsize"   : 10000,
+          "producer" : {"bandwidth": 110},
+          "fifos"    : [{"depth": 64, "initlevel": 8}, {"depth": 32}],
+          "stages"   : [{"bandwidth": 120, "stall": true}],
+          "consumer" : {"bandwidth": 100}
+        }
+
+        "stages" describes the ports between consecutive FIFOs. The payload size from the
+        file takes precedence over pl_size
+        '''
+        with open(path) as f:
+            cfg = json.load(f)
+        fifos  = cfg['fifos']
+        stages = cfg.get('stages',[])
+        assert len(stages) == len(fifos)-1, f"Expected {len(fifos)-1} stages between {len(fifos)} FIFOs"
+        ports  = [cfg['producer']] + stages + [cfg['consumer']]
+        return cls(
+            depths=[f['depth'] for f in fifos],
+            bandwidths=[p['bandwidth'] for p in ports],
+            pl_size=cfg.get('plsize',pl_size),
+            initLevels=[f.get('initlevel',1 if i == 0 else 0) for i,f in enumerate(fifos)],
+            stall=[p.get('stall',0 < i < len(ports)-1) for i,p in enumerate(ports)],
+            seed=seed)
+
+    def _reset(self):
+        nfifo = len(self._depths)
+        self.levels    = list(self._initLevels)
+        self.maxLevel  = list(self._initLevels)
+        self.pushCount = [0]*nfifo
+        self.popCount  = [0]*nfifo
+        self.stalls    = [0]*nfifo # Steps where the upstream port was blocked by a full FIFO
+        self.starves   = [0]*nfifo # Steps where the downstream port found the FIFO empty
+        self.error     = None      # (fifo index,'overrun'|'underrun',step)
+        self.steps     = 0
+
+    def run(self,maxSteps:int=None):
+        '''
+        Simulates the pipeline until the consumer has popped the payload, an error occurs
+        or maxSteps steps have elapsed
+        '''
+        self._reset()
+        nfifo   = len(self._depths)
+        depths  = self._depths
+        stall   = self._stall
+        levels  = self.levels
+        maxlvl  = self.maxLevel
+        pushes  = self.pushCount
+        pops    = self.popCount
+        stalls  = self.stalls
+        starves = self.starves
+
+        rem_push = self._pl_size - sum(self._initLevels) # Remaining producer pushes
+        rem_pop  = self._pl_size                         # Remaining consumer pops
+        step     = 0
+        error    = None
+        flush    = [True]*(nfifo+1)
+
+        while rem_pop > 0 and error is None and (maxSteps is None or step < maxSteps):
+            if rem_push > 0:
+                chunk = (self._rng.random((self.CHUNK_STEPS,nfifo+1)) < self._probs).tolist()
+            else:
+                chunk = [flush]*self.CHUNK_STEPS
+            for act in chunk:
+                draining = rem_push == 0
+
+                # Producer into FIFO[0]
+                if act[0] and not draining:
+                    if levels[0] < depths[0]:
+                        levels[0] += 1
+                        pushes[0] += 1
+                        rem_push  -= 1
+                        if levels[0] > maxlvl[0]:
+                            maxlvl[0] = levels[0]
+                    elif stall[0]:
+                        stalls[0] += 1
+                    else:
+                        error = (0,'overrun',step)
+                        break
+
+                # Intermediate stages from FIFO[i-1] into FIFO[i]
+                for i in range(1,nfifo):
+                    if act[i]:
+                        if levels[i-1] == 0:
+                            if stall[i] or draining:
+                                starves[i-1] += 1
+                            else:
+                                error = (i-1,'underrun',step)
+                                break
+                        elif levels[i] == depths[i]:
+                            if stall[i] or draining:
+                                stalls[i] += 1
+                            else:
+                                error = (i,'overrun',step)
+                                break
+                        else:
+                            levels[i-1] -= 1
+                            pops[i-1]   += 1
+                            levels[i]   += 1
+                            pushes[i]   += 1
+                            if levels[i] > maxlvl[i]:
+                                maxlvl[i] = levels[i]
+                if error is not None:
+                    break
+
+                # Consumer from FIFO[N-1]
+                if act[nfifo]:
+                    if levels[-1] == 0:
+                        if stall[nfifo] or draining:
+                            starves[-1] += 1
+                        else:
+                            error = (nfifo-1,'underrun',step)
+                            break
+                    else:
+                        levels[-1] -= 1
+                        pops[-1]   += 1
+                        rem_pop    -= 1
+
+                step += 1
+                if rem_pop == 0 or (maxSteps is not None and step >= maxSteps):
+                    break
+                if draining != (rem_push == 0):
+                    break # Producer just finished, switch to drain-phase activity
+
+        self.error = error
+        self.steps = step
+
+    def __str__(self):
+        rstr  = f"payload size           = {self._pl_size}\n"
+        rstr += f"simulated steps        = {self.steps}\n"
+        rstr += "port bandwidths        = " + " -> ".join(str(b) for b in self._bandwidths) + "\n\n"
+        rstr += " fifo  depth  init  max-level   pushes     pops   stalls  starves  error\n"
+        for i in range(len(self._depths)):
+            err = self.error[1] if self.error is not None and self.error[0] == i else ''
+            rstr += f"{i:5d} {self._depths[i]:6d} {self._initLevels[i]:5d} {self.maxLevel[i]:10d} {self.pushCount[i]:8d} {self.popCount[i]:8d} {self.stalls[i]:8d} {self.starves[i]:8d}  {err}\n"
+        if self.error is not None:
+            rstr += f"\nerror-status flag      = True ({self.error[1]} of FIFO {self.error[0]} at step {self.error[2]})\n"
+        else:
+            rstr += f"\nerror-status flag      = False ()\n"
+        return rstr
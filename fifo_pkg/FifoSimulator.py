@@ -9,13 +9,30 @@
 # See the License for the specific language governing permissions and limitations under the License.
 
 import threading
+import asyncio
+import collections
 import concurrent.futures
 import random
 import math
+import os
 import numpy as np
 import time
 
 from fifo_pkg.Fifo import Fifo
+from fifo_pkg.BernoulliStream import BernoulliStream
+from fifo_pkg.TrafficModel import TrafficModel,BurstTraffic,OnOffTraffic,PeriodicTraffic
+from fifo_pkg.VectorEngine import VectorEngine
+from fifo_pkg.ReplayEngine import ReplayEngine
+from fifo_pkg.ActivityTrace import ActivityTrace
+from fifo_pkg.MonteCarlo import MonteCarlo
+from fifo_pkg.ExactEngine import ExactEngine
+from fifo_pkg.DepthSolver import DepthSolver
+from fifo_pkg.AdaptiveMonteCarlo import AdaptiveMonteCarlo
+from fifo_pkg.RareEventEstimator import RareEventEstimator
+from fifo_pkg.DepthIndex import DepthIndex
+from fifo_pkg.SimMetrics import SimMetrics
+from fifo_pkg.SimConfig import SimConfig
+from fifo_pkg.SimResult import SimResult
 
 class FifoSimulator(object):
     '''
@@ -23,7 +40,45 @@ class FifoSimulator(object):
     a simple simulation kernel with a configurable simulation quantum
     Each thread operates on the same Fifo object and uses a weighted random distrubtion for
     its operation based on the relative read/write bandwidths
+
+    The 'vectorized' engine replaces the threads with bulk draws of the same Bernoulli
+    streams (see VectorEngine) and is intended for large payloads. It advances in chunks
+    of chunkSteps steps in constant memory, calling progress after each chunk. When more than one
+    trial is requested, independent trials are simulated as a Monte Carlo batch with the
+    vectorized engine (see MonteCarlo)
+
+    With adaptiveQuantum, the threaded and asyncio engines pick the quantum of each round
+    (a producer quantum followed by a consumer quantum) from the FIFO level: the distance
+    to the nearest bound (empty or full), capped by simQuantum (no cap when simQuantum <= 0).
+    Within such a round neither port can reach a bound in any order of its operations, so
+    the quantum shrinks to 1 near the bounds and errors are detected as with a quantum of 1
+
+    The 'asyncio' engine runs the same kernel/producer/consumer protocol as coroutines
+    on an event loop, where each quantum ends at a yield point. Many simulators can
+    share one event loop via simulate_concurrently()
+
+    The 'exact' engine does not sample at all: it computes the overrun/underrun
+    probabilities of the model (see ExactEngine), and with exactLevels > 0 the max-level
+    distribution from that many more depths (each as costly as the configured one)
+
+    Each port follows a traffic model (see TrafficModel and MODELS), i.i.d. Bernoulli by
+    default. Bursty models are supported by single runs of the threaded, asyncio and
+    vectorized engines, where the vectorized engine replays them with ReplayEngine.
+
+    Captured per-cycle producer and/or consumer activity (see ActivityTrace) can replace
+    the random streams with the 'vectorized' engine. Traces are streamed from disk in
+    chunks (see ReplayEngine)
     '''
+
+    ENGINES = ('threaded','vectorized','asyncio','exact')
+
+    # Traffic models by name, and the name of their optional parameter
+    MODELS  = {
+        'bernoulli' : (BernoulliStream,None),
+        'burst'     : (BurstTraffic,'burst'),
+        'onoff'     : (OnOffTraffic,'meanOn'),
+        'periodic'  : (PeriodicTraffic,'period')}
+
     def __init__(
         self,
         fifoHandle:Fifo,
@@ -32,139 +87,550 @@ class FifoSimulator(object):
         readBandwidth:int=100,
         initLevel:int=None,
         nosim:bool=False,
-        simQuantum:int=1):
+        simQuantum:int=1,
+        adaptiveQuantum:bool=False,
+        engine:str='threaded',
+        exactLevels:int=0,
+        trials:int=1,
+        seed:int=None,
+        writeTrace:ActivityTrace=None,
+        readTrace:ActivityTrace=None,
+        chunkSteps:int=None,
+        progress=None,
+        writeModel:str='bernoulli',
+        readModel:str='bernoulli'):
         self._fifo       = fifoHandle
-        self._pl_size    = pl_size
-        self._wrate      = writeBandwidth
-        self._rrate      = readBandwidth
-        self._init_level = initLevel
         self._nosim      = nosim
+        self._wtrace     = writeTrace
+        self._rtrace     = readTrace
+        self._progress   = progress   # Per-chunk progress callback of the vectorized engine
+        self._executor   = None       # Worker threads of the threaded engine, reused by every run
+        self._report     = False      # Progress messages of the threads (only printed by simulate())
+        self._config     = None
+        self._seedSeq    = np.random.SeedSequence() # Root of the streams of unseeded runs
+        self.reset(SimConfig(
+            depth=fifoHandle.depth,
+            pl_size=pl_size,
+            writeBandwidth=writeBandwidth,
+            readBandwidth=readBandwidth,
+            initLevel=initLevel,
+            simQuantum=simQuantum,
+            adaptiveQuantum=adaptiveQuantum,
+            engine=engine,
+            exactLevels=exactLevels,
+            trials=trials,
+            seed=seed,
+            chunkSteps=chunkSteps,
+            writeModel=writeModel,
+            readModel=readModel))
 
-        assert pl_size > simQuantum, f"simQuantum ({simQuantum}) > pl_size({pl_size})"
-        assert initLevel<self._pl_size, f"Specified init_level={initLevel} greater or equal to pl_size={self._pl_size}"
+    @classmethod
+    def from_config(cls,config:SimConfig,**kwargs):
+        '''
+        Builds a simulator (and its Fifo) from a SimConfig. The remaining constructor
+        arguments (e.g. progress) can be passed as keyword arguments
+        '''
+        return cls(
+            fifoHandle=Fifo(depth=config.depth),
+            pl_size=config.pl_size,
+            writeBandwidth=config.writeBandwidth,
+            readBandwidth=config.readBandwidth,
+            initLevel=config.initLevel,
+            simQuantum=config.simQuantum,
+            adaptiveQuantum=config.adaptiveQuantum,
+            engine=config.engine,
+            exactLevels=config.exactLevels,
+            trials=config.trials,
+            seed=config.seed,
+            chunkSteps=config.chunkSteps,
+            writeModel=config.writeModel,
+            readModel=config.readModel,
+            **kwargs)
 
-        if simQuantum <= 0:
-            self._simQuantum = self.autoQuantum()
-            print(f"Auto quantum-mode selected. Caclulated quantum={self._simQuantum}\n")
-        else:
-            self._simQuantum = simQuantum
+    @property
+    def config(self)->SimConfig:
+        return self._config
 
-        if initLevel:
-            assert initLevel<self._fifo.depth, f"Specified init_level={initLevel} greater or equal to depth={self._fifo.depth}"
-            self._fifo.bulk_pushes(initLevel)
+    def reset(self,config:SimConfig=None):
+        '''
+        Prepares the simulator for another run without printing anything, optionally with
+        another configuration (the Fifo is emptied, and resized to the depth of config).
+        The traffic models are re-created from the seed of a seeded configuration, so that
+        a seeded run is reproduced. Otherwise they are spawned from one seed sequence owned
+        by the simulator, so that unseeded runs are independent samples
+        '''
+        config = self._config if config is None else config
+        engine,simQuantum,initLevel,trials = config.engine,config.simQuantum,config.initLevel,config.trials
+        assert engine in FifoSimulator.ENGINES, f"Unknown engine '{engine}', expected one of {FifoSimulator.ENGINES}"
+        assert config.pl_size > simQuantum, f"simQuantum ({simQuantum}) > pl_size({config.pl_size})"
+        assert initLevel is None or initLevel<config.pl_size, f"Specified init_level={initLevel} greater or equal to pl_size={config.pl_size}"
+        assert initLevel is None or initLevel<config.depth, f"Specified init_level={initLevel} greater or equal to depth={config.depth}"
+        if self._wtrace is not None or self._rtrace is not None:
+            assert engine == 'vectorized' and trials == 1, "Activity traces are replayed by single runs of the vectorized engine"
+            for trace in (self._wtrace,self._rtrace):
+                if trace is not None:
+                    trace.rewind()
+
+        self._config     = config
+        self._pl_size    = config.pl_size
+        self._wrate      = config.writeBandwidth
+        self._rrate      = config.readBandwidth
+        self._engine     = engine
+        self._exactLevels = config.exactLevels
+        self._trials     = trials
+        self._seed       = config.seed
+        self._chunkSteps = config.chunkSteps # Steps per chunk of the vectorized engine
+        self._adaptive   = config.adaptiveQuantum
+        if self._adaptive:
+            self._simQuantum = config.depth if simQuantum <= 0 else simQuantum # Max quantum
         else:
-            self._fifo.bulk_pushes(1) # Always assume one entry in the FIFO before we start the sim
+            self._simQuantum = self.autoQuantum() if simQuantum <= 0 else simQuantum
+        self._quantum    = self._simQuantum # Quantum of the current round
+        self._round      = None # Start level, max level and push steps of an adaptive round
+        self._mc         = None
+        self._exact      = None
+        self._replay     = None
+        self._ran        = False
+
+        # Always assume one entry in the FIFO before we start the sim. The producer pushes
+        # the rest of the payload (pl_size minus the start level, also with initLevel=0), as
+        # in the vectorized and exact engines
+        self._fifo.reset(config.depth)
+        self._fifo.bulk_pushes(initLevel if initLevel else 1)
+        self._start_level = self._fifo.level
+
+        # The producer and consumer each own a seeded stream of activity outcomes, spawned
+        # from the simulation seed, so a seeded run is reproducible
+        wseed,rseed = TrafficModel.spawn(config.seed if config.seed is not None else self._seedSeq,2)
+        wrate,rrate   = config.writeBandwidth,config.readBandwidth
+        self._wstream = self.trafficModel(config.writeModel,float(wrate/(wrate+rrate)),wseed)
+        self._rstream = self.trafficModel(config.readModel,float(rrate/(wrate+rrate)),rseed)
+        self._bursty  = not (isinstance(self._wstream,BernoulliStream) and isinstance(self._rstream,BernoulliStream))
+        if self._bursty:
+            assert engine != 'exact' and trials == 1, "Traffic models other than bernoulli are only supported by single runs of the threaded/asyncio/vectorized engines"
 
         # We create a single event object per thread. Each thread communicates with the kernel by
         # pushing its inactive event into a pend-queue and then blocking by waiting for that event
-        # to become active.
+        # to become active. The thread deactivates its event once it has been woken.
         self._kernelEvents = {
             'e_producer' : threading.Event(),
             'e_consumer' : threading.Event()
         }
+        # Round-robin rank of each thread's event (see nextEvent)
+        self._eventRank = {ev:rank for rank,ev in enumerate(self._kernelEvents.values())}
+        self._lastRank  = -1
 
-        self._maxqlen = 0     # Stat variable to track maximum size of sim kernel event queue
-        self._evcount = 0     # Stat variable to track total number of simulation events
-        self._pendq = []      # Pended events queue
+        self._metrics = SimMetrics(engine,self._simQuantum,trials,adaptive=self._adaptive) # Performance metrics of the run
+        self._pendq = collections.deque() # Pended events queue
         self._threadCount = 0 # Number of active sim kernel threads
 
-        # Thread synchronization lock (bound)
+        # Thread synchronization lock (bound) and the condition on which the kernel blocks
+        # until a thread pends or ends
         self.__lock = threading.Lock()
-
-        # Thread call handles
-        self._threadList = []
+        self.__kernelCond = threading.Condition(self.__lock)
 
         # Flag to reflect that all pushes are done which allows consumer thread to no longer
         # block and just finish consuming
         self._pushesDone = False
 
+    def close(self):
+        '''
+        Shuts down the worker threads of the threaded engine
+        '''
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
+
+    @staticmethod
+    def trafficModel(spec:str,p:float,seed=None)->TrafficModel:
+        '''
+        Creates a traffic model from a 'name[:parameter]' spec (e.g. 'bernoulli', 'burst:16',
+        'onoff:4.5' or 'periodic:100'), see MODELS
+        '''
+        name,_,param = spec.partition(':')
+        assert name in FifoSimulator.MODELS, f"Unknown traffic model '{name}', expected one of {tuple(FifoSimulator.MODELS)}"
+        cls,pname = FifoSimulator.MODELS[name]
+        if not param:
+            return cls(p,seed=seed)
+        assert pname is not None, f"Traffic model '{name}' takes no parameter"
+        return cls(p,seed=seed,**{pname:float(param) if name == 'onoff' else int(param)})
+
     def autoQuantum (self)->int:
         '''
         Determines automatic sim quantum based on payload size
         '''
         return int(max(1,self._pl_size/1000))
 
+    def roundQuantum(self)->int:
+        '''
+        Picks the quantum of the next round of producer and consumer operations. An
+        adaptive quantum is the distance of the FIFO level to the nearest bound, so that
+        the round can neither overrun (at most that many pushes) nor underrun (at most that
+        many pops after the pushes of the round), which holds in any order of the
+        operations. Each adaptive quantum is counted in the quantum histogram
+        '''
+        if self._adaptive:
+            level = self._fifo.level
+            self._quantum = max(1,min(self._simQuantum,level,self._fifo.depth-level))
+            counts = self._metrics.quantumCounts
+            counts[self._quantum] = counts.get(self._quantum,0) + 1
+        return self._quantum
+
+    def roundMaxLevel(self,pops:list):
+        '''
+        Replaces the max level of an adaptive round, where the producer pushed its whole
+        quantum before the consumer popped, by the max level of the operations in step
+        order: after the push at step i, the level is the start level plus the pushes up to
+        step i minus the pops before step i
+        '''
+        level,maxLevel,pushes = self._round
+        self._round = None
+        if pushes:
+            rise = np.arange(1,len(pushes)+1) - np.searchsorted(np.array(pops,dtype=np.int64),pushes)
+            maxLevel = max(maxLevel,level + int(rise.max()))
+        self._fifo.setMaxLevel(maxLevel)
+
     def threadStart(self):
-        self.__lock.acquire()
-        self._threadCount += 1
-        self.__lock.release()
+        '''
+        Registers a client thread with the kernel. This is called before the thread is
+        launched so that the kernel can never observe an empty set of client threads
+        '''
+        with self.__kernelCond:
+            self._metrics.lockAcquisitions += 1
+            self._threadCount += 1
 
     def threadEnd(self):
-        self.__lock.acquire()
-        self._threadCount -= 1
-        self.__lock.release()
+        with self.__kernelCond:
+            self._metrics.lockAcquisitions += 1
+            self._threadCount -= 1
+            self.__kernelCond.notify()
 
     def threadPend(self,ev:threading.Event):
         '''
-        This method places a blocking thread's event into a pend queue
+        This method places a blocking thread's event into a pend queue and wakes the kernel
+        '''
+        with self.__kernelCond:
+            self._metrics.lockAcquisitions += 1
+            self._pendq.append(ev)
+            self.__kernelCond.notify()
+
+    def threadYield(self,ev:threading.Event):
+        '''
+        Hands control back to the kernel by pending the thread's event and blocking until
+        the kernel activates it. The thread deactivates its own event after waking, so an
+        activation cannot be lost when the kernel runs before the thread reaches wait()
         '''
-        self.__lock.acquire()
-        self._pendq.append(ev)
-        self.__lock.release()
+        self.threadPend(ev)
+        t0 = time.perf_counter()
+        ev.wait()
+        self._metrics.blockedTime += time.perf_counter() - t0
+        ev.clear()
+
+    def nextEvent(self):
+        '''
+        Removes and returns the pended event to activate next. Events are activated in
+        round-robin order of their threads (producer first), which makes the interleaving
+        of operations independent of OS thread scheduling
+        '''
+        n   = len(self._eventRank)
+        if self._eventRank[self._pendq[0]] == (self._lastRank+1) % n:
+            ev = self._pendq.popleft() # Pend order already matches (the common case)
+        else:
+            idx = min(range(len(self._pendq)),key=lambda i: (self._eventRank[self._pendq[i]]-self._lastRank-1) % n)
+            ev  = self._pendq[idx]
+            del self._pendq[idx]
+        self._lastRank = self._eventRank[ev]
+        return ev
 
     def kernel_thread(self):
         '''
-        This thread implements a simple simulator kernel which sequences thread events
-        based on the pend queue order. As pended events are popped from the queue, they
-        are set to unblock each thread.
-        '''
-        time.sleep(0.1) # Block time for threads to register active state
-        print("Starting kernel thread...")
-        while self._threadCount > 0:
-            if len(self._pendq) > 0:
-                if len(self._pendq) > self._maxqlen:
-                    self._maxqlen = len(self._pendq)
-                cur_ev = self._pendq.pop(0)
-                self._evcount += 1
+        This thread implements a simple simulator kernel which sequences thread events.
+        The kernel waits until every live thread has pended its event, and then sets the
+        next event in round-robin order to unblock one thread for one quantum. The kernel
+        blocks on a condition variable while a thread runs, rather than polling.
+        '''
+        self._log("Starting kernel thread...")
+        metrics = self._metrics
+        with self.__kernelCond:
+            metrics.lockAcquisitions += 1
+            while True:
+                while len(self._pendq) < self._threadCount:
+                    self.__kernelCond.wait()
+                    metrics.kernelWakeups    += 1
+                    metrics.lockAcquisitions += 1
+                    if len(self._pendq) < self._threadCount:
+                        metrics.idleSpins += 1
+                if len(self._pendq) == 0:
+                    break # No more client threads
+                if len(self._pendq) > metrics.queuePeak:
+                    metrics.queuePeak = len(self._pendq)
+                cur_ev = self.nextEvent()
+                metrics.kernelEvents += 1
                 # The below assertion checks that any event pulled from queue must be inactive
                 assert not cur_ev.is_set(), "Event queue ERROR, active event found"
                 cur_ev.set()
-                cur_ev.clear()
-        print("Ending kernel thread, no more client threads.")
-        assert len(self._pendq) == 0, "Kernel ERROR, event queue has entries without active threads"
+        self._log("Ending kernel thread, no more client threads.")
 
-    def producer_thread(self,ev:threading.Event):
-        self.threadStart()
-        print("Started Fifo producer thread...")
-        rem_pl = self._pl_size - self._init_level
-        quant_count = self._simQuantum
-        while rem_pl>0 and not self._fifo.error:
-            if FifoSimulator.getRandomBool([self._wrate,self._rrate])==True:
+    def producerQuantum(self,rem_pl:int)->tuple:
+        '''
+        Performs one quantum of producer operations with bulk Fifo calls. Within a quantum
+        the FIFO level only rises, so an overrun can only happen at the push which exceeds
+        the free space, and only the no-operations before that push take place. The
+        quantum ends early once the payload is pushed or on an overrun. The producer
+        quantum starts a round (see roundQuantum).
+        Returns the remaining payload and the number of steps taken
+        '''
+        quantum = self.roundQuantum()
+        if quantum == 1:
+            if self._wstream.next():
                 self._fifo.push()
-                rem_pl -= 1
-            else:
-                self._fifo.wnop() # no-operation
-            if quant_count == 1:
-                quant_count = self._simQuantum # reset the quantum
-                self.threadPend(ev)
-                ev.wait()
-            else:
-                quant_count -= 1
-        self._pushesDone = True # Tell consumer, we are done pushing
-        self.threadEnd()
+                return (rem_pl-1,1)
+            self._fifo.wnop()
+            return (rem_pl,1)
+        outcomes = self._wstream.take(quantum)
+        ops = [i for i,op in enumerate(outcomes) if op]
+        if len(ops) >= rem_pl:
+            del outcomes[ops[rem_pl-1]+1:]
+            del ops[rem_pl:]
+        space = self._fifo.depth - self._fifo.level
+        if len(ops) > space:
+            self._fifo.wnop(ops[space]-space)
+            self._fifo.push_n(space+1)
+            return (rem_pl-space,ops[space]+1)
+        if self._adaptive:
+            # A round cut short by the final push still yields, so that the consumer steps of
+            # the round run before the drain
+            self._quantum = len(outcomes)
+            self._round   = (self._fifo.level,self._fifo.maxLevel,ops)
+        self._fifo.wnop(len(outcomes)-len(ops))
+        self._fifo.push_n(len(ops))
+        return (rem_pl-len(ops),len(outcomes))
 
-    def consumer_thread(self,ev:threading.Event):
-        self.threadStart()
-        print("Started Fifo consumer thread...")
-        rem_pl = self._pl_size
-        quant_count = self._simQuantum
-        while rem_pl>0 and not self._fifo.error:
+    def consumerQuantum(self,rem_pl:int)->tuple:
+        '''
+        Consumer counterpart of producerQuantum(), where the FIFO level only falls. Once the
+        producer is done, the consumer pops on every step, so the remaining payload is
+        popped in one call. Returns the remaining payload and the number of steps taken
+        '''
+        if self._pushesDone:
             # Don't call the randomizer if producer is done as this skewes the effective
             # bandwidth ratio metrics
-            if self._pushesDone or FifoSimulator.getRandomBool([self._rrate,self._wrate])==True:
+            popped = self._fifo.pop_n(rem_pl)
+            return (rem_pl-popped,popped+1 if popped < rem_pl else popped)
+        if self._quantum == 1:
+            if self._rstream.next():
                 self._fifo.pop()
-                rem_pl -= 1
-            else:
-                self._fifo.rnop() # no-operation
-            # Only pend if the producer thread is still active
-            if not self._pushesDone:
-                if quant_count == 1:
-                    quant_count = self._simQuantum # reset the quantum
-                    self.threadPend(ev)
-                    ev.wait()
-                else:
-                    quant_count -= 1
-        self.threadEnd()
+                return (rem_pl-1,1)
+            self._fifo.rnop()
+            return (rem_pl,1)
+        outcomes = self._rstream.take(self._quantum)
+        ops = [i for i,op in enumerate(outcomes) if op]
+        if len(ops) >= rem_pl:
+            del outcomes[ops[rem_pl-1]+1:]
+            del ops[rem_pl:]
+        avail = self._fifo.level
+        if len(ops) > avail:
+            self._fifo.rnop(ops[avail]-avail)
+            self._fifo.pop_n(avail+1)
+            return (rem_pl-avail,ops[avail]+1)
+        if self._round is not None:
+            self.roundMaxLevel(ops)
+        self._fifo.rnop(len(outcomes)-len(ops))
+        self._fifo.pop_n(len(ops))
+        return (rem_pl-len(ops),len(outcomes))
+
+    def producer_thread(self,ev:threading.Event):
+        self._log("Started Fifo producer thread...")
+        try:
+            self.threadYield(ev) # Wait for the kernel, so that the first quantum is sequenced too
+            rem_pl = self._pl_size - self._start_level
+            while rem_pl>0 and not self._fifo.error:
+                rem_pl,steps = self.producerQuantum(rem_pl)
+                if steps == self._quantum:
+                    self.threadYield(ev) # Quantum done
+        finally:
+            self._pushesDone = True # Tell consumer, we are done pushing
+            self.threadEnd()
+
+    def consumer_thread(self,ev:threading.Event):
+        self._log("Started Fifo consumer thread...")
+        try:
+            self.threadYield(ev) # Wait for the kernel, so that the first quantum is sequenced too
+            rem_pl = self._pl_size
+            while rem_pl>0 and not self._fifo.error:
+                drain = self._pushesDone
+                rem_pl,steps = self.consumerQuantum(rem_pl)
+                # Only pend if the producer thread is still active
+                if not drain and steps == self._quantum:
+                    self.threadYield(ev)
+        finally:
+            self.threadEnd()
+
+    async def taskEnd(self):
+        async with self._asyncCond:
+            self._metrics.lockAcquisitions += 1
+            self._threadCount -= 1
+            self._asyncCond.notify()
+
+    async def taskYield(self,ev:asyncio.Event):
+        '''
+        Coroutine counterpart of threadYield(): pends the task's event, wakes the kernel
+        and suspends the task until the kernel activates the event
+        '''
+        async with self._asyncCond:
+            self._metrics.lockAcquisitions += 1
+            self._pendq.append(ev)
+            self._asyncCond.notify()
+        t0 = time.perf_counter()
+        await ev.wait()
+        self._metrics.blockedTime += time.perf_counter() - t0
+        ev.clear()
+
+    async def kernel_task(self):
+        '''
+        Cooperative scheduler which sequences the producer/consumer tasks in pend order,
+        following the same protocol as kernel_thread()
+        '''
+        metrics = self._metrics
+        async with self._asyncCond:
+            metrics.lockAcquisitions += 1
+            while True:
+                while len(self._pendq) < self._threadCount:
+                    await self._asyncCond.wait()
+                    metrics.kernelWakeups    += 1
+                    metrics.lockAcquisitions += 1
+                    if len(self._pendq) < self._threadCount:
+                        metrics.idleSpins += 1
+                if len(self._pendq) == 0:
+                    break # No more client tasks
+                if len(self._pendq) > metrics.queuePeak:
+                    metrics.queuePeak = len(self._pendq)
+                cur_ev = self.nextEvent()
+                metrics.kernelEvents += 1
+                assert not cur_ev.is_set(), "Event queue ERROR, active event found"
+                cur_ev.set()
+
+    async def producer_task(self,ev:asyncio.Event):
+        try:
+            await self.taskYield(ev) # Wait for the kernel, as the producer thread does
+            rem_pl = self._pl_size - self._start_level
+            while rem_pl>0 and not self._fifo.error:
+                rem_pl,steps = self.producerQuantum(rem_pl)
+                if steps == self._quantum:
+                    await self.taskYield(ev)
+        finally:
+            self._pushesDone = True # Tell consumer, we are done pushing
+            await self.taskEnd()
+
+    async def consumer_task(self,ev:asyncio.Event):
+        try:
+            await self.taskYield(ev) # Wait for the kernel, as the consumer thread does
+            rem_pl = self._pl_size
+            while rem_pl>0 and not self._fifo.error:
+                drain = self._pushesDone
+                rem_pl,steps = self.consumerQuantum(rem_pl)
+                # Only pend if the producer task is still active
+                if not drain and steps == self._quantum:
+                    await self.taskYield(ev)
+        finally:
+            await self.taskEnd()
+
+    async def async_sim(self):
+        '''
+        Simulates this object's Fifo with kernel, producer and consumer coroutines on the
+        running event loop
+        '''
+        # Synchronization objects are created here so that they bind to the running loop
+        self._asyncCond   = asyncio.Condition()
+        self._threadCount = 2
+        pev,cev = asyncio.Event(),asyncio.Event()
+        self._eventRank   = {pev:0,cev:1}
+        self._lastRank    = -1
+        await asyncio.gather(
+            self.kernel_task(),
+            self.producer_task(ev=pev),
+            self.consumer_task(ev=cev))
+
+    @staticmethod
+    def simulate_concurrently(simulators:list):
+        '''
+        Simulates several FifoSimulator objects concurrently on a single event loop. No
+        threads are created, and the results are available on each simulator's Fifo
+        '''
+        async def run_all():
+            await asyncio.gather(*(sim.async_sim() for sim in simulators))
+        asyncio.run(run_all())
+
+    def vectorized_sim(self):
+        '''
+        Simulates the producer and consumer streams in bulk and back-annotates the
+        resulting statistics onto the Fifo object
+        '''
+        engine = VectorEngine(
+            depth=self._fifo.depth,
+            pl_size=self._pl_size,
+            writeBandwidth=self._wrate,
+            readBandwidth=self._rrate,
+            initLevel=self._start_level,
+            rng=np.random.default_rng(self._seed),
+            chunkSteps=self._chunkSteps)
+        engine.run(trials=1,progress=self._progress)
+        engine.annotate(self._fifo)
+
+    def replay_sim(self)->ReplayEngine:
+        '''
+        Replays the activity traces (each port without a trace follows its traffic model)
+        and back-annotates the resulting statistics onto the Fifo object
+        '''
+        self._replay = ReplayEngine(
+            depth=self._fifo.depth,
+            pl_size=self._pl_size,
+            initLevel=self._start_level,
+            writeSource=self._wtrace if self._wtrace is not None else self._wstream,
+            readSource=self._rtrace if self._rtrace is not None else self._rstream,
+            chunkSize=self._chunkSteps)
+        self._replay.run(progress=self._progress)
+        self._replay.annotate(self._fifo)
+        return self._replay
+
+    def batch_sim(self)->MonteCarlo:
+        '''
+        Simulates independent trials of this configuration as a Monte Carlo batch
+        '''
+        self._mc = MonteCarlo(
+            depth=self._fifo.depth,
+            pl_size=self._pl_size,
+            writeBandwidth=self._wrate,
+            readBandwidth=self._rrate,
+            initLevel=self._start_level,
+            trials=self._trials,
+            seed=self._seed,
+            chunkSteps=self._chunkSteps)
+        self._mc.run(progress=self._progress)
+        return self._mc
+
+    def exact_sim(self)->ExactEngine:
+        '''
+        Computes the exact outcome probabilities of this configuration. The formulaic depth
+        is evaluated as well when it does not exceed the FIFO depth, and exactLevels more
+        depths for the max-level distribution
+        '''
+        engine = ExactEngine(
+            depth=self._fifo.depth,
+            pl_size=self._pl_size,
+            writeBandwidth=self._wrate,
+            readBandwidth=self._rrate,
+            initLevel=self._start_level,
+            maxLevelPoints=self._exactLevels,
+            extraDepths=[self.calcDepth()])
+        engine.run()
+        return engine
 
     def calcDepth(self):
         '''
@@ -176,48 +642,337 @@ class FifoSimulator(object):
         rdepth = self._pl_size * (1.0 - float(self._wrate)/float(self._rrate))
         return math.ceil(max((wdepth),(rdepth)))
     
-    def simulate(self):
+    @property
+    def metrics(self)->SimMetrics:
+        return self._metrics
+
+    def solve(self,target:float):
         '''
-        Performs the multi-threaded simulation and formulaic calculation
+        Searches the smallest initial level and depth which meet a target overrun/underrun
+        probability and reports them next to the formulaic calculation
         '''
+        assert not self._bursty, "The depth solver only supports the bernoulli traffic model"
+        trials = self._trials if self._trials > 1 else DepthSolver.DEFAULT_TRIALS
+        print(f"Solving for target failure probability {target:g} ({trials} trials per batch)...")
+        self._metrics.start()
+        solver = DepthSolver(
+            pl_size=self._pl_size,
+            writeBandwidth=self._wrate,
+            readBandwidth=self._rrate,
+            target=target,
+            trials=trials,
+            seed=self._seed)
+        depth,level = solver.solve()
+        self._metrics.stop()
 
-        if self._nosim:
-            print("Skipping simulation...\n")
+        print("\nDepth Solver Summary:")
+        print("---------------------")
+        print(solver)
+        print(f"Total solver time (seconds)       = {self._metrics.wallTime:.1f}\n")
+        print(f"Required Fifo depth per simulation            = {depth} (initial level {level})")
+        print(f"Required Fifo depth per formulaic calculation = {self.calcDepth()}")
+        return (depth,level)
+
+    def estimate(self,relError:float,confidence:float=0.95,interval:str='wilson',event:str='failure',maxTrials:int=10000000,maxTime:float=None)->AdaptiveMonteCarlo:
+        '''
+        Estimates the overrun/underrun probability of this configuration to a relative
+        error, with rounds of Monte Carlo trials which stop once the confidence interval
+        is narrow enough or a budget runs out (see AdaptiveMonteCarlo), and reports it
+        '''
+        assert not self._bursty, "The adaptive Monte Carlo estimator only supports the bernoulli traffic model"
+        budget = f"{maxTrials} trials" + (f", {maxTime:g} seconds" if maxTime is not None else "")
+        print(f"Estimating {event} probability to a relative error of {relError:g} (budget {budget})...")
+        self._metrics.start()
+        estimator = AdaptiveMonteCarlo(
+            depth=self._fifo.depth,
+            pl_size=self._pl_size,
+            writeBandwidth=self._wrate,
+            readBandwidth=self._rrate,
+            initLevel=self._start_level,
+            relError=relError,
+            confidence=confidence,
+            interval=interval,
+            event=event,
+            maxTrials=maxTrials,
+            maxTime=maxTime,
+            seed=self._seed,
+            chunkSteps=self._chunkSteps)
+        def progress(est:AdaptiveMonteCarlo):
+            print(f"Round {est.rounds}: {est.trials} trials, {event} probability {est.probability():.4e} (relative error {est.relativeError():.4f})")
+        estimator.run(progress=progress)
+        self._metrics.ops = estimator.ops
+        self._metrics.stop()
+
+        print("\nAdaptive Monte Carlo Summary:")
+        print("-----------------------------")
+        print(estimator)
+        if estimator.converged:
+            print(f"Precision met after {estimator.trials} trials")
         else:
-            print("Running simulation...")
+            print(f"Precision NOT met: {estimator.stopReason} budget exhausted after {estimator.trials} trials")
+        print(f"\nRequired Fifo depth per formulaic calculation = {self.calcDepth()}")
+        return estimator
+
+    def rareEvent(self,confidence:float=0.95)->dict:
+        '''
+        Estimates small overrun and underrun probabilities with importance sampling (see
+        RareEventEstimator), with --trials trials per event, and reports them. Returns the
+        estimator of each event
+        '''
+        assert not self._bursty, "The rare-event estimator only supports the bernoulli traffic model"
+        trials = self._trials if self._trials > 1 else RareEventEstimator.DEFAULT_TRIALS
+        print(f"Estimating overrun/underrun probabilities with importance sampling ({trials} trials per event)...")
+        self._metrics.start()
+        seeds = TrafficModel.spawn(self._seed,len(RareEventEstimator.EVENTS))
+        estimators = {}
+        for event,seed in zip(RareEventEstimator.EVENTS,seeds):
+            estimators[event] = RareEventEstimator(
+                depth=self._fifo.depth,
+                pl_size=self._pl_size,
+                writeBandwidth=self._wrate,
+                readBandwidth=self._rrate,
+                initLevel=self._start_level,
+                event=event,
+                trials=trials,
+                confidence=confidence,
+                seed=seed)
+            estimators[event].run()
+        self._metrics.ops = sum(est.ops for est in estimators.values())
+        self._metrics.stop()
 
-            # Define all thread call handles and add them to the thread-list
-            self._threadList.append(lambda : self.kernel_thread()) 
-            self._threadList.append(lambda : self.producer_thread(ev=self._kernelEvents['e_producer']))
-            self._threadList.append(lambda : self.consumer_thread(ev=self._kernelEvents['e_consumer']))
+        # The estimates are independent, so their variances add up
+        failure = sum(est.probability for est in estimators.values())
+        stdError = math.sqrt(sum(est.variance for est in estimators.values()))
+        for event,est in estimators.items():
+            print(f"\nRare-Event ({event}) Summary:")
+            print("-"*(len(event)+22))
+            print(est)
+        print(f"Failure probability    = {failure:.6e} (standard error {stdError:.3e})")
+        print(f"Total wall time (seconds) = {self._metrics.wallTime:.2f}")
+        print(f"\nRequired Fifo depth per formulaic calculation = {self.calcDepth()}")
+        return estimators
 
-            # max_workers=None essentially does not constrain things
-            with concurrent.futures.ThreadPoolExecutor(max_workers=None) as executor:
-                futures = {executor.submit(x): x for x in self._threadList}
+    def depthIndex(self,path:str=None,depths:list=None,levels:list=None,target:float=None)->DepthIndex:
+        '''
+        Builds a depth-query index of this payload and bandwidth configuration with --trials
+        trials (see DepthIndex), or loads it from path when that file exists, and reports
+        the overrun/underrun rates of each depth and initial level (this simulator's depth
+        and initial level by default). With a target, the smallest depth whose overrun rate
+        meets it is reported for each initial level. A newly built index is saved to path
+        '''
+        assert not self._bursty, "The depth-query index only supports the bernoulli traffic model"
+        depths = depths or [self._fifo.depth]
+        levels = levels or [self._start_level]
+        self._metrics.start()
+        if path is not None and os.path.exists(path):
+            index = DepthIndex.load(path)
+            assert (index.pl_size,index.writeBandwidth,index.readBandwidth) == (self._pl_size,self._wrate,self._rrate), \
+                f"Index {path} was built for payload {index.pl_size}, bandwidths {index.writeBandwidth}/{index.readBandwidth}"
+            assert max(depths) <= index.maxDepth, f"Index {path} only answers depths up to {index.maxDepth}"
+            print(f"Loaded depth-query index from {path}")
+        else:
+            trials = self._trials if self._trials > 1 else DepthIndex.DEFAULT_TRIALS
+            print(f"Building depth-query index ({trials} trials, depths up to {max(depths)})...")
+            index = DepthIndex(
+                pl_size=self._pl_size,
+                writeBandwidth=self._wrate,
+                readBandwidth=self._rrate,
+                trials=trials,
+                maxDepth=max(depths),
+                seed=self._seed).build(progress=self._progress)
+            if path is not None:
+                index.save(path)
+                print(f"Saved depth-query index to {path}")
+        self._metrics.stop()
 
-                # The future handle provides an iterator of all threads.
-                # The order of the iterator follows completion.
-                for future in concurrent.futures.as_completed(futures):
-                    try:
-                        _ = future.result()
-                    except Exception as exc:
-                        print(f"{future} : {exc}")
+        print("\nDepth-Query Index Summary:")
+        print("--------------------------")
+        print(index)
+        print(f"{'depth':>8} {'initlevel':>10} {'overrun':>12} {'underrun':>12} {'failure':>12}")
+        t0 = time.perf_counter()
+        for level in levels:
+            for depth in depths:
+                if depth <= level:
+                    continue
+                over,under = index.query(depth,level)
+                print(f"{depth:>8} {level:>10} {over:>12.4e} {under:>12.4e} {over+under:>12.4e}")
+        if target is not None:
+            print(f"\nMin depth with overrun rate <= {target:g} (resolution {1/index.trials:.1e}):")
+            for level in levels:
+                depth = index.minDepth(level,target)
+                if depth is None:
+                    print(f"initlevel {level:>6}: none up to depth {index.maxDepth}")
+                else:
+                    print(f"initlevel {level:>6}: depth {depth} (underrun rate {index.query(depth,level)[1]:.4e})")
+        print(f"\nTotal query time (seconds) = {time.perf_counter()-t0:.3f}")
+        print(f"\nRequired Fifo depth per formulaic calculation = {self.calcDepth()}")
+        return index
+
+    def _log(self,message:str):
+        if self._report:
+            print(message)
 
+    def threaded_sim(self):
+        '''
+        Simulates this object's Fifo with kernel, producer and consumer threads. The worker
+        threads are created by the first run and reused by the next ones
+        '''
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1+len(self._kernelEvents))
+        # Client threads are registered before they are launched (see threadStart)
+        for _ in self._kernelEvents:
+            self.threadStart()
+        futures = [
+            self._executor.submit(self.kernel_thread),
+            self._executor.submit(self.producer_thread,ev=self._kernelEvents['e_producer']),
+            self._executor.submit(self.consumer_thread,ev=self._kernelEvents['e_consumer'])]
+        for future in concurrent.futures.as_completed(futures):
+            future.result() # Re-raises an exception of the thread
+
+    def run(self,config:SimConfig=None)->SimResult:
+        '''
+        Runs the configured engine and returns its SimResult, without printing anything.
+        A simulator which already ran (or a new config) is reset first, so one simulator,
+        its Fifo and its worker threads can serve many runs
+        '''
+        if config is not None or self._ran:
+            self.reset(config)
+        self._ran = True
+        metrics = self._metrics
+        quiet   = self._fifo.quiet
+        self._fifo.quiet = quiet or not self._report
+        metrics.start()
+        try:
+            if self._nosim:
+                pass
+            elif self._engine == 'exact':
+                self._exact = self.exact_sim()
+            elif self._trials > 1:
+                engine = self.batch_sim().engine
+                metrics.ops = int(engine.pushCount.sum() + engine.popCount.sum() + engine.wnopCount.sum() + engine.rnopCount.sum())
+            elif self._engine == 'vectorized' and (self._bursty or self._wtrace is not None or self._rtrace is not None):
+                self.replay_sim()
+            elif self._engine == 'vectorized':
+                self.vectorized_sim()
+            elif self._engine == 'asyncio':
+                asyncio.run(self.async_sim())
+            else:
+                self.threaded_sim()
+        finally:
+            metrics.stop()
+            self._fifo.quiet = quiet
+        if not self._nosim and self._exact is None and self._mc is None:
+            metrics.ops = self._fifo.opCount
+        return self.result()
+
+    def result(self)->SimResult:
+        '''
+        Returns the SimResult of the last run
+        '''
+        result = SimResult(
+            config=self._config,
+            quantum=self._simQuantum,
+            startLevel=self._start_level,
+            formulaicDepth=self.calcDepth(),
+            metrics=self._metrics)
+        if self._nosim or not self._ran:
+            return result
+        if self._exact is not None:
+            result.overrunProbability  = self._exact.overrunProbability
+            result.underrunProbability = self._exact.underrunProbability
+        elif self._mc is not None:
+            engine = self._mc.engine
+            result.pushCount = int(engine.pushCount.sum())
+            result.popCount  = int(engine.popCount.sum())
+            result.wnopCount = int(engine.wnopCount.sum())
+            result.rnopCount = int(engine.rnopCount.sum())
+            result.maxLevel  = int(engine.maxLevel.max())
+            result.overrunProbability  = self._mc.overrunProbability
+            result.underrunProbability = self._mc.underrunProbability
+        else:
+            fifo = self._fifo
+            result.pushCount = fifo.pushCount
+            result.popCount  = fifo.popCount
+            result.wnopCount = fifo.wnopCount
+            result.rnopCount = fifo.rnopCount
+            result.maxLevel  = fifo.maxLevel
+            result.errorType = fifo.errorType
+            result.errorStep = fifo.errorStep
+            result.overrunProbability  = float(fifo.errorType == 'overrun')
+            result.underrunProbability = float(fifo.errorType == 'underrun')
+        return result
+
+    def simulate(self)->SimMetrics:
+        '''
+        Performs the simulation (see run()) and formulaic calculation, and prints their
+        reports. Returns the performance metrics of the run
+        '''
+        if self._adaptive:
+            print(f"Adaptive quantum-mode selected. Max quantum={self._simQuantum}\n")
+        elif self._config.simQuantum <= 0:
+            print(f"Auto quantum-mode selected. Caclulated quantum={self._simQuantum}\n")
+
+        if self._nosim:
+            print("Skipping simulation...\n")
+        elif self._engine == 'exact':
+            print("Running exact analysis...")
+        elif self._trials > 1:
+            print(f"Running Monte Carlo simulation ({self._trials} trials, vectorized engine)...")
+        else:
+            print("Running simulation...")
+        self._report = True
+        try:
+            self.run()
+        finally:
+            self._report = False
+        metrics = self._metrics
+
+        if self._nosim:
+            pass
+        elif self._exact is not None:
+            exact = self._exact
+            print("\nExact Analysis Summary:")
+            print("-----------------------")
+            print(exact)
+            if self._start_level < self.calcDepth() < self._fifo.depth:
+                print(f"Failure probability at formulaic depth ({self.calcDepth()}) = {exact.failureProbability(self.calcDepth()):.6e}\n")
+            print("Analysis metrics:")
+            print("-----------------")
+            print(metrics)
+            if exact.failureProbability() > 0:
+                print(f"Simulation FAILS with probability {exact.failureProbability():.6e}")
+            else:
+                print("Simulation PASSES with probability 1")
+        elif self._mc is not None:
+            mc = self._mc
+            print("\nMonte Carlo Simulation Summary:")
+            print("-------------------------------")
+            print(mc)
+            print("Simulation metrics:")
+            print("-------------------")
+            print(metrics)
+            if mc.failureProbability > 0:
+                print(f"Simulation FAILED in {np.count_nonzero(mc.engine.errorType)} of {mc.trials} trials!")
+            else:
+                print("Simulation PASSED in all trials")
+        else:
             print("\nFIFO Simulation Summary:")
             print("-------------------------")
             print(self._fifo)
+            if self._replay is not None:
+                print("Activity Replay Summary:")
+                print("------------------------")
+                print(self._replay)
             print("Simulation metrics:")
             print("-------------------")
-            print(f"Simulation event queue peak size  = {self._maxqlen}")
-            print(f"Simulation quantum size           = {self._simQuantum}")
-            print(f"Total number of simulation events = {self._evcount}")
-            print(f"Total simulation time (seconds)   = {time.process_time():.1f}\n")
+            print(metrics)
             if self._fifo.error:
                 print("Simulation FAILED!")
             else:
                 print("Simulation PASSED")
 
         print(f"\nRequired Fifo depth per formulaic calculation = {self.calcDepth()}")
+        return metrics
 
     @staticmethod
     def getRandomBool(freqs:list)->bool:
@@ -0,0 +1,93 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import numpy as np
+
+from fifo_pkg.VectorEngine import VectorEngine
+
+class MonteCarlo(object):
+    '''
+    Runs many independent trials of the same FIFO configuration as one 2-D batch using
+    the VectorEngine, and summarizes the distribution of the outcomes (max level,
+    overrun/underrun probability and simulated bandwidth ratio)
+    '''
+
+    PERCENTILES = (50.0,90.0,99.0,99.9,100.0)
+
+    def __init__(
+        self,
+        depth:int,
+        pl_size:int,
+        writeBandwidth:int,
+        readBandwidth:int,
+        initLevel:int,
+        trials:int,
+        seed:int=None,
+        chunkSteps:int=None):
+        assert trials > 0, f"Number of trials ({trials}) must be positive"
+        self._trials = trials
+        self._engine = VectorEngine(
+            depth=depth,
+            pl_size=pl_size,
+            writeBandwidth=writeBandwidth,
+            readBandwidth=readBandwidth,
+            initLevel=initLevel,
+            rng=np.random.default_rng(seed),
+            chunkSteps=chunkSteps)
+
+    @property
+    def engine(self)->VectorEngine:
+        return self._engine
+
+    @property
+    def trials(self)->int:
+        return self._trials
+
+    def run(self,progress=None):
+        self._engine.run(trials=self._trials,progress=progress)
+
+    @property
+    def overrunProbability(self)->float:
+        return float(np.mean(self._engine.errorType == 1))
+
+    @property
+    def underrunProbability(self)->float:
+        return float(np.mean(self._engine.errorType == 2))
+
+    @property
+    def failureProbability(self)->float:
+        return float(np.mean(self._engine.errorType != 0))
+
+    @property
+    def maxLevelPercentiles(self)->dict:
+        '''
+        Percentiles of the maximum FIFO level reached by each trial (failing trials
+        contribute the level at which they failed)
+        '''
+        values = np.percentile(self._engine.maxLevel,self.PERCENTILES)
+        return dict(zip(self.PERCENTILES,values))
+
+    @property
+    def bwratios(self)->np.ndarray:
+        '''
+        Per-trial simulated W:R bandwidth ratio (nan when a trial has no write nops)
+        '''
+        wnops = self._engine.wnopCount
+        return np.divide(self._engine.rnopCount,wnops,out=np.full(wnops.shape,np.nan),where=wnops>0)
+
+    def __str__(self):
+        bw = self.bwratios
+        rstr  = f"trials                 = {self._trials}\n"
+        rstr += f"overrun probability    = {self.overrunProbability:.6f}\n"
+        rstr += f"underrun probability   = {self.underrunProbability:.6f}\n"
+        for pct,value in self.maxLevelPercentiles.items():
+            rstr += f"max-level p{pct:<5g}       = {value:.1f}\n"
+        rstr += f"Simulated W:R BW ratio = {np.nanmean(bw):.3f} (std={np.nanstd(bw):.3f}, min={np.nanmin(bw):.3f}, max={np.nanmax(bw):.3f})\n"
+        return rstr
@@ -0,0 +1,296 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import json
+import math
+import time
+import numpy as np
+
+class MultiPortFifo(object):
+    '''
+    Simulates a FIFO shared by N producers and M consumers (e.g. requestors of a shared
+    buffer). Every cycle, an arbiter grants one requesting producer a push and another
+    arbiter grants one requesting consumer a pop (the push goes first, as in FifoSimulator).
+
+    A port generates a request on a cycle with a probability proportional to its bandwidth,
+    and holds the request (valid until granted) without generating another one, so a port
+    which loses arbitration waits. Arbitration policies (see ARBITERS):
+    - roundrobin : the first requesting port after the last granted one
+    - fixed      : the lowest-numbered requesting port
+    - weighted   : round-robin where a granted port keeps the grant for up to its weight
+                   consecutive transfers while it keeps requesting
+    A granted port which does not honor backpressure flags an overrun (producer and full
+    FIFO) or an underrun (consumer and empty FIFO), which ends the simulation. A port which
+    honors backpressure (stall=True) keeps its request and waits instead.
+
+    Requests are drawn in bulk for all ports and each side is held as a bit mask of the
+    requesting ports, so an arbitration costs the same for 2 or 64 ports. The wait of each
+    request is measured from its arrival, which gives per-port stall cycles and the longest
+    wait (starvation). As in FifoSimulator the simulation ends at the final push, and the
+    FIFO then drains without failing.
+    '''
+
+    ARBITERS    = ('roundrobin','fixed','weighted')
+    MAX_PORTS   = 64      # Ports per side (one bit each in a 64-bit request mask)
+    CHUNK_STEPS = 1<<14   # Cycles of requests drawn at once
+
+    def __init__(
+        self,
+        depth:int,
+        pl_size:int,
+        writeBandwidths:list,
+        readBandwidths:list,
+        initLevel:int=1,
+        arbitration:str='roundrobin',
+        writeWeights:list=None,
+        readWeights:list=None,
+        writeStall:list=None,
+        readStall:list=None,
+        clock:float=None,
+        seed:int=None):
+        nw,nr = len(writeBandwidths),len(readBandwidths)
+        assert 0 < nw <= self.MAX_PORTS and 0 < nr <= self.MAX_PORTS, f"Expected 1 to {self.MAX_PORTS} producers and consumers, got {nw} and {nr}"
+        assert arbitration in self.ARBITERS, f"Unknown arbitration '{arbitration}', expected one of {self.ARBITERS}"
+        assert 0 <= initLevel < depth, f"Specified init_level={initLevel} outside of [0,depth={depth})"
+        assert initLevel < pl_size, f"Specified init_level={initLevel} greater or equal to pl_size={pl_size}"
+        self._depth      = depth
+        self._pl_size    = pl_size
+        self._init_level = initLevel
+        self._arbitration= arbitration
+        self._bandwidths = (list(writeBandwidths),list(readBandwidths))
+        self._weights    = (list(writeWeights) if writeWeights is not None else [1]*nw,
+                            list(readWeights) if readWeights is not None else [1]*nr)
+        self._stall      = (list(writeStall) if writeStall is not None else [False]*nw,
+                            list(readStall) if readStall is not None else [False]*nr)
+        for side in range(2):
+            assert len(self._weights[side]) == len(self._bandwidths[side]), "Expected one weight per port"
+            assert len(self._stall[side]) == len(self._bandwidths[side]), "Expected one stall flag per port"
+            assert all(w >= 1 for w in self._weights[side]), "Port weights must be at least 1"
+
+        # A cycle is normalized like a FifoSimulator step (the request probabilities of all
+        # ports sum to 1) unless the bandwidth of a FIFO port per cycle is given
+        self._clock = clock if clock is not None else float(sum(writeBandwidths) + sum(readBandwidths))
+        self._probs = (np.array(writeBandwidths,dtype=np.float64)/self._clock,
+                       np.array(readBandwidths,dtype=np.float64)/self._clock)
+        assert max(self._probs[0].max(),self._probs[1].max()) <= 1.0, f"A port bandwidth exceeds the FIFO clock ({self._clock})"
+        self._rng = np.random.default_rng(seed)
+        self._reset()
+
+    @classmethod
+    def from_config(cls,path:str,pl_size:int=None,seed:int=None):
+        '''
+        Builds a multi-port FIFO from a JSON description of the form:
+
+        {
+          "plsize"      : 100000,
+          "depth"       : 256,
+          "initlevel"   : 32,
+          "arbitration" : "roundrobin",
+          "producers"   : [{"bandwidth": 10, "count": 16}, {"bandwidth": 40, "weight": 4}],
+          "consumers"   : [{"bandwidth": 200, "stall": true}]
+        }
+
+        "count" replicates a port, "weight" is used by the weighted arbiter and "stall"
+        makes a port honor backpressure. The optional "clock" is the bandwidth of a FIFO
+        port per cycle. The payload size from the file takes precedence over pl_size
+        '''
+        with open(path) as f:
+            cfg = json.load(f)
+        def ports(side:str)->list:
+            return [p for p in cfg[side] for _ in range(p.get('count',1))]
+        producers,consumers = ports('producers'),ports('consumers')
+        return cls(
+            depth=cfg['depth'],
+            pl_size=cfg.get('plsize',pl_size),
+            writeBandwidths=[p['bandwidth'] for p in producers],
+            readBandwidths=[p['bandwidth'] for p in consumers],
+            initLevel=cfg.get('initlevel',1),
+            arbitration=cfg.get('arbitration','roundrobin'),
+            writeWeights=[p.get('weight',1) for p in producers],
+            readWeights=[p.get('weight',1) for p in consumers],
+            writeStall=[p.get('stall',False) for p in producers],
+            readStall=[p.get('stall',False) for p in consumers],
+            clock=cfg.get('clock'),
+            seed=seed)
+
+    def _reset(self):
+        nw,nr = len(self._bandwidths[0]),len(self._bandwidths[1])
+        self.requests   = ([0]*nw,[0]*nr) # Requests generated per port
+        self.grants     = ([0]*nw,[0]*nr) # Transfers per port
+        self.waitCycles = ([0]*nw,[0]*nr) # Cycles spent waiting by the requests of each port
+        self.maxWait    = ([0]*nw,[0]*nr) # Longest wait of a request of each port (starvation)
+        self.blocked    = ([0]*nw,[0]*nr) # Grants stalled by a full (producer) or empty (consumer) FIFO
+        self.pushCount  = 0  # Excludes the initial level
+        self.popCount   = 0
+        self.maxLevel   = self._init_level
+        self.cycles     = 0
+        self.error      = None # ('overrun'|'underrun',port,cycle)
+        self.wallTime   = 0.0
+
+    def _masks(self,side:int,count:int)->list:
+        '''
+        Draws count cycles of new requests of one side as integer bit masks (bit i for
+        port i)
+        '''
+        bits   = self._rng.random((count,self._probs[side].size)) < self._probs[side]
+        packed = np.zeros((count,8),dtype=np.uint8)
+        packed[:,:(bits.shape[1]+7)//8] = np.packbits(bits,axis=1,bitorder='little')
+        return packed.view('<u8').ravel().tolist()
+
+    def run(self,maxCycles:int=None):
+        '''
+        Simulates until the final push, an error, or maxCycles cycles
+        '''
+        self._reset()
+        t0       = time.perf_counter()
+        depth    = self._depth
+        weighted = self._arbitration == 'weighted'
+        fixed    = self._arbitration == 'fixed'
+        level    = self._init_level
+        maxlvl   = level
+        rem_push = self._pl_size - self._init_level
+        cycle    = 0
+        error    = None
+
+        # Per side: requesting ports mask, arrival cycle of each request, last granted
+        # port and its remaining weighted grants
+        pending  = [0,0]
+        arrival  = ([0]*len(self._bandwidths[0]),[0]*len(self._bandwidths[1]))
+        last     = [-1,-1]
+        credit   = [0,0]
+
+        def arbitrate(side:int,mask:int)->int:
+            if fixed:
+                return (mask & -mask).bit_length()-1
+            cur = last[side]
+            if weighted and credit[side] and (mask >> cur) & 1:
+                return cur
+            above = mask & ~((2 << cur) - 1) if cur >= 0 else mask
+            pick  = above if above else mask
+            port  = (pick & -pick).bit_length()-1
+            credit[side] = self._weights[side][port]
+            return port
+
+        while rem_push > 0 and error is None and (maxCycles is None or cycle < maxCycles):
+            chunk  = self.CHUNK_STEPS if maxCycles is None else min(self.CHUNK_STEPS,maxCycles-cycle)
+            wmasks = self._masks(0,chunk)
+            rmasks = self._masks(1,chunk)
+            for i in range(chunk):
+                # New requests of the ports which are not already requesting
+                new = wmasks[i] & ~pending[0]
+                if new:
+                    self._arrive(0,new,cycle,arrival)
+                    pending[0] |= new
+                new = rmasks[i] & ~pending[1]
+                if new:
+                    self._arrive(1,new,cycle,arrival)
+                    pending[1] |= new
+
+                # Producer side
+                if pending[0]:
+                    port = arbitrate(0,pending[0])
+                    if level < depth:
+                        level += 1
+                        if level > maxlvl:
+                            maxlvl = level
+                        self._transfer(0,port,cycle,arrival,pending,last,credit)
+                        rem_push -= 1
+                    elif self._stall[0][port]:
+                        self.blocked[0][port] += 1
+                    else:
+                        error = ('overrun',port,cycle)
+                        break
+
+                # Consumer side
+                if pending[1]:
+                    port = arbitrate(1,pending[1])
+                    if level > 0:
+                        level -= 1
+                        self._transfer(1,port,cycle,arrival,pending,last,credit)
+                    elif self._stall[1][port]:
+                        self.blocked[1][port] += 1
+                    else:
+                        error = ('underrun',port,cycle)
+                        break
+
+                cycle += 1
+                if rem_push == 0:
+                    break
+
+        # Requests still waiting at the end count towards the waits
+        for side in range(2):
+            mask = pending[side]
+            while mask:
+                low  = mask & -mask
+                port = low.bit_length()-1
+                wait = cycle - arrival[side][port]
+                self.waitCycles[side][port] += wait
+                self.maxWait[side][port] = max(self.maxWait[side][port],wait)
+                mask ^= low
+
+        self.pushCount = sum(self.grants[0])
+        self.popCount  = sum(self.grants[1])
+        self.maxLevel  = maxlvl
+        self.cycles    = cycle
+        self.error     = error
+        # Drain phase: the consumers pop the remainder of the payload without failing
+        if error is None and rem_push == 0:
+            self.popCount = self._pl_size
+        self.wallTime = time.perf_counter() - t0
+
+    def _arrive(self,side:int,new:int,cycle:int,arrival:tuple):
+        requests,arrival = self.requests[side],arrival[side]
+        while new:
+            low  = new & -new
+            port = low.bit_length()-1
+            requests[port] += 1
+            arrival[port]   = cycle
+            new ^= low
+
+    def _transfer(self,side:int,port:int,cycle:int,arrival:tuple,pending:list,last:list,credit:list):
+        wait = cycle - arrival[side][port]
+        self.grants[side][port]     += 1
+        self.waitCycles[side][port] += wait
+        if wait > self.maxWait[side][port]:
+            self.maxWait[side][port] = wait
+        pending[side] &= ~(1 << port)
+        last[side]     = port
+        credit[side]  -= 1
+
+    def calcDepth(self)->int:
+        '''
+        Rate ratio formula of FifoSimulator applied to the total producer and consumer
+        bandwidths. Like the original formula it ignores arbitration and request waits
+        '''
+        wrate,rrate = sum(self._bandwidths[0]),sum(self._bandwidths[1])
+        return math.ceil(self._pl_size*max(1.0 - rrate/wrate,1.0 - wrate/rrate))
+
+    def __str__(self):
+        nw,nr = len(self._bandwidths[0]),len(self._bandwidths[1])
+        rstr  = f"payload size           = {self._pl_size}\n"
+        rstr += f"ports (W/R)            = {nw}/{nr}\n"
+        rstr += f"arbitration            = {self._arbitration}\n"
+        rstr += f"simulated cycles       = {self.cycles}\n"
+        rstr += f"cycles per second      = {self.cycles/max(self.wallTime,1e-9):.0f}\n"
+        rstr += f"push-count             = {self.pushCount}\n"
+        rstr += f"pop-count              = {self.popCount}\n"
+        rstr += f"Fifo max-level reached = {self.maxLevel} (depth {self._depth})\n\n"
+        rstr += " side  port  bandwidth  weight  requests    grants  wait-cycles  mean-wait  max-wait  blocked\n"
+        for side,name in enumerate(('W','R')):
+            for i,bw in enumerate(self._bandwidths[side]):
+                grants = self.grants[side][i]
+                mean   = self.waitCycles[side][i]/grants if grants else 0.0
+                rstr += f"{name:>5} {i:5d} {bw:10g} {self._weights[side][i]:7g} {self.requests[side][i]:9d} {grants:9d} {self.waitCycles[side][i]:12d} {mean:10.2f} {self.maxWait[side][i]:9d} {self.blocked[side][i]:8d}\n"
+        if self.error is not None:
+            side = 'producer' if self.error[0] == 'overrun' else 'consumer'
+            rstr += f"\nerror-status flag      = True ({self.error[0]} by {side} {self.error[1]} at cycle {self.error[2]})\n"
+        else:
+            rstr += f"\nerror-status flag      = False ()\n"
+        return rstr
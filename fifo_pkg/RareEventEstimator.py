@@ -0,0 +1,255 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import math
+import time
+from statistics import NormalDist
+import numpy as np
+
+from fifo_pkg.VectorEngine import VectorEngine
+
+class RareEventEstimator(object):
+    '''
+    Importance sampling estimator of very small overrun or underrun probabilities of the
+    FifoSimulator producer/consumer model (same step semantics as the VectorEngine).
+
+    Trials are simulated with tilted per-step activity probabilities qw and qr instead of
+    pw = W/(W+R) and pr = R/(W+R), which make the event frequent, and each trial is
+    weighted by its likelihood ratio up to the step at which it stops (first error or
+    final push): with S steps, of which the producer was active on A and the consumer on B,
+    L = (pw/qw)^A ((1-pw)/(1-qw))^(S-A) (pr/qr)^B ((1-pr)/(1-qr))^(S-B).
+    The mean of the weighted event indicators is an unbiased estimate of the probability
+    for any tilt, and their sample variance gives the variance of the estimate.
+
+    The tilt is found with the multilevel cross-entropy method on pilot batches: each
+    iteration keeps the fraction rho of trials which came closest to the event (highest
+    peak level for an overrun, lowest level for an underrun), and moves qw and qr to their
+    likelihood-weighted activity rates in those trials, until the pilot reaches the
+    event. An explicit tilt can be given instead (qw=pw and qr=pr is plain Monte Carlo).
+    '''
+
+    EVENTS         = ('overrun','underrun')
+    DEFAULT_TRIALS = 20000
+    CHUNK_SIZE     = VectorEngine.CHUNK_SIZE # Max number of (step x trial) elements per chunk
+
+    def __init__(
+        self,
+        depth:int,
+        pl_size:int,
+        writeBandwidth:int,
+        readBandwidth:int,
+        initLevel:int,
+        event:str='overrun',
+        trials:int=DEFAULT_TRIALS,
+        pilotTrials:int=10000,
+        rho:float=0.1,
+        maxIterations:int=50,
+        confidence:float=0.95,
+        writeProb:float=None,
+        readProb:float=None,
+        seed=None):
+        assert event in self.EVENTS, f"Unknown event '{event}', expected one of {self.EVENTS}"
+        assert 0 <= initLevel < depth, f"Specified init_level={initLevel} outside of [0,depth={depth})"
+        assert initLevel < pl_size, f"Specified init_level={initLevel} greater or equal to pl_size={pl_size}"
+        assert trials > 1 and pilotTrials > 1, "At least two trials are needed for a variance"
+        assert 0.0 < rho < 1.0, f"Elite fraction ({rho}) must be in (0,1)"
+        assert (writeProb is None) == (readProb is None), "Specify both tilted probabilities or none"
+        self._depth      = depth
+        self._pl_size    = pl_size
+        self._init_level = initLevel
+        self._event      = event
+        self._trials     = trials
+        self._pilot      = pilotTrials
+        self._rho        = rho
+        self._maxIter    = maxIterations
+        self._confidence = confidence
+        self._rng        = np.random.default_rng(seed)
+
+        self.pw = float(writeBandwidth/(writeBandwidth+readBandwidth))
+        self.pr = float(readBandwidth/(writeBandwidth+readBandwidth))
+        self.qw = writeProb # Tilted probabilities (None until tilt())
+        self.qr = readProb
+
+        self.thresholds = [] # Pilot threshold per cross-entropy iteration
+        self.weights    = None # Per-trial weighted event indicators of the final batch
+        self.hits       = 0
+        self.ops        = 0
+        self.tiltTime   = 0.0
+        self.wallTime   = 0.0
+
+    def simulate(self,trials:int,qw:float,qr:float)->tuple:
+        '''
+        Simulates trials with activity probabilities qw/qr until their first error or final
+        push. Returns per-trial arrays of the error type (0/1/2), the score (peak level
+        after a producer operation for an overrun, minus the lowest level for an underrun,
+        so that the event is a score above the depth, or above -1), the log-likelihood
+        ratio of the trial against the untilted probabilities, and the steps and producer
+        and consumer active steps up to the step at which the score was reached
+        '''
+        npush = self._pl_size - self._init_level
+        level = np.full(trials,self._init_level,dtype=np.int64)
+        P     = np.zeros(trials,dtype=np.int64)  # Pushes so far
+        S     = np.zeros(trials,dtype=np.int64)  # Steps so far
+        A     = np.zeros(trials,dtype=np.int64)  # Producer active steps so far
+        B     = np.zeros(trials,dtype=np.int64)  # Consumer active steps so far
+        error = np.zeros(trials,dtype=np.int8)
+        score = np.full(trials,np.iinfo(np.int64).min)
+        peak  = np.zeros((3,trials),dtype=np.int64) # S, A and B at the score
+        active = np.arange(trials)
+        while active.size > 0:
+            rows = active.size
+            n    = min(VectorEngine.MAX_STEPS,max(1,self.CHUNK_SIZE//rows))
+            w    = self._rng.random((n,rows),dtype=np.float32) < qw
+            r    = self._rng.random((n,rows),dtype=np.float32) < qr
+            cw   = np.cumsum(w,axis=0,dtype=np.int32)
+            cr   = np.cumsum(r,axis=0,dtype=np.int32)
+            lvl  = VectorEngine._cumsum(w.view(np.int8) - r.view(np.int8)) # Relative level after each step
+            obs  = lvl + r # After the producer operation
+
+            base = level[active]
+            over = obs > (self._depth - base)
+            undr = lvl < -base
+            fin  = cw >= (npush - P[active])
+            fo = np.where(over.any(axis=0),over.argmax(axis=0),n)
+            fu = np.where(undr.any(axis=0),undr.argmax(axis=0),n)
+            ff = np.where(fin.any(axis=0),fin.argmax(axis=0),n)
+            stop = np.minimum(np.minimum(fo,fu),ff) # Last step of the trial in this chunk (n: none)
+            last = np.minimum(stop,n-1)
+
+            cols  = np.arange(rows)
+            steps = np.arange(n)[:,None]
+            upto  = steps <= last
+            if self._event == 'overrun':
+                at = np.where(upto,obs,np.iinfo(obs.dtype).min).argmax(axis=0)
+                chunkScore = obs[at,cols].astype(np.int64) + base
+            else:
+                at = np.where(upto,lvl,np.iinfo(lvl.dtype).max).argmin(axis=0)
+                chunkScore = -(lvl[at,cols].astype(np.int64) + base)
+            new = chunkScore > score[active]
+            score[active[new]]  = chunkScore[new]
+            peak[:,active[new]] = np.stack((S[active] + at + 1,A[active] + cw[at,cols],B[active] + cr[at,cols]))[:,new]
+
+            S[active]     += last + 1
+            A[active]     += cw[last,cols]
+            B[active]     += cr[last,cols]
+            P[active]     += np.minimum(cw[last,cols],npush - P[active])
+            level[active]  = base + lvl[last,cols]
+            self.ops      += int((last + 1).sum())*2
+            err = np.where(fo <= np.minimum(fu,ff),1,np.where(fu < ff,2,0)) # A failing final push overruns
+            error[active] = np.where(stop < n,err,0)
+            active = active[stop >= n]
+        return (error,score,self._llr(S,A,B,qw,qr),peak)
+
+    def _llr(self,S:np.ndarray,A:np.ndarray,B:np.ndarray,qw:float,qr:float)->np.ndarray:
+        '''
+        Log-likelihood ratio of S steps with A producer and B consumer active steps
+        '''
+        pw,pr = self.pw,self.pr
+        return A*math.log(pw/qw) + (S-A)*math.log((1.0-pw)/(1.0-qw)) + B*math.log(pr/qr) + (S-B)*math.log((1.0-pr)/(1.0-qr))
+
+    def tilt(self)->tuple:
+        '''
+        Cross-entropy search for the tilted probabilities. The elite trials of an iteration
+        reached the threshold score, and only their steps up to their score enter the
+        update, since the later steps have no bearing on reaching it. An event which is
+        frequent without a tilt keeps the untilted probabilities. Returns (qw,qr)
+        '''
+        t0 = time.perf_counter()
+        target = self._depth + 1 if self._event == 'overrun' else 1
+        qw,qr  = self.pw,self.pr
+        for _ in range(self._maxIter):
+            _,score,_,peak = self.simulate(self._pilot,qw,qr)
+            gamma = min(target,int(np.quantile(score,1.0-self._rho,method='lower')))
+            self.thresholds.append(gamma)
+            if gamma >= target and len(self.thresholds) == 1:
+                break # The event is not rare, plain sampling will do
+            S,A,B = peak[:,score >= gamma]
+            llr   = self._llr(S,A,B,qw,qr)
+            lr    = np.exp(llr - llr.max()) # Normalization cancels in the ratios
+            qw = float(np.clip((lr*A).sum()/(lr*S).sum(),1e-6,1.0-1e-6))
+            qr = float(np.clip((lr*B).sum()/(lr*S).sum(),1e-6,1.0-1e-6))
+            if gamma >= target:
+                break
+        self.qw,self.qr = qw,qr
+        self.tiltTime   = time.perf_counter() - t0
+        return (qw,qr)
+
+    def run(self):
+        '''
+        Finds the tilt (unless given) and simulates the weighted batch
+        '''
+        t0 = time.perf_counter()
+        if self.qw is None:
+            self.tilt()
+        error,_,llr,_ = self.simulate(self._trials,self.qw,self.qr)
+        hit = error == (1 if self._event == 'overrun' else 2)
+        self.hits    = int(np.count_nonzero(hit))
+        self.weights = np.where(hit,np.exp(llr),0.0)
+        self.wallTime = time.perf_counter() - t0
+
+    @property
+    def probability(self)->float:
+        return float(self.weights.mean())
+
+    @property
+    def variance(self)->float:
+        '''
+        Estimated variance of the probability estimate
+        '''
+        return float(self.weights.var(ddof=1)/self.weights.size)
+
+    @property
+    def stdError(self)->float:
+        return math.sqrt(self.variance)
+
+    @property
+    def relativeError(self)->float:
+        '''
+        Standard error relative to the estimate (infinite while no event was observed)
+        '''
+        return self.stdError/self.probability if self.probability > 0 else math.inf
+
+    def confidenceInterval(self)->tuple:
+        '''
+        Normal approximation interval of the estimate
+        '''
+        z = NormalDist().inv_cdf(0.5 + self._confidence/2)
+        return (max(0.0,self.probability - z*self.stdError),self.probability + z*self.stdError)
+
+    @property
+    def effectiveSampleSize(self)->float:
+        '''
+        Kish effective sample size of the weighted event trials
+        '''
+        total = self.weights.sum()
+        return float(total*total/(self.weights*self.weights).sum()) if total > 0 else 0.0
+
+    @property
+    def plainTrials(self)->float:
+        '''
+        Plain Monte Carlo trials which would give the same variance
+        '''
+        p = min(self.probability,1.0)
+        return p*(1.0-p)/self.variance if self.variance > 0 else math.inf
+
+    def __str__(self):
+        lo,hi = self.confidenceInterval()
+        rstr  = f"event                  = {self._event}\n"
+        rstr += f"write/read probability = {self.pw:.4f}/{self.pr:.4f}\n"
+        rstr += f"tilted probability     = {self.qw:.4f}/{self.qr:.4f}\n"
+        rstr += f"tilt iterations        = {len(self.thresholds)}\n"
+        rstr += f"trials                 = {self._trials} ({self.hits} with the event)\n"
+        rstr += f"{self._event+' probability':<23}= {self.probability:.6e} [{lo:.6e}, {hi:.6e}]\n"
+        rstr += f"standard error         = {self.stdError:.6e} (relative {self.relativeError:.4f})\n"
+        rstr += f"effective sample size  = {self.effectiveSampleSize:.0f}\n"
+        rstr += f"plain MC equivalent    = {self.plainTrials:.3g} trials\n"
+        rstr += f"operations per second  = {self.ops/max(self.wallTime,1e-9):.0f}\n"
+        rstr += f"wall time (seconds)    = {self.wallTime:.2f} (tilt {self.tiltTime:.2f})\n"
+        return rstr
@@ -0,0 +1,196 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import time
+import numpy as np
+
+from fifo_pkg.Fifo import Fifo
+
+class ReplayEngine(object):
+    '''
+    Replays per-cycle producer and consumer activity through a FIFO in constant memory.
+    Each source is an ActivityTrace or a BernoulliStream (anything with a readPacked(count)
+    method returning packed activity bytes), so a captured trace can be paired with a
+    random port. Sources are streamed in chunks, and every cycle sequences a producer
+    operation followed by a consumer operation as in VectorEngine.
+
+    The replay ends once the producer has pushed its share of the payload (the consumer
+    then drains the FIFO without failing, as in FifoSimulator), on the first overrun or
+    underrun, or when a trace runs out of cycles.
+    '''
+
+    ERROR_TYPES = ('','overrun','underrun')
+    CHUNK_SIZE  = 1<<22 # Cycles per chunk (a multiple of 8)
+
+    @staticmethod
+    def _tables()->tuple:
+        '''
+        Returns lookup tables indexed by a (producer byte << 8 | consumer byte) pair of packed
+        activity bytes (first cycle in the MSB): the level change over the 8 cycles, the
+        highest level observed by the consumer and the lowest level, relative to the level
+        before the byte. Also returns a popcount table of single bytes
+        '''
+        bits  = np.unpackbits(np.arange(256,dtype=np.uint8)[:,None],axis=1).astype(np.int8)
+        w,r   = bits[:,None,:],bits[None,:,:]
+        lvl   = np.cumsum(w - r,axis=2)
+        obs   = lvl + r
+        delta = lvl[:,:,-1].astype(np.int8).ravel()
+        high  = obs.max(axis=2).astype(np.int8).ravel()
+        low   = lvl.min(axis=2).astype(np.int8).ravel()
+        return (delta,high,low,bits.sum(axis=1).astype(np.int32))
+
+    def __init__(self,depth:int,pl_size:int,initLevel:int,writeSource,readSource,chunkSize:int=None):
+        assert 0 <= initLevel < depth, f"Specified init_level={initLevel} outside of [0,depth={depth})"
+        assert initLevel < pl_size, f"Specified init_level={initLevel} greater or equal to pl_size={pl_size}"
+        self._depth      = depth
+        self._pl_size    = pl_size
+        self._init_level = initLevel
+        self._wsource    = writeSource
+        self._rsource    = readSource
+        self._chunkSize  = -(-(chunkSize if chunkSize else self.CHUNK_SIZE)//8)*8
+
+        self.pushCount = 0  # Excludes the initial level
+        self.popCount  = 0
+        self.wnopCount = 0
+        self.rnopCount = 0
+        self.maxLevel  = initLevel
+        self.errorType = 0
+        self.errorStep = -1
+        self.cycles    = 0  # Cycles replayed
+        self.exhausted = '' # Port whose trace ran out before the payload was pushed
+        self.wallTime  = 0.0
+
+    def run(self,progress=None):
+        '''
+        Replays the sources. Chunks are processed 8 cycles at a time on packed bytes with
+        lookup tables, and only the chunk holding the final push or the first error is
+        unpacked and replayed cycle by cycle. The optional progress callback is called after
+        each chunk with the number of cycles replayed, and the pushes done and due
+        '''
+        t0 = time.perf_counter()
+        delta,high,low,popcount = self._tables()
+        npush = self._pl_size - self._init_level
+        self._level = self._init_level
+        while self.pushCount < npush and not self.errorType:
+            wb,wn = self._wsource.readPacked(self._chunkSize)
+            rb,rn = self._rsource.readPacked(self._chunkSize)
+            n = min(wn,rn)
+            if n == 0:
+                self.exhausted = 'write' if wn == 0 else 'read'
+                break
+            nb = (n+7)//8
+            wb,rb = wb[:nb],rb[:nb]
+            if n % 8:
+                # Clear the cycles of the last byte which are beyond the shorter source
+                mask = np.uint8((0xff << (8 - n % 8)) & 0xff)
+                wb[-1] &= mask
+                rb[-1] &= mask
+
+            idx    = (wb.astype(np.uint16) << 8) | rb
+            pushes = int(popcount[wb].sum())
+            fast   = False
+            if self.pushCount + pushes < npush:
+                step   = delta[idx]
+                after  = np.cumsum(step,dtype=np.int64) + self._level
+                before = after - step
+                peak   = int((before + high[idx]).max())
+                fast   = peak <= self._depth and int((before + low[idx]).min()) >= 0
+            if fast:
+                pops = pushes - int(after[-1] - self._level)
+                self.maxLevel   = max(self.maxLevel,peak)
+                self.pushCount += pushes
+                self.popCount  += pops
+                self.wnopCount += n - pushes
+                self.rnopCount += n - pops
+                self.cycles    += n
+                self._level     = int(after[-1])
+            else:
+                self._replayCycles(
+                    np.unpackbits(wb,count=n).view(bool),
+                    np.unpackbits(rb,count=n).view(bool),
+                    npush)
+            if progress is not None:
+                progress(self.cycles,self.pushCount,npush)
+
+        # Drain phase: the consumer pops the remainder of the payload without failing
+        if self.errorType == 0 and not self.exhausted:
+            self.popCount = self._pl_size
+        self.wallTime = time.perf_counter() - t0
+
+    def _replayCycles(self,w:np.ndarray,r:np.ndarray,npush:int):
+        '''
+        Replays a chunk of unpacked activity cycle by cycle (as cumulative sums), stopping
+        at the final push or at the first error
+        '''
+        level = self._level
+        n     = w.size
+
+        # Cut the chunk at the cycle of the final push
+        cw = np.cumsum(w,dtype=np.int32)
+        if cw[-1] >= npush - self.pushCount:
+            n = int(np.searchsorted(cw,npush - self.pushCount)) + 1
+            w,r = w[:n],r[:n]
+
+        # Level (relative to the start of the chunk) after each cycle, and as observed by
+        # the consumer, i.e. after the producer operation and before the consumer operation
+        lvl  = np.cumsum(w.view(np.int8) - r.view(np.int8),dtype=np.int32)
+        obs  = lvl + r
+        peak = int(obs.max())
+        if peak > self._depth - level or int(lvl.min()) < -level:
+            ob = np.flatnonzero(obs > self._depth - level)
+            ub = np.flatnonzero(lvl < -level)
+            fo = int(ob[0]) if ob.size else n
+            fu = int(ub[0]) if ub.size else n
+            isover = fo <= fu # Producer operates before consumer within a cycle
+            pe = fo if isover else fu+1
+            ce = fo if isover else fu
+            pushes = int(np.count_nonzero(w[:pe]))
+            pops   = int(np.count_nonzero(r[:ce]))
+            peak   = int(obs[:pe].max()) if pe > 0 else 0
+            self.errorType = 1 if isover else 2
+            self.errorStep = self.cycles + (fo if isover else fu)
+            self.wnopCount += pe - pushes
+            self.rnopCount += ce - pops
+            self.cycles    += pe
+        else:
+            pushes = int(cw[n-1])
+            pops   = pushes - int(lvl[-1])
+            self.wnopCount += n - pushes
+            self.rnopCount += n - pops
+            self.cycles    += n
+        self.pushCount += pushes
+        self.popCount  += pops
+        self.maxLevel   = max(self.maxLevel,level + peak)
+        self._level     = level + pushes - pops
+
+    def annotate(self,fifo:Fifo):
+        '''
+        Back-annotates the replay statistics onto a Fifo object which was primed with the
+        initial level
+        '''
+        fifo.bulk_ops(
+            pushes=self.pushCount,
+            pops=self.popCount,
+            wnops=self.wnopCount,
+            rnops=self.rnopCount,
+            maxLevel=self.maxLevel)
+        if self.errorType:
+            fifo.setError(self.ERROR_TYPES[self.errorType],self.errorStep)
+
+    def __str__(self):
+        rstr  = f"producer activity      = {self._wsource}\n"
+        rstr += f"consumer activity      = {self._rsource}\n"
+        rstr += f"cycles replayed        = {self.cycles}\n"
+        rstr += f"cycles per second      = {self.cycles/max(self.wallTime,1e-9):.0f}\n"
+        if self.errorType:
+            rstr += f"first {self.ERROR_TYPES[self.errorType]:<17}= cycle {self.errorStep}\n"
+        if self.exhausted:
+            rstr += f"{self.exhausted} trace exhausted after {self.pushCount} of {self._pl_size-self._init_level} pushes\n"
+        return rstr
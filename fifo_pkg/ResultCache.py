@@ -0,0 +1,157 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import os
+import io
+import sys
+import json
+import hashlib
+import contextlib
+
+class _Tee(io.TextIOBase):
+    '''
+    Text stream which writes to several streams at once
+    '''
+    def __init__(self,*streams):
+        self._streams = streams
+
+    def write(self,s):
+        for stream in self._streams:
+            stream.write(s)
+        return len(s)
+
+    def flush(self):
+        for stream in self._streams:
+            stream.flush()
+
+class ResultCache(object):
+    '''
+    Content addressed on-disk cache of simulation results. Each entry is a JSON file named
+    after the SHA-256 digest of its (canonical JSON) key, and holds the key and the report
+    which the run printed. The total size of the entries is bounded by evicting the least
+    recently used entries, where a cache hit refreshes the modification time of an entry.
+
+    Hit and miss counters are kept for the lifetime of the object and also accumulated in
+    the cache directory.
+    '''
+
+    DEFAULT_DIR       = os.path.join(os.path.expanduser('~'),'.cache','fifo_tools')
+    DEFAULT_MAX_BYTES = 64<<20
+    STATS_FILE        = 'stats.json'
+
+    def __init__(self,path:str=None,maxBytes:int=DEFAULT_MAX_BYTES):
+        self._path     = path or os.environ.get('FIFO_TOOLS_CACHE',self.DEFAULT_DIR)
+        self._maxBytes = maxBytes
+        self.hits      = 0
+        self.misses    = 0
+        os.makedirs(self._path,exist_ok=True)
+
+    @property
+    def path(self)->str:
+        return self._path
+
+    @staticmethod
+    def digest(key:dict)->str:
+        return hashlib.sha256(json.dumps(key,sort_keys=True).encode()).hexdigest()
+
+    def _entry(self,key:dict)->str:
+        return os.path.join(self._path,self.digest(key)+'.json')
+
+    def _entries(self)->list:
+        return [os.path.join(self._path,f) for f in os.listdir(self._path) if f.endswith('.json') and f != self.STATS_FILE]
+
+    def get(self,key:dict)->dict:
+        '''
+        Returns the cached record for key, or None on a miss
+        '''
+        path = self._entry(key)
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (OSError,ValueError):
+            record = None
+        if record is None or record.get('key') != key:
+            self.misses += 1
+            self._count('misses')
+            return None
+        os.utime(path) # Most recently used
+        self.hits += 1
+        self._count('hits')
+        return record
+
+    def put(self,key:dict,record:dict):
+        '''
+        Stores a record under key and evicts least recently used entries beyond the size bound
+        '''
+        record = dict(record,key=key)
+        path = self._entry(key)
+        tmp  = path + '.tmp'
+        with open(tmp,'w') as f:
+            json.dump(record,f)
+        os.replace(tmp,path) # Readers never see a partial entry
+        self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries(),key=os.path.getmtime)
+        total   = sum(os.path.getsize(e) for e in entries)
+        while entries and total > self._maxBytes:
+            victim = entries.pop(0)
+            total -= os.path.getsize(victim)
+            os.remove(victim)
+
+    def clear(self):
+        '''
+        Removes all entries and the accumulated counters
+        '''
+        for entry in self._entries():
+            os.remove(entry)
+        stats = os.path.join(self._path,self.STATS_FILE)
+        if os.path.exists(stats):
+            os.remove(stats)
+
+    def _count(self,name:str):
+        stats = self.totals()
+        stats[name] += 1
+        with open(os.path.join(self._path,self.STATS_FILE),'w') as f:
+            json.dump(stats,f)
+
+    def totals(self)->dict:
+        '''
+        Returns the hit/miss counters accumulated in the cache directory
+        '''
+        try:
+            with open(os.path.join(self._path,self.STATS_FILE)) as f:
+                stats = json.load(f)
+        except (OSError,ValueError):
+            stats = {}
+        return {'hits':int(stats.get('hits',0)),'misses':int(stats.get('misses',0))}
+
+    def call(self,key:dict,fn)->bool:
+        '''
+        Prints the cached report of key on a hit. On a miss, calls fn() and caches everything
+        it prints. Returns True on a hit
+        '''
+        record = self.get(key)
+        if record is not None:
+            print(record['report'],end='')
+            return True
+        out = io.StringIO()
+        with contextlib.redirect_stdout(_Tee(sys.stdout,out)):
+            fn()
+        self.put(key,{'report':out.getvalue()})
+        return False
+
+    def __str__(self):
+        totals = self.totals()
+        rstr  = f"cache directory        = {self._path}\n"
+        rstr += f"cache entries          = {len(self._entries())}\n"
+        rstr += f"hits/misses (this run) = {self.hits}/{self.misses}\n"
+        rstr += f"hits/misses (total)    = {totals['hits']}/{totals['misses']}\n"
+        return rstr
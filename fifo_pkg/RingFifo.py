@@ -0,0 +1,119 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import numpy as np
+
+from fifo_pkg.Fifo import Fifo
+
+class RingFifo(Fifo):
+    '''
+    Data-carrying Fifo backed by a preallocated ring buffer of depth entries. The buffer
+    is a NumPy array of a user-chosen dtype (dtype=object stores arbitrary Python objects).
+
+    The read and write positions are the pop and push counts modulo the depth, so the
+    ring stays consistent with the counters whichever Fifo method moves them (e.g. the
+    count-only push_n()/pop_n() used by FifoSimulator).
+
+    pop_array() returns views into the ring rather than copies. A view is only valid
+    until the entries it covers are overwritten by later pushes.
+    '''
+
+    __slots__ = ('_buf',)
+
+    def __init__(self,depth:int,dtype=np.float64,verbose:bool=False):
+        super().__init__(depth=depth,verbose=verbose)
+        self._buf = np.empty(depth,dtype=dtype) if np.dtype(dtype) == object else np.zeros(depth,dtype=dtype)
+
+    def reset(self,depth:int=None):
+        '''
+        Override:
+        Rewinds the read and write positions with the counters, and reallocates the ring
+        (with the same dtype) when the depth changes
+        '''
+        super().reset(depth)
+        if self._depth != self._buf.size:
+            dtype = self._buf.dtype
+            self._buf = np.empty(self._depth,dtype=dtype) if dtype == object else np.zeros(self._depth,dtype=dtype)
+
+    @property
+    def dtype(self)->np.dtype:
+        return self._buf.dtype
+
+    def push(self,data=None):
+        '''
+        Override/overload:
+        Pushes a single datum (None leaves the entry unchanged)
+        '''
+        if data is not None and self.level < self._depth:
+            self._buf[self._pushCount % self._depth] = data
+        super().push()
+
+    def pop(self):
+        '''
+        Override:
+        Pops and returns a single datum, or None on an underrun
+        '''
+        if self.level == 0:
+            super().pop()
+            return None
+        data = self._buf[self._popCount % self._depth]
+        super().pop()
+        return data
+
+    def _spans(self,start:int,count:int)->list:
+        '''
+        Returns the (at most two) ring slices covering count entries from position start
+        '''
+        start %= self._depth
+        end   = start + count
+        if end <= self._depth:
+            return [slice(start,end)]
+        return [slice(start,self._depth),slice(0,end-self._depth)]
+
+    def push_array(self,values)->int:
+        '''
+        Pushes the entries of an array-like in order with at most two copies into the ring.
+        As with push_n(), an overrun is flagged if the array does not fit, in which case
+        only the entries that fit are pushed. Returns the number of entries pushed.
+
+        Numeric arrays are flattened. On an object ring each element of values is one
+        entry, even when it is itself a sequence (e.g. a tuple)
+        '''
+        if self._buf.dtype != object:
+            values = np.asarray(values,dtype=self._buf.dtype).ravel()
+        elif not (isinstance(values,np.ndarray) and values.dtype == object and values.ndim == 1):
+            items  = values
+            values = np.empty(len(items),dtype=object)
+            for i,item in enumerate(items):
+                values[i] = item
+        start  = self._pushCount
+        pushed = self.push_n(values.size)
+        offset = 0
+        for span in self._spans(start,pushed):
+            n = span.stop - span.start
+            self._buf[span] = values[offset:offset+n]
+            offset += n
+        return pushed
+
+    def pop_array(self,count:int)->tuple:
+        '''
+        Pops up to count entries and returns them as a tuple of one view, or two views when
+        the entries wrap around the end of the ring. As with pop_n(), an underrun is flagged
+        if fewer than count entries are available
+        '''
+        start  = self._popCount
+        popped = self.pop_n(count)
+        return tuple(self._buf[span] for span in self._spans(start,popped))
+
+    def peek_array(self)->tuple:
+        '''
+        Returns views of all stored entries (oldest first) without popping them
+        '''
+        return tuple(self._buf[span] for span in self._spans(self._popCount,self.level))
@@ -0,0 +1,40 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+from dataclasses import dataclass,replace
+
+@dataclass
+class SimConfig:
+    '''
+    Configuration of a FifoSimulator run, which can be applied to an existing simulator
+    with FifoSimulator.reset() or run() (see FifoSimulator.__init__ for the meaning of
+    each field). initLevel=None starts the FIFO with one entry, and simQuantum <= 0
+    selects the auto quantum (or no cap on an adaptive quantum)
+    '''
+    depth          : int   = 128
+    pl_size        : int   = 128
+    writeBandwidth : int   = 100
+    readBandwidth  : int   = 100
+    initLevel      : int   = None
+    simQuantum     : int   = 1
+    adaptiveQuantum: bool  = False
+    engine         : str   = 'threaded'
+    exactLevels    : int   = 0
+    trials         : int   = 1
+    seed           : int   = None
+    chunkSteps     : int   = None
+    writeModel     : str   = 'bernoulli'
+    readModel      : str   = 'bernoulli'
+
+    def replace(self,**changes)->'SimConfig':
+        '''
+        Returns a copy of this configuration with some fields changed
+        '''
+        return replace(self,**changes)
@@ -0,0 +1,111 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import json
+import time
+
+class SimMetrics(object):
+    '''
+    Performance metrics of a single FifoSimulator run. Times only cover the run itself
+    (not the process lifetime): wall time is elapsed time and CPU time is the process
+    CPU time (all threads) spent during the run.
+
+    The kernel metrics are only collected by the threaded and asyncio engines:
+    - kernelEvents     : thread events activated by the kernel
+    - queuePeak        : peak size of the kernel pend queue
+    - blockedTime      : time the client threads spent blocked waiting for the kernel
+    - lockAcquisitions : acquisitions of the kernel lock (by the kernel and the clients)
+    - kernelWakeups    : times the kernel woke up from its condition variable
+    - idleSpins        : wakeups after which the kernel had nothing to sequence
+
+    With an adaptive quantum, quantumCounts counts the rounds run at each quantum, and
+    quantumHistogram bins them by powers of two
+    '''
+
+    FIELDS = (
+        'engine','quantum','trials','ops','wallTime','cpuTime','opsPerSec','kernelEvents',
+        'eventsPerSec','queuePeak','blockedTime','lockAcquisitions','kernelWakeups','idleSpins','quantumHistogram')
+
+    def __init__(self,engine:str,quantum:int,trials:int=1,adaptive:bool=False):
+        self.engine           = engine
+        self.quantum          = quantum # Max quantum of an adaptive quantum
+        self.adaptive         = adaptive
+        self.trials           = trials
+        self.ops              = 0   # Port operations and no-operations simulated (all trials)
+        self.wallTime         = 0.0
+        self.cpuTime          = 0.0
+        self.kernelEvents     = 0
+        self.queuePeak        = 0
+        self.blockedTime      = 0.0
+        self.lockAcquisitions = 0
+        self.kernelWakeups    = 0
+        self.idleSpins        = 0
+        self.quantumCounts    = {}  # Rounds per quantum (adaptive quantum only)
+        self._t0              = None
+
+    def start(self):
+        self._t0 = (time.perf_counter(),time.process_time())
+
+    def stop(self):
+        self.wallTime = time.perf_counter() - self._t0[0]
+        self.cpuTime  = time.process_time() - self._t0[1]
+
+    @property
+    def opsPerSec(self)->float:
+        return self.ops/max(self.wallTime,1e-9)
+
+    @property
+    def eventsPerSec(self)->float:
+        return self.kernelEvents/max(self.wallTime,1e-9)
+
+    @property
+    def quantumHistogram(self)->dict:
+        '''
+        Rounds per power-of-two range of quanta, as {'lo-hi' : rounds}
+        '''
+        bins = {}
+        for quantum in sorted(self.quantumCounts):
+            lo  = 1 << (quantum.bit_length()-1)
+            key = f"{lo}" if lo == 1 else f"{lo}-{2*lo-1}"
+            bins[key] = bins.get(key,0) + self.quantumCounts[quantum]
+        return bins
+
+    def asdict(self)->dict:
+        return {f:getattr(self,f) for f in self.FIELDS}
+
+    def toJson(self,path:str):
+        with open(path,'w') as f:
+            json.dump(self.asdict(),f,indent=2)
+
+    def __str__(self):
+        rstr  = f"Simulation engine                 = {self.engine}\n"
+        if self.kernelEvents > 0:
+            rstr += f"Simulation event queue peak size  = {self.queuePeak}\n"
+            if self.adaptive:
+                rstr += f"Simulation quantum size           = adaptive (max {self.quantum})\n"
+            else:
+                rstr += f"Simulation quantum size           = {self.quantum}\n"
+            rstr += f"Total number of simulation events = {self.kernelEvents}\n"
+            rstr += f"Simulation events per second      = {self.eventsPerSec:.0f}\n"
+            rstr += f"Thread time blocked (seconds)     = {self.blockedTime:.2f}\n"
+            rstr += f"Kernel lock acquisitions          = {self.lockAcquisitions}\n"
+            rstr += f"Kernel wakeups (idle)             = {self.kernelWakeups} ({self.idleSpins})\n"
+        if self.quantumCounts:
+            rounds = sum(self.quantumCounts.values())
+            steps  = sum(q*n for q,n in self.quantumCounts.items())
+            rstr += f"Adaptive quantum rounds (mean)    = {rounds} ({steps/rounds:.1f} steps)\n"
+            for key,count in self.quantumHistogram.items():
+                rstr += f"  quantum {key:<25} = {count} ({count/rounds:.1%})\n"
+        if self.ops > 0:
+            rstr += f"Simulated operations              = {self.ops}\n"
+            rstr += f"Simulated operations per second   = {self.opsPerSec:.0f}\n"
+        rstr += f"Simulation wall time (seconds)    = {self.wallTime:.2f}\n"
+        rstr += f"Simulation CPU time (seconds)     = {self.cpuTime:.2f}\n"
+        return rstr
@@ -0,0 +1,76 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import json
+from dataclasses import dataclass,field,fields
+
+from fifo_pkg.SimConfig import SimConfig
+from fifo_pkg.SimMetrics import SimMetrics
+
+@dataclass
+class SimResult:
+    '''
+    Outcome of a FifoSimulator run, as returned by FifoSimulator.run():
+    - single runs fill in the port counts, the max level and the first error (errorType is
+      '' when the run passed), and their probabilities are 0.0 or 1.0
+    - Monte Carlo batches sum the port counts over the trials, report the highest max level
+      of any trial and the fractions of overrunning and underrunning trials
+    - exact analysis only reports the probabilities (the counts are None)
+    - runs with nosim only report the formulaic depth
+    '''
+    config              : SimConfig
+    quantum             : int
+    startLevel          : int
+    formulaicDepth      : int
+    pushCount           : int   = None # Excludes the initial level
+    popCount            : int   = None
+    wnopCount           : int   = None
+    rnopCount           : int   = None
+    maxLevel            : int   = None
+    errorType           : str   = ''
+    errorStep           : int   = None
+    overrunProbability  : float = None
+    underrunProbability : float = None
+    metrics             : SimMetrics = field(default=None,compare=False) # Timings differ between equal runs
+
+    @property
+    def failureProbability(self)->float:
+        if self.overrunProbability is None:
+            return None
+        return self.overrunProbability + self.underrunProbability
+
+    @property
+    def passed(self)->bool:
+        '''
+        True when no overrun or underrun occurred (in any trial), or None when nothing was
+        simulated (nosim runs)
+        '''
+        if self.failureProbability is None:
+            return None
+        return self.failureProbability == 0.0
+
+    @property
+    def bwratio(self)->float:
+        '''
+        Simulated write to read effective bandwidth ratio, as reported by Fifo
+        '''
+        if self.wnopCount is None:
+            return None
+        return self.rnopCount/self.wnopCount if self.wnopCount else float('inf')
+
+    def asdict(self)->dict:
+        result = {f.name:getattr(self,f.name) for f in fields(self)}
+        result['config']  = vars(self.config).copy()
+        result['metrics'] = self.metrics.asdict() if self.metrics is not None else None
+        return result
+
+    def toJson(self,path:str):
+        with open(path,'w') as f:
+            json.dump(self.asdict(),f,indent=2)
@@ -0,0 +1,202 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import os
+import csv
+import json
+import time
+import itertools
+import concurrent.futures
+import numpy as np
+
+from fifo_pkg.MonteCarlo import MonteCarlo
+
+def parse_values(spec)->list:
+    '''
+    Parses a grid axis specification: a list or a single integer, a comma separated
+    string of integers ("64,128,256") or an inclusive range string ("64:512:64")
+    '''
+    if isinstance(spec,(list,tuple)):
+        return [int(x) for x in spec]
+    if isinstance(spec,int):
+        return [spec]
+    spec = str(spec).strip()
+    if ':' in spec:
+        fields = [int(x) for x in spec.split(':')]
+        assert len(fields) in (2,3), f"Range '{spec}' must be start:stop or start:stop:step"
+        step = fields[2] if len(fields) == 3 else 1
+        assert step > 0, f"Range '{spec}' must have a positive step"
+        return list(range(fields[0],fields[1]+1,step))
+    return [int(x) for x in spec.split(',')]
+
+def run_point(point:dict,trials:int,seed:int)->dict:
+    '''
+    Simulates one grid point as a Monte Carlo batch and returns a flat result record.
+    This is a module level function so that it can be dispatched to worker processes
+    '''
+    t0 = time.perf_counter()
+    mc = MonteCarlo(
+        depth=point['depth'],
+        pl_size=point['plsize'],
+        writeBandwidth=point['writebw'],
+        readBandwidth=point['readbw'],
+        initLevel=point['initlevel'],
+        trials=trials,
+        seed=seed)
+    mc.run()
+    pct = mc.maxLevelPercentiles
+    bw  = mc.bwratios
+    result = dict(point)
+    result.update({
+        'trials'         : trials,
+        'seed'           : seed,
+        'overrun_prob'   : mc.overrunProbability,
+        'underrun_prob'  : mc.underrunProbability,
+        'maxlevel_p50'   : float(pct[50.0]),
+        'maxlevel_p99'   : float(pct[99.0]),
+        'maxlevel_max'   : float(pct[100.0]),
+        'bwratio_mean'   : float(np.nanmean(bw)) if np.any(~np.isnan(bw)) else None,
+        'elapsed_sec'    : time.perf_counter() - t0})
+    return result
+
+class SweepRunner(object):
+    '''
+    Runs a parameter sweep over the cartesian product of grid axes on a process pool.
+    Results are streamed to a CSV or JSON-lines file (chosen by the file extension) as
+    points complete. Points which are already present in the output file are skipped,
+    so an interrupted sweep resumes where it left off. A sweep only resumes into a file
+    written with the same trials and seed: records of other settings are not mixed.
+
+    Each point is seeded from the base seed and its own parameters, so a resumed sweep
+    produces the same records as an uninterrupted one.
+    '''
+
+    PARAMS   = ('depth','plsize','writebw','readbw','initlevel')
+    DEFAULTS = {'depth':128,'plsize':512,'writebw':1024,'readbw':1280,'initlevel':1}
+
+    def __init__(
+        self,
+        grid:dict,
+        output:str,
+        trials:int=1,
+        seed:int=0,
+        workers:int=None):
+        unknown = set(grid) - set(self.PARAMS)
+        assert not unknown, f"Unknown sweep parameters {sorted(unknown)}, expected {self.PARAMS}"
+        self._axes    = {p:parse_values(grid.get(p,self.DEFAULTS[p])) for p in self.PARAMS}
+        self._output  = output
+        self._trials  = trials
+        self._seed    = seed
+        self._workers = workers
+        self._jsonl   = os.path.splitext(output)[1].lower() in ('.jsonl','.json')
+
+        self.skipped  = 0 # Points already present in the output
+        self.invalid  = 0 # Points which violate initlevel < depth or initlevel < plsize
+        self.finished = 0 # Points completed by this run
+
+    @staticmethod
+    def key(point:dict)->tuple:
+        return tuple(int(point[p]) for p in SweepRunner.PARAMS)
+
+    def points(self)->list:
+        return [dict(zip(self.PARAMS,values)) for values in itertools.product(*(self._axes[p] for p in self.PARAMS))]
+
+    def seedOf(self,point:dict)->int:
+        return int(np.random.SeedSequence([self._seed,*self.key(point)]).generate_state(1)[0])
+
+    def completed(self)->dict:
+        '''
+        Returns the (trials,seed) settings of the points already recorded in the output
+        file, by point key
+        '''
+        done = {}
+        if not os.path.exists(self._output):
+            return done
+        with open(self._output,newline='') as f:
+            if self._jsonl:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        try:
+                            record = json.loads(line)
+                            done[self.key(record)] = (int(record['trials']),int(record['seed']))
+                        except (ValueError,KeyError):
+                            pass # Partially written record from an interrupted run
+            else:
+                for row in csv.DictReader(f):
+                    try:
+                        done[self.key(row)] = (int(row['trials']),int(row['seed']))
+                    except (ValueError,KeyError,TypeError):
+                        pass
+        return done
+
+    def _truncatePartial(self):
+        '''
+        Drops a trailing partial record left behind by an interrupted run, so that
+        appended records start on a fresh line
+        '''
+        if not os.path.exists(self._output):
+            return
+        with open(self._output,'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n')+1)
+
+    def run(self,progress=None):
+        '''
+        Runs all pending points. The optional progress callback is called with each
+        result record as it is written
+        '''
+        self._truncatePartial()
+        done    = self.completed()
+        pending = []
+        for point in self.points():
+            if self.key(point) in done:
+                assert done[self.key(point)] == (self._trials,self.seedOf(point)), \
+                    f"{self._output} holds point {point} with other trials/seed settings, use another output file"
+                self.skipped += 1
+            elif not (0 <= point['initlevel'] < point['depth'] and point['initlevel'] < point['plsize']):
+                self.invalid += 1
+            else:
+                pending.append(point)
+        if not pending:
+            return
+
+        fields = None
+        if not self._jsonl and os.path.exists(self._output) and os.path.getsize(self._output) > 0:
+            with open(self._output,newline='') as f:
+                fields = next(csv.reader(f),None)
+
+        with open(self._output,'a',newline='') as f:
+            writer = None
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self._workers) as executor:
+                futures = [executor.submit(run_point,point,self._trials,self.seedOf(point)) for point in pending]
+                for future in concurrent.futures.as_completed(futures):
+                    result = future.result()
+                    if self._jsonl:
+                        f.write(json.dumps(result)+'\n')
+                    else:
+                        if writer is None:
+                            writer = csv.DictWriter(f,fieldnames=fields or list(result))
+                            if fields is None:
+                                writer.writeheader()
+                        writer.writerow(result)
+                    f.flush()
+                    self.finished += 1
+                    if progress:
+                        progress(result)
+
+    def __str__(self):
+        rstr  = f"grid points            = {len(self.points())}\n"
+        rstr += f"completed by this run  = {self.finished}\n"
+        rstr += f"skipped (already done) = {self.skipped}\n"
+        rstr += f"skipped (invalid)      = {self.invalid}\n"
+        rstr += f"output file            = {self._output}\n"
+        return rstr
@@ -0,0 +1,149 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import os
+import numpy as np
+
+class TraceRecorder(object):
+    '''
+    Records a Fifo's operations as a compact binary level trace. Each record holds the
+    operation index (counting the operations and no-operations of both ports), the FIFO
+    level after the operation and an operation code (see OPS). Records are buffered and
+    appended to the file in chunks.
+
+    Decimation keeps traces of long simulations small:
+    - every=N only keeps the operations whose index is a multiple of N
+    - maxOnly=True only keeps the pushes which reach a new max level
+    Overrun and underrun records are always kept.
+
+    A trace is loaded back as a NumPy structured array with load().
+    '''
+
+    OPS    = ('push','pop','wnop','rnop','overrun','underrun')
+    PUSH,POP,WNOP,RNOP,OVERRUN,UNDERRUN = range(6)
+    DTYPE  = np.dtype([('step','<u8'),('level','<i4'),('op','u1')])
+    MAGIC  = b'FIFOTRC1'
+    SMALL_BATCH = 16 # Batches below this size are recorded one operation at a time
+
+    def __init__(self,path:str,every:int=1,maxOnly:bool=False,bufferSize:int=1<<16):
+        assert every > 0, f"Decimation factor ({every}) must be positive"
+        self._path       = path
+        self._every      = every
+        self._maxOnly    = maxOnly
+        self._bufferSize = bufferSize
+        self._max        = None # Highest level recorded by a push (maxOnly mode)
+        self._steps      = []   # Buffered single records
+        self._levels     = []
+        self._ops        = []
+        self._chunks     = []   # Buffered batches of records
+        self._pending    = 0
+        self.records     = 0    # Number of records written
+        self._file       = open(path,'wb')
+        self._file.write(self.MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+    def _keep(self,step:int,level:int,op:int)->bool:
+        if op >= self.OVERRUN:
+            return True
+        if self._maxOnly:
+            if op != self.PUSH or (self._max is not None and level <= self._max):
+                return False
+            self._max = level
+            return True
+        return step % self._every == 0
+
+    def record(self,step:int,level:int,op:int):
+        '''
+        Records a single operation
+        '''
+        if self._keep(step,level,op):
+            self._steps.append(step)
+            self._levels.append(level)
+            self._ops.append(op)
+            self._pending += 1
+            if self._pending >= self._bufferSize:
+                self.flush()
+
+    def record_n(self,step:int,level:int,count:int,op:int):
+        '''
+        Records a batch of count operations of the same kind starting at operation index
+        step and FIFO level level (before the batch). Pushes raise the level by one per
+        operation and pops lower it, no-operations leave it unchanged
+        '''
+        delta = 1 if op == self.PUSH else -1 if op == self.POP else 0
+        if count < self.SMALL_BATCH:
+            for i in range(count):
+                self.record(step+i,level+delta*(i+1),op)
+            return
+        if self._maxOnly:
+            if op != self.PUSH:
+                return
+            first = 0 if self._max is None else max(0,self._max-level)
+            idx   = np.arange(first,count)
+        else:
+            idx   = np.arange((-step) % self._every,count,self._every)
+        if idx.size == 0:
+            return
+        if self._maxOnly:
+            self._max = level + count
+        batch = np.empty(idx.size,dtype=self.DTYPE)
+        batch['step']  = step + idx
+        batch['level'] = level + delta*(idx+1)
+        batch['op']    = op
+        self._packSingles()
+        self._chunks.append(batch)
+        self._pending += idx.size
+        if self._pending >= self._bufferSize:
+            self.flush()
+
+    def _packSingles(self):
+        if self._steps:
+            batch = np.empty(len(self._steps),dtype=self.DTYPE)
+            batch['step']  = self._steps
+            batch['level'] = self._levels
+            batch['op']    = self._ops
+            self._chunks.append(batch)
+            self._steps,self._levels,self._ops = [],[],[]
+
+    def flush(self):
+        self._packSingles()
+        for batch in self._chunks:
+            batch.tofile(self._file)
+            self.records += batch.size
+        self._chunks  = []
+        self._pending = 0
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    @staticmethod
+    def load(path:str,mmap:bool=False)->np.ndarray:
+        '''
+        Returns the records of a trace file as a structured array with 'step', 'level' and
+        'op' fields. With mmap=True the file is memory-mapped rather than read
+        '''
+        with open(path,'rb') as f:
+            assert f.read(len(TraceRecorder.MAGIC)) == TraceRecorder.MAGIC, f"{path} is not a FIFO trace file"
+        if mmap and os.path.getsize(path) > len(TraceRecorder.MAGIC):
+            return np.memmap(path,dtype=TraceRecorder.DTYPE,mode='r',offset=len(TraceRecorder.MAGIC))
+        return np.fromfile(path,dtype=TraceRecorder.DTYPE,offset=len(TraceRecorder.MAGIC))
+
+    def __str__(self):
+        rstr  = f"trace file             = {self._path}\n"
+        rstr += f"trace records          = {self.records}\n"
+        return rstr
@@ -0,0 +1,190 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import numpy as np
+
+class TrafficModel(object):
+    '''
+    Base class of the per-cycle activity models of a FIFO port. A model is active on a
+    fraction p of the cycles on average, and owns its own seeded generator.
+
+    Subclasses generate activity in bulk with _generate(count), which returns the next
+    count cycles as a boolean array and carries any model state over to the next call.
+    The base class hands the activity out one cycle at a time (next), as lists (take)
+    or as arrays (read, readPacked) from the same sequence, buffering blocks of cycles so
+    that the per-operation cost is a buffer read.
+    '''
+
+    BLOCK_SIZE = 4096 # Cycles generated per refill
+
+    def __init__(self,p:float,seed=None):
+        assert 0.0 <= p <= 1.0, f"Probability {p} outside of [0,1]"
+        self._p     = p
+        self._rng   = np.random.default_rng(seed)
+        self._block = []
+        self._pos   = 0
+        self.draws  = 0 # Number of cycles handed out
+
+    @staticmethod
+    def spawn(seed,count:int)->list:
+        '''
+        Returns count independent child seeds of seed (an integer, a SeedSequence or None
+        for a non-deterministic seed)
+        '''
+        ss = seed if isinstance(seed,np.random.SeedSequence) else np.random.SeedSequence(seed)
+        return ss.spawn(count)
+
+    @property
+    def p(self)->float:
+        return self._p
+
+    def _generate(self,count:int)->np.ndarray:
+        raise NotImplementedError
+
+    def _refill(self):
+        self._block = self._generate(self.BLOCK_SIZE).tolist()
+        self._pos   = 0
+
+    def next(self)->bool:
+        if self._pos == len(self._block):
+            self._refill()
+        self._pos  += 1
+        self.draws += 1
+        return self._block[self._pos-1]
+
+    def take(self,count:int)->list:
+        '''
+        Returns the next count cycles as a list
+        '''
+        outcomes = []
+        while len(outcomes) < count:
+            if self._pos == len(self._block):
+                self._refill()
+            n = min(count - len(outcomes),len(self._block) - self._pos)
+            outcomes += self._block[self._pos:self._pos+n]
+            self._pos += n
+        self.draws += count
+        return outcomes
+
+    def read(self,count:int)->np.ndarray:
+        '''
+        Returns the next count cycles as a boolean array
+        '''
+        head = np.array(self._block[self._pos:self._pos+count],dtype=bool)
+        self._pos  += head.size
+        self.draws += count
+        if head.size == count:
+            return head
+        return np.concatenate((head,self._generate(count-head.size)))
+
+    def readPacked(self,count:int)->tuple:
+        '''
+        Returns the next count cycles packed 8 per byte (first cycle in the MSB) and the
+        number of cycles
+        '''
+        return (np.packbits(self.read(count)),count)
+
+class _RunLengthTraffic(TrafficModel):
+    '''
+    Activity made of alternating OFF and ON runs. Subclasses draw the run lengths with
+    _runs(count), and runs which extend beyond a generated block carry over to the next.
+    Runs are always drawn RUN_BATCH at a time, so the activity only depends on the seed
+    and not on how it is read (e.g. next() by a threaded engine or read() by ReplayEngine)
+    '''
+
+    RUN_BATCH = 1024
+
+    def __init__(self,p:float,seed=None):
+        super().__init__(p,seed)
+        self._pending = np.zeros(0,dtype=bool)
+
+    def _runs(self,count:int)->tuple:
+        raise NotImplementedError
+
+    def _generate(self,count:int)->np.ndarray:
+        if self._p in (0.0,1.0):
+            return np.full(count,self._p == 1.0)
+        chunks = [self._pending]
+        total  = self._pending.size
+        while total < count:
+            off,on   = self._runs(self.RUN_BATCH)
+            lengths  = np.column_stack((off,on)).ravel()
+            chunks.append(np.repeat(np.tile(np.array([False,True]),self.RUN_BATCH),lengths))
+            total   += chunks[-1].size
+        activity = np.concatenate(chunks)
+        self._pending = activity[count:]
+        return activity[:count]
+
+class BurstTraffic(_RunLengthTraffic):
+    '''
+    Fixed-length bursts (e.g. DMA bursts or packet trains): ON runs of exactly burst cycles
+    separated by idle gaps of geometric length (possibly zero), with a mean gap which
+    keeps the average activity at p
+    '''
+
+    def __init__(self,p:float,burst:int=8,seed=None):
+        assert burst >= 1, f"Burst length ({burst}) must be at least 1"
+        super().__init__(p,seed)
+        self._burst = int(burst)
+
+    def _runs(self,count:int)->tuple:
+        meanGap = self._burst*(1.0-self._p)/self._p
+        off = self._rng.geometric(1.0/(1.0+meanGap),count) - 1
+        return (off,np.full(count,self._burst))
+
+    def __str__(self):
+        return f"Burst(p={self._p:.4f}, burst={self._burst})"
+
+class OnOffTraffic(_RunLengthTraffic):
+    '''
+    Two-state Markov ON/OFF source: ON runs of geometric length with mean meanOn cycles,
+    and OFF runs of geometric length (possibly zero) with a mean which keeps the average
+    activity at p
+    '''
+
+    def __init__(self,p:float,meanOn:float=8.0,seed=None):
+        assert meanOn >= 1, f"Mean ON length ({meanOn}) must be at least 1"
+        super().__init__(p,seed)
+        self._meanOn = float(meanOn)
+
+    def _runs(self,count:int)->tuple:
+        meanOff = self._meanOn*(1.0-self._p)/self._p
+        off = self._rng.geometric(1.0/(1.0+meanOff),count) - 1
+        on  = self._rng.geometric(1.0/self._meanOn,count)
+        return (off,on)
+
+    def __str__(self):
+        return f"OnOff(p={self._p:.4f}, meanOn={self._meanOn:g})"
+
+class PeriodicTraffic(TrafficModel):
+    '''
+    Periodic duty cycle (e.g. periodic stalls): active for the first cycles of every period.
+    The ON length of period k is floor((k+1)*p*period) - floor(k*p*period) cycles, i.e.
+    floor(p*period) or one more, so that the average activity is exactly p even when
+    p*period is not an integer. The phase of the first period is drawn from the generator
+    '''
+
+    def __init__(self,p:float,period:int=16,seed=None):
+        assert period >= 1, f"Period ({period}) must be at least 1"
+        super().__init__(p,seed)
+        self._period = int(period)
+        self._on     = p*period # Average ON length
+        self._t      = int(self._rng.integers(period))
+
+    def _generate(self,count:int)->np.ndarray:
+        cycles   = np.arange(self._t,self._t+count,dtype=np.int64)
+        k        = cycles // self._period
+        on       = np.floor((k+1)*self._on) - np.floor(k*self._on)
+        activity = (cycles - k*self._period) < on
+        self._t += count
+        return activity
+
+    def __str__(self):
+        return f"Periodic(p={self._p:.4f}, period={self._period}, on={self._on:g})"
@@ -0,0 +1,188 @@
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import numpy as np
+
+from fifo_pkg.Fifo import Fifo
+
+class VectorEngine(object):
+    '''
+    Vectorized simulation engine for the producer/consumer model of FifoSimulator.
+    Rather than sequencing threads through a kernel, the producer and consumer Bernoulli
+    streams are drawn in bulk and the FIFO level trajectory is derived with cumulative sums.
+
+    Operations are sequenced at single step granularity (producer operation followed by
+    consumer operation for every step), which matches the threaded engine with a quantum
+    of 1. Once the producer has pushed its share of the payload the consumer pops
+    unconditionally, so the drain phase cannot fail and is accounted for analytically.
+
+    A depth of None simulates an unbounded FIFO (no overruns). As the trajectory does
+    not depend on the depth until an overrun, the maximum level of an unbounded trial
+    tells whether it would overrun at any depth (it does if maxLevel > depth).
+
+    Trials advance in chunks of steps. Only the per-trial counters, levels and the
+    generator state carry over from one chunk to the next, so memory use depends on the
+    chunk size and number of trials but not on the payload size. Trials which finish or
+    fail leave the batch at the end of their chunk.
+    '''
+
+    ERROR_TYPES = ('','overrun','underrun') # Indexed by the per-trial errorType code
+    CHUNK_SIZE  = 1<<20                     # Max number of (step x trial) elements per chunk
+    MAX_STEPS   = (1<<15)-1                 # Max steps per chunk (relative levels are int16)
+
+    def __init__(
+        self,
+        depth:int,
+        pl_size:int,
+        writeBandwidth:int,
+        readBandwidth:int,
+        initLevel:int,
+        rng:np.random.Generator=None,
+        chunkSteps:int=None):
+        self._depth      = depth if depth is not None else np.iinfo(np.int64).max//2
+        self._pl_size    = pl_size
+        self._init_level = initLevel
+        self._rng        = rng if rng is not None else np.random.default_rng()
+        self._chunkSteps = chunkSteps # Steps per chunk (default=sized by CHUNK_SIZE)
+
+        # Same per-step success probabilities as FifoSimulator.getRandomBool()
+        self._pw = float(writeBandwidth/(writeBandwidth+readBandwidth))
+        self._pr = float(readBandwidth/(writeBandwidth+readBandwidth))
+
+        assert 0 <= initLevel < self._depth, f"Specified init_level={initLevel} outside of [0,depth={depth})"
+        assert initLevel < pl_size, f"Specified init_level={initLevel} greater or equal to pl_size={pl_size}"
+        assert chunkSteps is None or chunkSteps > 0, f"Chunk size ({chunkSteps}) must be positive"
+
+    def run(self,trials:int=1,progress=None):
+        '''
+        Simulates a number of independent trials and populates the per-trial result arrays
+        (pushCount, popCount, wnopCount, rnopCount, maxLevel, errorType and errorStep).
+        Push counts exclude the initial level.
+        The optional progress callback is called after each chunk with the number of steps
+        simulated, and the pushes done and due over all trials
+        '''
+        npush = self._pl_size - self._init_level
+
+        self.pushCount = np.zeros(trials,dtype=np.int64)
+        self.popCount  = np.zeros(trials,dtype=np.int64)
+        self.wnopCount = np.zeros(trials,dtype=np.int64)
+        self.rnopCount = np.zeros(trials,dtype=np.int64)
+        self.maxLevel  = np.full(trials,self._init_level,dtype=np.int64)
+        self.errorType = np.zeros(trials,dtype=np.int8)
+        self.errorStep = np.full(trials,-1,dtype=np.int64)
+
+        # A single uniform draw per step selects one of four outcomes laid out as
+        # [push-only | push+pop | pop-only | nop], so push and pop remain independent
+        pw,pr = self._pw,self._pr
+        ta = np.float32(pw*(1.0-pr))
+        tb = np.float32(pw)
+        tc = np.float32(pw+pr*(1.0-pw))
+
+        active = np.arange(trials) # Trials whose producer is still pushing
+        step   = 0                 # Step index of the first row of the chunk
+        while active.size > 0:
+            rows = active.size
+            n    = self._chunkSteps if self._chunkSteps else min(self.MAX_STEPS,max(1,self.CHUNK_SIZE//rows))
+
+            P    = self.pushCount[active]
+            base = self._init_level + P - self.popCount[active] # Level at the start of the chunk
+
+            # Arrays are laid out (step,trial)
+            u = self._rng.random((n,rows),dtype=np.float32)
+            w = u < tb
+            r = (u >= ta) & (u < tc)
+
+            # The producer is active up to and including the step of its final push, and the
+            # consumer draws random operations for exactly those steps
+            nact = np.full(rows,n)
+            fin  = np.flatnonzero(P + np.count_nonzero(w,axis=0) >= npush)
+            if fin.size > 0:
+                last = (np.cumsum(w[:,fin],axis=0) >= (npush - P[fin])).argmax(axis=0)
+                tail = np.arange(n)[:,None] > last
+                w[:,fin] &= ~tail
+                r[:,fin] &= ~tail
+                nact[fin] = last + 1
+
+            # Level (relative to base) after each step, and as observed by the consumer,
+            # i.e. after the producer operation and before the consumer operation
+            lvl = self._cumsum(w.view(np.int8) - r.view(np.int8))
+            obs = lvl + r
+
+            peak   = obs.max(axis=0).astype(np.int64)
+            pushes = np.count_nonzero(w,axis=0)
+            pops   = pushes - lvl[-1]
+            pe     = nact.copy() # Number of producer steps which executed
+            ce     = nact.copy() # Number of consumer steps which executed
+
+            # Only trials which cross a bound need to locate their first error
+            err = np.flatnonzero((peak > self._depth - base) | (lvl.min(axis=0) < -base))
+            if err.size > 0:
+                ob = obs[:,err] > (self._depth - base[err])
+                ub = lvl[:,err] < -base[err]
+                fo = np.where(ob.any(axis=0),ob.argmax(axis=0),n)
+                fu = np.where(ub.any(axis=0),ub.argmax(axis=0),n)
+                isover  = fo <= fu # Producer operates before consumer within a step
+                pe[err] = np.where(isover,fo,fu+1)
+                ce[err] = np.where(isover,fo,fu)
+
+                steps = np.arange(n)[:,None]
+                pushes[err] = np.count_nonzero(w[:,err] & (steps < pe[err]),axis=0)
+                pops[err]   = np.count_nonzero(r[:,err] & (steps < ce[err]),axis=0)
+                peak[err]   = np.where(steps < pe[err],obs[:,err],0).max(axis=0)
+
+                self.errorType[active[err]] = np.where(isover,1,2)
+                self.errorStep[active[err]] = step + np.where(isover,fo,fu)
+
+            self.pushCount[active] += pushes
+            self.popCount[active]  += pops
+            self.wnopCount[active] += np.minimum(pe,nact) - pushes
+            self.rnopCount[active] += np.minimum(ce,nact) - pops
+            self.maxLevel[active]   = np.maximum(self.maxLevel[active],peak + base)
+
+            done   = (self.pushCount[active] == npush) | (self.errorType[active] != 0)
+            active = active[~done]
+            step  += n
+            if progress is not None:
+                progress(step,int(self.pushCount.sum()),trials*npush)
+
+        # Drain phase: the consumer pops the remainder of the payload without failing
+        ok = self.errorType == 0
+        self.popCount[ok] = self._pl_size
+
+    @staticmethod
+    def _cumsum(d:np.ndarray)->np.ndarray:
+        '''
+        Cumulative sum along the step axis of a (step,trial) array of +1/0/-1 deltas.
+        For wide batches the sum is accumulated one step at a time so that each addition
+        is a contiguous vector operation across all trials, which is several times faster
+        than np.cumsum along the leading axis. Relative levels are int16 for chunks of up to
+        MAX_STEPS steps, and int32 for longer chunks
+        '''
+        dtype = np.int16 if d.shape[0] <= VectorEngine.MAX_STEPS else np.int32
+        if d.shape[1] < 64:
+            return np.cumsum(d,axis=0,dtype=dtype)
+        acc = d.astype(dtype)
+        for i in range(1,acc.shape[0]):
+            np.add(acc[i-1],acc[i],out=acc[i])
+        return acc
+
+    def annotate(self,fifo:Fifo,trial:int=0):
+        '''
+        Back-annotates the statistics of one simulated trial onto a Fifo object which
+        was primed with the initial level
+        '''
+        fifo.bulk_ops(
+            pushes=int(self.pushCount[trial]),
+            pops=int(self.popCount[trial]),
+            wnops=int(self.wnopCount[trial]),
+            rnops=int(self.rnopCount[trial]),
+            maxLevel=int(self.maxLevel[trial]))
+        if self.errorType[trial]:
+            fifo.setError(self.ERROR_TYPES[self.errorType[trial]],int(self.errorStep[trial]))
@@ -15,12 +15,100 @@ import sys
 from fifo_pkg.WinWrap       import WinWrap
 from fifo_pkg.Fifo          import Fifo
 from fifo_pkg.FifoSimulator import FifoSimulator
+from fifo_pkg.FifoPipeline  import FifoPipeline
+from fifo_pkg.MultiPortFifo import MultiPortFifo
+from fifo_pkg.CdcEngine     import CdcEngine
+from fifo_pkg.TrafficModel  import TrafficModel
+from fifo_pkg.ResultCache   import ResultCache
+from fifo_pkg.TraceRecorder import TraceRecorder
+from fifo_pkg.ActivityTrace import ActivityTrace
+from fifo_pkg.SweepRunner   import parse_values
 from fifo_pkg.CLargs        import proc_cla
 
 def main():
 
     args = proc_cla(iparser=None,descr='FIFO simulator and size calculator')
 
+    if args.clear_cache:
+        cache = ResultCache(args.cache_dir)
+        cache.clear()
+        print(f"Cleared result cache {cache.path}\n")
+
+    if args.pipeline:
+        pipeline = FifoPipeline.from_config(args.pipeline,pl_size=args.plsize,seed=args.seed)
+        print(f"Running pipeline simulation ({args.pipeline})...")
+        pipeline.run()
+        print("\nFIFO Pipeline Simulation Summary:")
+        print("---------------------------------")
+        print(pipeline)
+        if pipeline.error is not None:
+            print("Simulation FAILED!")
+        else:
+            print("Simulation PASSED")
+        return
+
+    if args.multiport:
+        multiport = MultiPortFifo.from_config(args.multiport,pl_size=args.plsize,seed=args.seed)
+        print(f"Running multi-port simulation ({args.multiport})...")
+        multiport.run()
+        print("\nMulti-port FIFO Simulation Summary:")
+        print("-----------------------------------")
+        print(multiport)
+        if multiport.error is not None:
+            print("Simulation FAILED!")
+        else:
+            print("Simulation PASSED")
+        print(f"\nRequired Fifo depth per formulaic calculation = {multiport.calcDepth()}")
+        return
+
+    if args.wclk or args.rclk:
+        assert args.wclk and args.rclk, "CDC mode requires both --wclk and --rclk"
+        wseed,rseed = TrafficModel.spawn(args.seed,2)
+        cdc = CdcEngine(
+            depth=args.depth,
+            pl_size=args.plsize,
+            initLevel=args.initlevel,
+            writeClock=args.wclk,
+            readClock=args.rclk,
+            writeSource=FifoSimulator.trafficModel(args.write_model,args.wprob,wseed),
+            readSource=FifoSimulator.trafficModel(args.read_model,args.rprob,rseed),
+            syncStages=args.sync,
+            chunkEdges=args.chunk)
+        print("CDC Simulation config summary:")
+        print("------------------------------")
+        print(f"Payload size           = {args.plsize}")
+        print(f"Write clock            = {args.wclk} (activity {args.wprob:.4f})")
+        print(f"Read clock             = {args.rclk} (activity {args.rprob:.4f})")
+        print(f"Synchronizer stages    = {args.sync}")
+        print(f"Max FIFO depth         = {args.depth}")
+        print(f"Initial FIFO level     = {args.initlevel}\n")
+        if not args.nosim:
+            progress = None
+            if args.chunk:
+                def progress(edges:int,pushed:int,total:int):
+                    print(f"\rChunk done: {edges} write edges, {pushed}/{total} pushes ({pushed/total:.1%})",end='',file=sys.stderr,flush=True)
+            print("Running CDC simulation...")
+            cdc.run(progress=progress)
+            if progress is not None:
+                print(file=sys.stderr)
+            fifo = Fifo(depth=args.depth)
+            if args.initlevel:
+                fifo.bulk_pushes(args.initlevel)
+            cdc.annotate(fifo)
+            print("\nFIFO Simulation Summary:")
+            print("-------------------------")
+            print(fifo)
+            print("Clock Domain Crossing Summary:")
+            print("------------------------------")
+            print(cdc)
+            if fifo.error:
+                print("Simulation FAILED!")
+            else:
+                print("Simulation PASSED")
+            print(f"\nRequired Fifo depth per simulation (write side view) = {cdc.maxWriteLevel}")
+        print(f"\nRequired Fifo depth per formulaic calculation = {cdc.calcDepth()} ({cdc.calcDepth(syncStages=0)} without synchronizers)")
+        return
+
     print("Simulation config summary:")
     print("--------------------------")
     print(f"Payload size           = {args.plsize}")
@@ -29,9 +117,34 @@ def main():
     print(f"Requested W:R BW ratio = {float(args.writebw/args.readbw):.2f}")
     print(f"Max FIFO depth         = {args.depth}")
     print(f"Initial FIFO level     = {args.initlevel}")
-    print(f"Sim quantum            = {args.quantum}\n")
+    print(f"Sim quantum            = {args.quantum}{' (adaptive)' if args.adaptive else ''}")
+    print(f"Sim engine             = {args.engine}")
+    print(f"Write traffic model    = {args.write_model}")
+    print(f"Read traffic model     = {args.read_model}")
+    print(f"Sim trials             = {args.trials}\n")
+
+    trace = None
+    if args.trace:
+        if args.engine not in ('threaded','asyncio') or args.trials > 1:
+            print("Note: --trace is only recorded by single runs of the threaded/asyncio engines\n")
+        trace = TraceRecorder(args.trace,every=args.trace_every,maxOnly=args.trace_max)
 
-    fifo = Fifo(depth=args.depth,verbose=args.verbose)
+    wtrace = ActivityTrace(args.producer_trace,fmt=args.trace_format) if args.producer_trace else None
+    rtrace = ActivityTrace(args.consumer_trace,fmt=args.trace_format) if args.consumer_trace else None
+    engine = args.engine
+    if (wtrace or rtrace) and engine != 'vectorized':
+        print("Note: activity traces are replayed by the vectorized engine\n")
+        engine = 'vectorized'
+
+    progress = None
+    if args.chunk:
+        if engine != 'vectorized' and args.trials == 1:
+            print("Note: --chunk only applies to the vectorized engine, Monte Carlo runs and trace replays\n")
+        def progress(steps:int,pushed:int,total:int):
+            # Progress goes to stderr so that it stays out of the (cached) report
+            print(f"\rChunk done: {steps} steps, {pushed}/{total} pushes ({pushed/total:.1%})",end='',file=sys.stderr,flush=True)
+
+    fifo = Fifo(depth=args.depth,verbose=args.verbose,trace=trace)
 
     simulator = FifoSimulator(
         fifoHandle=fifo,
@@ -40,9 +153,84 @@ def main():
         readBandwidth=args.readbw,
         initLevel=args.initlevel,
         nosim=args.nosim,
-        simQuantum=args.quantum)
+        simQuantum=args.quantum,
+        adaptiveQuantum=args.adaptive,
+        engine=engine,
+        exactLevels=args.exact_levels,
+        trials=args.trials,
+        seed=args.seed,
+        writeTrace=wtrace,
+        readTrace=rtrace,
+        chunkSteps=args.chunk,
+        progress=progress,
+        writeModel=args.write_model,
+        readModel=args.read_model)
+
+    def run():
+        if args.solve:
+            simulator.solve(target=args.target)
+        elif args.precision:
+            simulator.estimate(
+                relError=args.precision,
+                confidence=args.confidence,
+                interval=args.interval,
+                event=args.event,
+                maxTrials=args.max_trials,
+                maxTime=args.max_time)
+        elif args.rare:
+            simulator.rareEvent(confidence=args.confidence)
+        elif args.index:
+            simulator.depthIndex(
+                path=args.index,
+                depths=parse_values(args.query_depths) if args.query_depths else None,
+                levels=parse_values(args.query_levels) if args.query_levels else None,
+                target=args.target)
+        else:
+            simulator.simulate()
+        if progress is not None:
+            print(file=sys.stderr)
+        if args.metrics_json:
+            simulator.metrics.toJson(args.metrics_json)
+            print(f"\nWrote performance metrics to {args.metrics_json}")
+        if trace is not None:
+            trace.close()
+            print("\nLevel trace:")
+            print("------------")
+            print(trace)
+
+    # Only deterministic runs are cached: seeded runs and exact analysis. Runs which
+    # measure performance, replay activity traces or write an index file are never
+    # replayed from the cache
+    cacheable = not (args.no_cache or args.nosim or args.verbose or args.trace or args.metrics_json or wtrace or rtrace or args.max_time or args.index) and (args.seed is not None or args.engine == 'exact')
+    if not cacheable:
+        run()
+        return
 
-    simulator.simulate()
+    key = {
+        'version'   : 2,
+        'mode'      : 'solve' if args.solve else 'estimate' if args.precision else 'rare' if args.rare else 'simulate',
+        'target'    : args.target if args.solve else None,
+        'precision' : [args.precision,args.confidence,args.interval,args.event,args.max_trials] if args.precision else None,
+        'confidence': args.confidence if args.precision or args.rare else None,
+        'engine'    : args.engine,
+        'exactlevels': args.exact_levels if args.engine == 'exact' else None,
+        'depth'     : args.depth,
+        'plsize'    : args.plsize,
+        'writebw'   : args.writebw,
+        'readbw'    : args.readbw,
+        'initlevel' : args.initlevel,
+        'quantum'   : args.quantum,
+        'adaptive'  : args.adaptive,
+        'chunk'     : args.chunk,
+        'models'    : [args.write_model,args.read_model],
+        'seed'      : args.seed,
+        'trials'    : args.trials}
+    cache = ResultCache(args.cache_dir)
+    if cache.call(key,run):
+        print("\n(Cached result)")
+    print("\nResult cache:")
+    print("-------------")
+    print(cache)
 
 if __name__ == '__main__':
     with WinWrap(main) as wmain:
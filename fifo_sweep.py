@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+# Copyright 2021 Sebastian Ahmed
+# This file, and derivatives thereof are licensed under the Apache License, Version 2.0 (the "License");
+# Use of this file means you agree to the terms and conditions of the license and are in full compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed under the License is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, EITHER EXPRESSED OR IMPLIED.
+# See the License for the specific language governing permissions and limitations under the License.
+
+import json
+import time
+
+from fifo_pkg.WinWrap     import WinWrap
+from fifo_pkg.SweepRunner import SweepRunner
+from fifo_pkg.CLargs      import proc_sweep_cla
+
+def main():
+
+    args = proc_sweep_cla(iparser=None,descr='FIFO simulator parameter sweep runner')
+
+    grid = {p:getattr(args,p) for p in SweepRunner.PARAMS}
+    if args.grid:
+        with open(args.grid) as f:
+            grid.update(json.load(f))
+
+    runner = SweepRunner(grid=grid,output=args.output,trials=args.trials,seed=args.seed,workers=args.workers)
+    total  = len(runner.points())
+
+    print(f"Sweeping {total} grid points ({args.trials} trials each)...")
+    t0 = time.perf_counter()
+    def progress(result):
+        print(f"[{runner.finished+runner.skipped+runner.invalid}/{total}] " +
+              " ".join(f"{p}={result[p]}" for p in SweepRunner.PARAMS) +
+              f" overrun={result['overrun_prob']:.4f} underrun={result['underrun_prob']:.4f}")
+    runner.run(progress=progress)
+
+    print("\nSweep Summary:")
+    print("--------------")
+    print(runner)
+    print(f"Total sweep time (seconds)        = {time.perf_counter()-t0:.1f}")
+
+if __name__ == '__main__':
+    with WinWrap(main) as wmain:
+        wmain()
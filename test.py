@@ -9,8 +9,33 @@
 # See the License for the specific language governing permissions and limitations under the License.
 
 import math
+import os
+import json
+import tempfile
+import io
+import contextlib
+import numpy as np
 from fifo_pkg.Fifo import Fifo
 from fifo_pkg.FifoSimulator import FifoSimulator
+from fifo_pkg.SimConfig import SimConfig
+from fifo_pkg.RingFifo import RingFifo
+from fifo_pkg.MonteCarlo import MonteCarlo
+from fifo_pkg.AdaptiveMonteCarlo import AdaptiveMonteCarlo
+from fifo_pkg.RareEventEstimator import RareEventEstimator
+from fifo_pkg.ExactEngine import ExactEngine
+from fifo_pkg.DepthSolver import DepthSolver
+from fifo_pkg.DepthIndex import DepthIndex
+from fifo_pkg.FifoPipeline import FifoPipeline
+from fifo_pkg.SweepRunner import SweepRunner
+from fifo_pkg.ResultCache import ResultCache
+from fifo_pkg.TraceRecorder import TraceRecorder
+from fifo_pkg.ActivityTrace import ActivityTrace
+from fifo_pkg.ReplayEngine import ReplayEngine
+from fifo_pkg.CdcEngine import CdcEngine
+from fifo_pkg.MultiPortFifo import MultiPortFifo
+from fifo_pkg.BernoulliStream import BernoulliStream
+from fifo_pkg.TrafficModel import TrafficModel
+from benchmarks import bench_engines
 
 def init_level(pl_size:int,wrbw:int,rdbw:int)->int:
     # The required depth of the FIFO depends on whether the read or write rate is higher
@@ -18,7 +43,7 @@ def init_level(pl_size:int,wrbw:int,rdbw:int)->int:
     rdepth = pl_size * (1.0 - float(wrbw)/float(rdbw))
     return math.ceil(max((wdepth),(rdepth)))
 
-def test(depth:int,pl_size:int,wrbw:int,rdbw:int,il:int,simQuantum:int,tol=0.30):
+def test(depth:int,pl_size:int,wrbw:int,rdbw:int,il:int,simQuantum:int,tol=0.30,engine:str='threaded'):
     fifo = Fifo(depth=depth,verbose=False)
     sim  = FifoSimulator(
         fifoHandle=fifo,
@@ -26,7 +51,8 @@ def test(depth:int,pl_size:int,wrbw:int,rdbw:int,il:int,simQuantum:int,tol=0.30)
         writeBandwidth=wrbw,
         readBandwidth=rdbw,
         initLevel=il,
-        simQuantum=simQuantum)
+        simQuantum=simQuantum,
+        engine=engine)
 
     sim.simulate()
 
@@ -37,11 +63,884 @@ def test(depth:int,pl_size:int,wrbw:int,rdbw:int,il:int,simQuantum:int,tol=0.30)
     assert fifo.bwratio > bw_ltol, f"Simulated W:R bandwidth ratio out of lower-bound ({bw_ltol:.3f})"
     assert fifo.bwratio < bw_utol, f"Simulated W:R bandwidth ratio out of upper-bound ({bw_utol:.3f})"
 
+def test_error_step(depth:int,pl_size:int,wrbw:int,rdbw:int,il:int):
+    '''
+    A FIFO which is too shallow must fail, and the reported error step must be consistent
+    with the operation counts of the failing port
+    '''
+    fifo = Fifo(depth=depth,verbose=False)
+    sim  = FifoSimulator(
+        fifoHandle=fifo,
+        pl_size=pl_size,
+        writeBandwidth=wrbw,
+        readBandwidth=rdbw,
+        initLevel=il,
+        engine='vectorized')
+
+    sim.simulate()
+
+    assert fifo.error, "Expected a FIFO error"
+    if fifo.errorType == 'overrun':
+        assert fifo.level == depth, f"Overrun reported at level {fifo.level}"
+        assert fifo.errorStep == fifo._pushCount - il + fifo._wnopCount, "Overrun step inconsistent with push port counts"
+    else:
+        assert fifo.level == 0, f"Underrun reported at level {fifo.level}"
+        assert fifo.errorStep == fifo._popCount + fifo._rnopCount, "Underrun step inconsistent with pop port counts"
+
+def test_bulk_ops(depth:int,counts:list):
+    '''
+    push_n()/pop_n() must match the same sequence of single push()/pop() calls, including
+    the error step of an overrun or underrun
+    '''
+    for bulk in (False,True):
+        fifo = Fifo(depth=depth,verbose=False)
+        for i,count in enumerate(counts):
+            if count > 0:
+                fifo.wnop(i)
+                if bulk:
+                    fifo.push_n(count)
+                else:
+                    for _ in range(count):
+                        fifo.push()
+            else:
+                fifo.rnop(i)
+                if bulk:
+                    fifo.pop_n(-count)
+                else:
+                    for _ in range(-count):
+                        fifo.pop()
+            if fifo.error:
+                break
+        if bulk:
+            assert str(fifo) == ref, f"Bulk operations differ from single operations:\n{fifo}\n{ref}"
+        ref = str(fifo)
+    assert not hasattr(fifo,'__dict__'), "Fifo instances should not have a __dict__"
+
+def test_ring_fifo(depth:int,size:int,chunk:int):
+    '''
+    A stream pushed through a RingFifo in chunks must come out in order, with pops
+    returning views into the ring
+    '''
+    fifo = RingFifo(depth=depth,dtype=np.int32)
+    src  = np.arange(size,dtype=np.int32)
+    out  = []
+    pos  = 0
+    while pos < size:
+        pos += fifo.push_array(src[pos:pos+min(chunk,fifo.depth-fifo.level)])
+        views = fifo.pop_array(min(chunk//2+1,fifo.level))
+        assert all(np.shares_memory(v,fifo._buf) for v in views if v.size > 0), "Pops should not copy"
+        out.extend(v.copy() for v in views)
+    out.extend(v.copy() for v in fifo.pop_array(fifo.level))
+    assert not fifo.error and fifo.maxLevel <= depth
+    assert (np.concatenate(out) == src).all(), "Stream order not preserved"
+
+    # Overrun keeps the entries that fit, and single objects round-trip
+    fifo = RingFifo(depth=3,dtype=object)
+    assert fifo.push_array([{'a':1},'b',(2,),4.0]) == 3 and fifo.errorType == 'overrun'
+    assert fifo.pop() == {'a':1} and [list(v) for v in fifo.pop_array(2)] == [['b',(2,)]]
+
+    # A RingFifo can be simulated, and reused by another run of the same simulator
+    fifo = RingFifo(depth=100,dtype=np.int32)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim    = FifoSimulator(fifoHandle=fifo,pl_size=1000,writeBandwidth=100,readBandwidth=100,initLevel=10,seed=1)
+        first  = sim.run()
+        second = sim.run()
+        third  = sim.run(sim.config.replace(depth=50))
+    assert first == second and fifo.dtype == np.int32 and fifo.maxLevel == third.maxLevel
+    assert fifo.depth == 50 and fifo._buf.size == 50
+    fifo.reset()
+    assert fifo.level == 0 and not fifo.error and fifo.push_array(np.arange(30)) == 30
+    assert (np.concatenate(fifo.pop_array(30)) == np.arange(30)).all()
+
+    # Sequence payloads are single entries of an object ring
+    fifo = RingFifo(depth=4,dtype=object)
+    assert fifo.push_array([(1,2),(3,4)]) == 2 and fifo.level == 2
+    assert fifo.push_array([[5,6],[7,8],[9,0]]) == 2 and fifo.errorType == 'overrun'
+    assert [list(v) for v in fifo.pop_array(4)] == [[(1,2),(3,4),[5,6],[7,8]]]
+
+def test_chunked(depth:int,pl_size:int,wrbw:int,rdbw:int,il:int,chunks:list,seed:int):
+    '''
+    A single vectorized run must not depend on its chunk size, and must report progress
+    after every chunk
+    '''
+    results = []
+    for chunk in chunks:
+        calls = []
+        fifo  = Fifo(depth=depth,verbose=False)
+        sim   = FifoSimulator(
+            fifoHandle=fifo,
+            pl_size=pl_size,
+            writeBandwidth=wrbw,
+            readBandwidth=rdbw,
+            initLevel=il,
+            engine='vectorized',
+            seed=seed,
+            chunkSteps=chunk,
+            progress=lambda steps,pushed,total: calls.append((steps,pushed,total)))
+        sim.simulate()
+        results.append(str(fifo))
+        steps = [c[0] for c in calls]
+        assert steps == [chunk*(i+1) for i in range(len(calls))], "Progress not reported per chunk"
+        assert all(a[1] <= b[1] for a,b in zip(calls,calls[1:])), "Progress went backwards"
+        if not fifo.error:
+            assert calls[-1][1] == calls[-1][2] == pl_size - il
+    assert all(r == results[0] for r in results), f"Results depend on the chunk size: {results}"
+
+def test_monte_carlo(depth:int,pl_size:int,wrbw:int,rdbw:int,il:int,trials:int,seed:int):
+    '''
+    Batched trials must be reproducible for a given seed and have consistent statistics
+    '''
+    runs = []
+    for _ in range(2):
+        mc = MonteCarlo(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il,trials=trials,seed=seed)
+        mc.run()
+        runs.append(mc)
+    print(runs[0])
+
+    a,b = runs[0].engine,runs[1].engine
+    assert (a.maxLevel == b.maxLevel).all() and (a.errorStep == b.errorStep).all(), "Seeded Monte Carlo runs differ"
+    assert abs(runs[0].failureProbability - runs[0].overrunProbability - runs[0].underrunProbability) < 1e-12
+    assert (a.maxLevel <= depth).all(), "Max level exceeds depth"
+    ok = a.errorType == 0
+    assert (a.pushCount[ok] + il == pl_size).all() and (a.popCount[ok] == pl_size).all(), "Passing trials did not transfer the payload"
+    assert (a.maxLevel[a.errorType == 1] == depth).all(), "Overrun trials must have reached depth"
+
+def test_exact(depth:int,pl_size:int,wrbw:int,rdbw:int,il:int,trials:int,seed:int):
+    '''
+    The exact engine must conserve probability and agree with a Monte Carlo batch. The
+    max-level distribution is opt-in, and does not change the configured depth's answer
+    '''
+    single = ExactEngine(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il)
+    single.run()
+    assert single.depths.tolist() == [depth] and single.maxLevelSurvival[0].size == 0
+    exact = ExactEngine(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il,maxLevelPoints=128)
+    exact.run()
+    assert abs(single.overrunProbability - exact.overrunProbability) < 1e-12 and abs(single.underrunProbability - exact.underrunProbability) < 1e-12
+    print(exact)
+    total = exact.overrun + exact.underrun + exact.completed
+    assert (abs(total - 1.0) < 1e-9).all(), "Exact probabilities do not sum to 1"
+
+    mc = MonteCarlo(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il,trials=trials,seed=seed)
+    mc.run()
+    for p,q in ((exact.overrunProbability,mc.overrunProbability),(exact.underrunProbability,mc.underrunProbability)):
+        sigma = math.sqrt(p*(1.0-p)/trials)
+        assert abs(p-q) < 5*sigma + 1e-12, f"Exact probability {p} and Monte Carlo estimate {q} disagree"
+    levels,probs = exact.maxLevelSurvival
+    for level,p in zip(levels,probs):
+        q = np.mean(mc.engine.maxLevel >= level)
+        assert abs(p-q) < 5*math.sqrt(p*(1.0-p)/trials) + 1e-12, f"Max-level survival at {level}: exact {p}, Monte Carlo {q}"
+
+def test_adaptive_monte_carlo(depth:int,pl_size:int,wrbw:int,rdbw:int,il:int,relError:float,seed:int):
+    '''
+    Checks the confidence intervals against known values, and that the estimator stops
+    at the requested precision with an interval containing the exact probability, or at
+    its trial budget
+    '''
+    lo,hi = AdaptiveMonteCarlo.clopperPearson(0,10)
+    assert lo == 0.0 and abs(hi - (1.0 - 0.025**0.1)) < 1e-9
+    lo,hi = AdaptiveMonteCarlo.clopperPearson(5,10)
+    assert abs(lo - 0.187086) < 1e-6 and abs(hi - 0.812914) < 1e-6
+    lo,hi = AdaptiveMonteCarlo.wilson(5,10)
+    assert abs(lo - 0.236593) < 1e-6 and abs(hi - 0.763407) < 1e-6
+
+    exact = ExactEngine(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il)
+    exact.run()
+    for interval in AdaptiveMonteCarlo.INTERVALS:
+        for event,p in (('overrun',exact.overrunProbability),('failure',exact.failureProbability())):
+            runs = []
+            for _ in range(2):
+                est = AdaptiveMonteCarlo(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il,
+                                         relError=relError,confidence=0.99,interval=interval,event=event,seed=seed)
+                est.run()
+                runs.append((est.trials,est.overrunCount,est.underrunCount))
+            print(est)
+            assert runs[0] == runs[1], "Seeded adaptive Monte Carlo runs differ"
+            assert est.stopReason == 'precision' and est.relativeError() <= relError
+            lo,hi = est.confidenceInterval()
+            assert lo <= p <= hi, f"Exact {event} probability {p} outside of {interval} interval [{lo},{hi}]"
+            assert est.count('failure') == est.count('overrun') + est.count('underrun')
+
+    est = AdaptiveMonteCarlo(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il,
+                             relError=relError/100,maxTrials=2500,seed=seed)
+    est.run()
+    assert est.stopReason == 'trials' and est.trials == 2500 and not est.converged
+
+def test_rare_event(moderate:tuple,rare:tuple,trials:int,seed:int):
+    '''
+    Importance sampling estimates must agree with plain Monte Carlo on a moderate overrun
+    probability, and with the exact engine on a very small one, within their standard
+    errors. Without a tilt the weights are the plain event indicators
+    '''
+    depth,pl_size,wrbw,rdbw,il = moderate
+    est = RareEventEstimator(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il,trials=trials,seed=seed)
+    est.run()
+    print(est)
+    assert est.qw > est.pw, "The overrun tilt did not raise the write activity"
+    mc = MonteCarlo(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il,trials=10*trials,seed=seed)
+    mc.run()
+    p  = mc.overrunProbability
+    se = math.sqrt(est.variance + p*(1.0-p)/mc.trials)
+    assert abs(est.probability - p) < 4*se, f"Rare-event estimate {est.probability} differs from Monte Carlo {p} (se {se})"
+
+    plain = RareEventEstimator(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il,trials=trials,
+                               writeProb=wrbw/(wrbw+rdbw),readProb=rdbw/(wrbw+rdbw),seed=seed)
+    plain.run()
+    assert set(np.unique(plain.weights)) <= {0.0,1.0} and plain.hits == np.count_nonzero(plain.weights)
+
+    depth,pl_size,wrbw,rdbw,il = rare
+    exact = ExactEngine(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il)
+    exact.run()
+    runs = []
+    for _ in range(2):
+        est = RareEventEstimator(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il,trials=trials,seed=seed)
+        est.run()
+        runs.append(est.probability)
+    print(est)
+    assert runs[0] == runs[1], "Seeded rare-event estimates differ"
+    p = exact.overrunProbability
+    assert p < 1e-10 and est.relativeError < 0.05
+    assert abs(est.probability - p) < 4*est.stdError, f"Rare-event estimate {est.probability} differs from exact {p} (se {est.stdError})"
+    lo,hi = est.confidenceInterval()
+    assert lo < est.probability < hi
+
+def test_depth_index(pl_size:int,wrbw:int,rdbw:int,points:list,trials:int,seed:int):
+    '''
+    Overrun/underrun rates queried from one index must agree with the exact engine at each
+    (depth,initial level) point. Depth curves must match single queries, a smaller max
+    depth must not change the answers within it, and a saved index must answer the same
+    '''
+    index = DepthIndex(pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,trials=trials,seed=seed).build()
+    print(index)
+    for depth,il in points:
+        exact = ExactEngine(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=il)
+        exact.run()
+        over,under = index.query(depth,il)
+        for name,q,p in (('overrun',over,exact.overrunProbability),('underrun',under,exact.underrunProbability)):
+            se = math.sqrt(max(p*(1.0-p),1.0/trials)/trials)
+            assert abs(q - p) < 4*se, f"Index {name} rate {q} differs from exact {p} at depth {depth}, initial level {il}"
+
+    depth,il = points[0]
+    depths,over,under = index.depthCurve(il)
+    assert np.all(np.diff(over) <= 0), "Overrun rate increases with the depth"
+    for i in range(0,depths.size,7):
+        assert (over[i],under[i]) == index.query(int(depths[i]),il)
+    d = index.minDepth(il,over[depth-il-1])
+    assert d <= depth and over[d-il-1] <= over[depth-il-1]
+
+    capped = DepthIndex(pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,trials=trials,maxDepth=depth,seed=seed).build()
+    assert capped.records <= index.records
+    assert all(capped.query(d,l) == index.query(d,l) for d in (depth,depth//2+1) for l in (0,il,depth//2))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp,'index.npz')
+        capped.save(path)
+        loaded = DepthIndex.load(path)
+    assert loaded.records == capped.records and loaded.maxDepth == depth
+    assert all(np.array_equal(a,b) for a,b in zip(loaded.depthCurve(il),capped.depthCurve(il)))
+
+def test_depth_solver(pl_size:int,wrbw:int,rdbw:int,target:float,trials:int,seed:int):
+    '''
+    The solved depth/initial level must be minimal on the solver's own batches (with half
+    of the target budgeted to underruns and the total failure rate below the target), and
+    an independent Monte Carlo run at the solution must fail at a rate close to the target
+    '''
+    solver = DepthSolver(pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,target=target,trials=trials,seed=seed)
+    depth,level = solver.solve()
+    print(solver)
+
+    assert solver.underrunProbability(level) < target/2, "Solved initial level misses the underrun budget"
+    assert level == 0 or solver.underrunProbability(level-1) >= target/2, "Solved initial level is not minimal"
+    assert solver.failureProbability(level,depth) < target, "Solved depth misses the target"
+    assert depth == level+1 or solver.failureProbability(level,depth-1) >= target, "Solved depth is not minimal"
+    p = solver.underrunProbability(level) + solver.overrunProbability(level,depth)
+    assert solver.failureProbability(level,depth) <= p, "Failures must be overruns or underruns"
+
+    mc = MonteCarlo(depth=depth,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,initLevel=level,trials=trials,seed=seed+1)
+    mc.run()
+    assert mc.failureProbability < 4*target, f"Independent failure rate {mc.failureProbability} far above target"
+
+def test_concurrent(num_sims:int,depth:int,pl_size:int,wrbw:int,rdbw:int,il:int,simQuantum:int):
+    '''
+    Many simulators sharing one asyncio event loop must each complete their payload
+    '''
+    fifos = [Fifo(depth=depth,verbose=False) for _ in range(num_sims)]
+    sims  = [FifoSimulator(
+        fifoHandle=fifo,
+        pl_size=pl_size,
+        writeBandwidth=wrbw,
+        readBandwidth=rdbw,
+        initLevel=il,
+        simQuantum=simQuantum,
+        engine='asyncio') for fifo in fifos]
+
+    FifoSimulator.simulate_concurrently(sims)
+
+    for fifo in fifos:
+        assert not fifo.error, f"FIFO error ({fifo.errorType})"
+        assert fifo.level == 0, f"FIFO not emptied (remaining entries={fifo.level})"
+        assert fifo._pushCount == pl_size and fifo._popCount == pl_size, "Payload not transferred"
+
+def test_seeded_threads(depth:int,pl_size:int,wrbw:int,rdbw:int,il:int,simQuantum:int,seed:int):
+    '''
+    Seeded threaded and asyncio runs must be reproducible, and identical to each other
+    since both kernels sequence the same streams in the same order
+    '''
+    results = []
+    for engine in ('threaded','threaded','asyncio'):
+        fifo = Fifo(depth=depth,verbose=False)
+        sim  = FifoSimulator(
+            fifoHandle=fifo,
+            pl_size=pl_size,
+            writeBandwidth=wrbw,
+            readBandwidth=rdbw,
+            initLevel=il,
+            simQuantum=simQuantum,
+            engine=engine,
+            seed=seed)
+        sim.simulate()
+        results.append(str(fifo))
+    assert results[0] == results[1], "Seeded threaded runs differ"
+    assert results[0] == results[2], "Seeded threaded and asyncio runs differ"
+
+def test_metrics(depth:int,pl_size:int,wrbw:int,rdbw:int,il:int,simQuantum:int,seed:int):
+    '''
+    Checks the performance metrics of a threaded run against the Fifo counters, and their
+    JSON export
+    '''
+    fifo = Fifo(depth=depth,verbose=False)
+    sim  = FifoSimulator(
+        fifoHandle=fifo,
+        pl_size=pl_size,
+        writeBandwidth=wrbw,
+        readBandwidth=rdbw,
+        initLevel=il,
+        simQuantum=simQuantum,
+        seed=seed)
+    metrics = sim.simulate()
+    assert metrics is sim.metrics
+    assert metrics.ops == fifo.opCount, f"Metrics op-count ({metrics.ops}) differs from Fifo op-count ({fifo.opCount})"
+    assert metrics.kernelEvents > 0 and metrics.queuePeak > 0
+    assert metrics.lockAcquisitions >= metrics.kernelEvents
+    assert metrics.idleSpins <= metrics.kernelWakeups
+    assert metrics.wallTime > 0 and 0 <= metrics.blockedTime
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir,'metrics.json')
+        metrics.toJson(path)
+        with open(path) as f:
+            data = json.load(f)
+    assert data['ops'] == metrics.ops and data['kernelEvents'] == metrics.kernelEvents
+    assert set(data) == set(metrics.FIELDS)
+
+def test_engine_order(configs:list,seeds:int):
+    '''
+    The threaded and asyncio engines must sequence every quantum, including the first
+    one, in the same kernel order: seeded runs give the same max level and counts
+    '''
+    for depth,pl_size,wrbw,rdbw,il,simQuantum in configs:
+        for seed in range(seeds):
+            results = {}
+            for engine in ('threaded','asyncio'):
+                fifo = Fifo(depth=depth,verbose=False)
+                sim  = FifoSimulator(fifoHandle=fifo,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,
+                                     initLevel=il,simQuantum=simQuantum,engine=engine,seed=seed)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    sim.run()
+                results[engine] = (fifo.maxLevel,str(fifo))
+            assert results['threaded'] == results['asyncio'], f"Engines disagree (seed {seed}, quantum {simQuantum}):\n{results}"
+
+def test_adaptive_quantum(configs:list,seeds:int):
+    '''
+    An adaptive quantum only runs rounds which cannot reach a bound, and replaces the max
+    level of each round by the one of its operations in step order, so seeded runs must
+    reproduce a quantum of 1 exactly with far fewer kernel events
+    '''
+    fields = ('errorType','errorStep','pushCount','popCount','wnopCount','rnopCount','maxLevel')
+    for config in configs:
+        for seed in range(seeds):
+            base = FifoSimulator.from_config(config.replace(seed=seed))
+            ref  = base.run()
+            for engine in ('threaded','asyncio'):
+                sim = FifoSimulator.from_config(config.replace(seed=seed,engine=engine,simQuantum=0,adaptiveQuantum=True))
+                res = sim.run()
+                for f in fields:
+                    assert getattr(res,f) == getattr(ref,f), f"Adaptive {engine} {f} {getattr(res,f)} != {getattr(ref,f)} (seed {seed}, {config})"
+                counts = sim.metrics.quantumCounts
+                assert sum(counts.values()) == sum(sim.metrics.quantumHistogram.values())
+                assert sum(q*n for q,n in counts.items()) >= res.pushCount + res.wnopCount
+                if res.passed:
+                    assert sim.metrics.kernelEvents < base.metrics.kernelEvents, "Adaptive quantum did not reduce the kernel events"
+                assert max(counts) <= config.depth//2
+
+def test_library_api(configs:list):
+    '''
+    One reused simulator must reproduce the results of a fresh simulator per config
+    without printing anything, and unseeded reruns must be independent samples
+    '''
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out), FifoSimulator.from_config(configs[0]) as sim:
+        reused = [sim.run(config) for config in configs]
+        again  = sim.run(configs[0])
+    assert out.getvalue() == '', f"run() printed:\n{out.getvalue()}"
+    assert again == reused[0], "Rerunning a seeded config did not reproduce its result"
+
+    for config,result in zip(configs,reused):
+        with contextlib.redirect_stdout(io.StringIO()):
+            fresh = FifoSimulator.from_config(config).run()
+        assert result == fresh, f"Reused simulator differs for {config}:\n{result}\n{fresh}"
+        if config.engine != 'exact':
+            assert result.metrics.ops > 0, f"No operations counted for {config}"
+            if config.trials == 1:
+                assert result.pushCount + result.startLevel == config.pl_size or not result.passed, f"Payload not pushed for {config}"
+
+    # An initial level of 0 starts with one entry, which is part of the payload in every engine
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = [FifoSimulator.from_config(SimConfig(depth=4000,pl_size=2000,writeBandwidth=300,readBandwidth=100,initLevel=0,engine=engine,seed=1)).run()
+                   for engine in ('threaded','asyncio','vectorized')]
+    for result in results:
+        assert result.passed and result.startLevel == 1 and result.pushCount == 1999 and result.popCount == 2000, f"Payload mismatch: {result}"
+    assert (results[0].maxLevel,results[0].wnopCount,results[0].rnopCount) == (results[1].maxLevel,results[1].wnopCount,results[1].rnopCount)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim = FifoSimulator(fifoHandle=Fifo(depth=configs[0].depth),pl_size=configs[0].pl_size,nosim=True)
+        assert sim.result().passed is None, "A run without simulation must not pass"
+        assert sim.run().passed is None and sim.run().formulaicDepth == sim.calcDepth()
+
+    sim = FifoSimulator.from_config(configs[0].replace(seed=None,engine='vectorized',trials=1))
+    samples = {(r.maxLevel,r.wnopCount) for r in (sim.run() for _ in range(5))}
+    assert len(samples) > 1, "Unseeded reruns are not independent"
+
+def test_benchmark(plsize:int,seed:int):
+    '''
+    Runs a small benchmark matrix and checks the regression check against a baseline
+    '''
+    runnable,skipped = bench_engines.cases(
+        engines=['threaded','vectorized'],
+        plsizes=[plsize,100*plsize],
+        quanta=[1,0],
+        ratios=[(110,100)],
+        maxEvents=plsize)
+    assert len(runnable) == 5 and len(skipped) == 1, "Unexpected benchmark matrix"
+    results = [bench_engines.run_case(case,seed=seed) for case in runnable if case['plsize'] == plsize]
+    for result in results:
+        assert result['datums_per_sec'] > 0 and result['peak_mem_bytes'] > 0
+
+    baseline = {'results':[dict(r) for r in results]}
+    assert bench_engines.compare(results,baseline,threshold=0.2) == []
+    baseline['results'][0]['datums_per_sec'] *= 2
+    baseline['results'][1]['peak_mem_bytes'] //= 2
+    assert len(bench_engines.compare(results,baseline,threshold=0.2)) == 2
+
+def test_traffic_models(models:list,p:float,cycles:int,seed:int):
+    '''
+    Checks the average activity of each traffic model (exact for the periodic duty cycle,
+    up to one period), that the activity does not depend
+    on how it is read, and that seeded threaded, asyncio and vectorized runs of a bursty
+    configuration agree (all three sequence one producer and one consumer op per step)
+    '''
+    for spec in models:
+        model = FifoSimulator.trafficModel(spec,p,seed)
+        rate  = model.read(cycles).mean()
+        assert abs(rate - p) < 0.02, f"{model} average activity {rate:.4f} differs from {p}"
+        if spec.startswith('periodic'):
+            period = int(spec.split(':')[1])
+            assert abs(rate - p) <= period/cycles, f"{model} duty cycle {rate:.6f} differs from {p}"
+
+        a = FifoSimulator.trafficModel(spec,p,seed)
+        b = FifoSimulator.trafficModel(spec,p,seed)
+        seq = [a.next() for _ in range(1000)] + a.take(5000) + a.read(20000).tolist()
+        assert seq == b.read(26000).tolist(), f"{model} activity depends on how it is read"
+
+    for wmodel,rmodel in zip(models,reversed(models)):
+        results = []
+        for engine in ('threaded','asyncio','vectorized'):
+            fifo = Fifo(depth=100,verbose=False)
+            sim  = FifoSimulator(
+                fifoHandle=fifo,
+                pl_size=20000,
+                writeBandwidth=100,
+                readBandwidth=100,
+                initLevel=50,
+                engine=engine,
+                seed=seed,
+                writeModel=wmodel,
+                readModel=rmodel)
+            sim.simulate()
+            results.append(str(fifo))
+        assert results[0] == results[1] == results[2], f"Engines disagree for {wmodel}/{rmodel}:\n{results}"
+
+def test_trace(depth:int,pl_size:int,wrbw:int,rdbw:int,il:int,simQuantum:int,seed:int,every:int):
+    '''
+    A full trace must replay the FIFO level, and decimated traces must be subsets of it
+    '''
+    with tempfile.TemporaryDirectory() as tmp:
+        traces = {}
+        for name,kwargs in (('full',{}),('every',{'every':every}),('max',{'maxOnly':True})):
+            path = os.path.join(tmp,name+'.bin')
+            fifo = Fifo(depth=depth,trace=TraceRecorder(path,**kwargs))
+            sim  = FifoSimulator(fifoHandle=fifo,pl_size=pl_size,writeBandwidth=wrbw,readBandwidth=rdbw,
+                                 initLevel=il,simQuantum=simQuantum,engine='threaded',seed=seed)
+            sim.simulate()
+            fifo._trace.close()
+            traces[name] = TraceRecorder.load(path,mmap=(name == 'full'))
+
+        full,ops = traces['full'],traces['full']['op']
+        assert full.size == fifo.opCount + fifo.error, "Trace does not cover every operation"
+        assert (full['step'] == np.arange(full.size)).all()
+        level = il + np.cumsum(ops == TraceRecorder.PUSH) - np.cumsum(ops == TraceRecorder.POP)
+        assert (full['level'] == level).all(), "Traced levels do not replay the FIFO level"
+        assert full['level'].max() == fifo.maxLevel
+        ok     = full[full['op'] < TraceRecorder.OVERRUN]
+        sample = traces['every'][traces['every']['op'] < TraceRecorder.OVERRUN]
+        assert (sample == ok[ok['step'] % every == 0]).all(), "Decimated trace is not a subset of the full trace"
+        maxima = traces['max'][traces['max']['op'] == TraceRecorder.PUSH]
+        assert (np.diff(maxima['level']) > 0).all() and maxima['level'][-1] == fifo.maxLevel
+
+def test_replay(depth:int,pl_size:int,il:int,cycles:int,pw:float,pr:float,chunkSize:int,seed:int):
+    '''
+    Replays random activity traces in each format and checks the chunked replay against a
+    cycle by cycle replay through a Fifo object
+    '''
+    rng = np.random.default_rng(seed)
+    w   = rng.random(cycles) < pw
+    r   = rng.random(cycles) < pr
+
+    ref = Fifo(depth=depth)
+    ref.bulk_pushes(il)
+    pushes = 0
+    for cycle in range(cycles):
+        if w[cycle]:
+            ref.push()
+            pushes += 1
+        else:
+            ref.wnop()
+        if ref.error:
+            break
+        if r[cycle]:
+            ref.pop()
+        else:
+            ref.rnop()
+        if ref.error or pushes == pl_size - il:
+            break
+    if not ref.error and pushes == pl_size - il:
+        ref.pop_n(ref.level) # Drain
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = {
+            'bits'  : os.path.join(tmpdir,'w.bits'),
+            'bytes' : os.path.join(tmpdir,'w.u8'),
+            'npy'   : os.path.join(tmpdir,'r.npy')}
+        np.packbits(w).tofile(paths['bits'])
+        w.astype(np.uint8).tofile(paths['bytes'])
+        np.save(paths['npy'],r)
+        for fmt in ('bits','bytes'):
+            fifo = Fifo(depth=depth)
+            fifo.bulk_pushes(il)
+            replay = ReplayEngine(
+                depth=depth,
+                pl_size=pl_size,
+                initLevel=il,
+                writeSource=ActivityTrace(paths[fmt],cycles=cycles),
+                readSource=ActivityTrace(paths['npy']),
+                chunkSize=chunkSize)
+            replay.run()
+            replay.annotate(fifo)
+            assert str(fifo) == str(ref), f"Replay of {fmt} trace differs from cycle by cycle replay:\n{fifo}\n{ref}"
+
+def cdc_reference(depth:int,pl_size:int,il:int,wclk:int,rclk:int,w:list,r:list,sync:int)->tuple:
+    '''
+    Edge by edge model of a CDC FIFO: returns (pushes, pops, max level, write-side max level,
+    error type, failing edge) for activity lists w and r of the write and read edges
+    '''
+    g = math.gcd(wclk,rclk)
+    edges = sorted([(k*rclk//g,0,k) for k in range(1,len(w)+1)] + [(j*wclk//g,1,j) for j in range(1,len(r)+1)])
+    ptime,pcount,rtime,rcount = [0],[0],[0],[0] # Edge times and counts after each edge
+    pushes,pops,level,maxLevel,maxWrite = 0,0,il,il,il
+    for t,port,n in edges:
+        if port == 0:
+            if pushes == pl_size - il:
+                break
+            seen = rcount[sum(1 for x in rtime[1:] if x < t - sync*rclk//g)]
+            if w[n-1]:
+                if il + pushes - seen == depth:
+                    return (pushes,pops,maxLevel,maxWrite,'overrun',n-1)
+                pushes,level = pushes+1,level+1
+                maxLevel = max(maxLevel,level)
+            maxWrite = max(maxWrite,il + pushes - seen)
+            ptime.append(t)
+            pcount.append(pushes)
+        else:
+            if pushes == pl_size - il and t > ptime[-1]:
+                break
+            seen = pcount[sum(1 for x in ptime[1:] if x <= t - sync*wclk//g)]
+            if r[n-1]:
+                if il + seen - pops == 0:
+                    return (pushes,pops,maxLevel,maxWrite,'underrun',n-1)
+                pops,level = pops+1,level-1
+            rtime.append(t)
+            rcount.append(pops)
+    return (pushes,pl_size,maxLevel,maxWrite,'',-1)
+
+def test_cdc(configs:list,seed:int):
+    '''
+    CdcEngine must match an edge by edge model for each (wclk, rclk, sync, depth, pl_size,
+    initlevel, pw, pr) config and chunk size, and reduce to the step model of ReplayEngine
+    with equal clocks and no synchronizers
+    '''
+    class Activity:
+        def __init__(self,seq:np.ndarray,p:float):
+            self.seq,self.p,self.pos = seq,p,0
+        def read(self,count:int)->np.ndarray:
+            self.pos += count
+            return self.seq[self.pos-count:self.pos]
+
+    rng = np.random.default_rng(seed)
+    for wclk,rclk,sync,depth,pl_size,il,pw,pr in configs:
+        w = rng.random(4*pl_size*rclk) < pw
+        r = rng.random(4*pl_size*wclk) < pr
+        expected = cdc_reference(depth,pl_size,il,wclk,rclk,w.tolist(),r.tolist(),sync)
+        for chunkEdges in (1,7,1000):
+            cdc = CdcEngine(depth,pl_size,il,wclk,rclk,Activity(w,pw),Activity(r,pr),sync,chunkEdges=chunkEdges)
+            cdc.run()
+            result = (cdc.pushCount,cdc.popCount,cdc.maxLevel,cdc.maxWriteLevel,CdcEngine.ERROR_TYPES[cdc.errorType],cdc.errorEdge)
+            assert result == expected, f"CDC {wclk}:{rclk} sync={sync} chunk={chunkEdges}: {result} != {expected}"
+        assert cdc.calcDepth() >= cdc.calcDepth(syncStages=0), "Synchronizers must not reduce the formulaic depth"
+
+    for pw,pr in ((0.52,0.5),(0.5,0.52)):
+        ws,rs = TrafficModel.spawn(seed,2)
+        cdc = CdcEngine(200,20000,100,7,7,BernoulliStream(pw,ws),BernoulliStream(pr,rs),syncStages=0,chunkEdges=999)
+        cdc.run()
+        ws,rs = TrafficModel.spawn(seed,2)
+        replay = ReplayEngine(200,20000,100,BernoulliStream(pw,ws),BernoulliStream(pr,rs))
+        replay.run()
+        a,b = Fifo(depth=200),Fifo(depth=200)
+        a.bulk_pushes(100)
+        b.bulk_pushes(100)
+        cdc.annotate(a)
+        replay.annotate(b)
+        assert str(a) == str(b), f"CDC mode with equal clocks differs from the step model:\n{a}\n{b}"
+
+def multiport_reference(depth:int,pl_size:int,il:int,wbw:list,rbw:list,arbitration:str,weights:list,stall:list,seed:int)->tuple:
+    '''
+    Port by port model of MultiPortFifo (requests drawn as MultiPortFifo does): returns
+    the grants and max waits per side, the max level and the error
+    '''
+    rng   = np.random.default_rng(seed)
+    clock = sum(wbw) + sum(rbw)
+    probs = (np.array(wbw)/clock,np.array(rbw)/clock)
+    ports = (len(wbw),len(rbw))
+    pend  = ([False]*ports[0],[False]*ports[1])
+    since = ([0]*ports[0],[0]*ports[1])
+    grant = ([0]*ports[0],[0]*ports[1])
+    wmax  = ([0]*ports[0],[0]*ports[1])
+    last,credit = [-1,-1],[0,0]
+    level,maxLevel,pushes,cycle = il,il,0,0
+
+    def finish(error):
+        # Requests still waiting at the end count towards the max waits
+        for side in range(2):
+            for i in range(ports[side]):
+                if pend[side][i]:
+                    wmax[side][i] = max(wmax[side][i],cycle - since[side][i])
+        return (grant,wmax,maxLevel,error)
+
+    while True:
+        reqs = [rng.random((MultiPortFifo.CHUNK_STEPS,ports[side])) < probs[side] for side in range(2)]
+        for t in range(MultiPortFifo.CHUNK_STEPS):
+            for side in range(2):
+                for i in range(ports[side]):
+                    if reqs[side][t,i] and not pend[side][i]:
+                        pend[side][i],since[side][i] = True,cycle
+            for side in range(2):
+                waiting = [i for i in range(ports[side]) if pend[side][i]]
+                if not waiting:
+                    continue
+                if arbitration == 'fixed':
+                    port = waiting[0]
+                elif arbitration == 'weighted' and credit[side] > 0 and pend[side][last[side]]:
+                    port = last[side]
+                else:
+                    port = min(waiting,key=lambda i: (i - last[side] - 1) % ports[side])
+                    credit[side] = weights[side][port]
+                if (level == depth) if side == 0 else (level == 0):
+                    if not stall[side][port]:
+                        return finish(('overrun' if side == 0 else 'underrun',port,cycle))
+                    continue
+                level += 1 if side == 0 else -1
+                maxLevel = max(maxLevel,level)
+                pend[side][port] = False
+                grant[side][port] += 1
+                wmax[side][port] = max(wmax[side][port],cycle - since[side][port])
+                last[side],credit[side] = port,credit[side]-1
+                pushes += side == 0
+            cycle += 1
+            if pushes == pl_size - il:
+                return finish(None)
+
+def test_multiport(depth:int,pl_size:int,il:int,wbw:list,rbw:list,seed:int):
+    '''
+    MultiPortFifo must match a port by port model for each arbitration policy and for
+    stalling and non-stalling ports, fixed priority must starve the lowest priority port
+    most, and saturated weighted arbitration must share the grants by weight
+    '''
+    weights = ([1+i%3 for i in range(len(wbw))],[1]*len(rbw))
+    for arbitration in MultiPortFifo.ARBITERS:
+        for stall in (([False]*len(wbw),[False]*len(rbw)),([True]*len(wbw),[True]*len(rbw))):
+            fifo = MultiPortFifo(depth,pl_size,wbw,rbw,initLevel=il,arbitration=arbitration,
+                                 writeWeights=weights[0],readWeights=weights[1],writeStall=stall[0],readStall=stall[1],seed=seed)
+            fifo.run()
+            expected = multiport_reference(depth,pl_size,il,wbw,rbw,arbitration,weights,stall,seed)
+            result   = (tuple(map(list,fifo.grants)),tuple(map(list,fifo.maxWait)),fifo.maxLevel,fifo.error)
+            assert result == expected, f"{arbitration} stall={stall[0][0]}: {result} != {expected}"
+            assert fifo.pushCount == sum(fifo.grants[0]) and sum(fifo.requests[0]) >= fifo.pushCount, f"{arbitration}: inconsistent producer counts"
+
+    starve = {}
+    for arbitration in ('roundrobin','fixed'):
+        fifo = MultiPortFifo(10**6,20000,[30]*8,[240],initLevel=1000,arbitration=arbitration,readStall=[True],seed=seed)
+        fifo.run()
+        starve[arbitration] = fifo.maxWait[0]
+    assert starve['fixed'][-1] > max(starve['fixed'][0],starve['roundrobin'][-1]), f"Fixed priority did not starve the last port: {starve}"
+
+    fifo = MultiPortFifo(10**6,20000,[1]*3,[1],initLevel=1000,arbitration='weighted',writeWeights=[1,2,5],readStall=[True],clock=1,seed=seed)
+    fifo.run()
+    share = np.array(fifo.grants[0])/sum(fifo.grants[0])
+    assert np.allclose(share,np.array([1,2,5])/8,atol=0.01), f"Weighted grants {fifo.grants[0]} do not follow the weights"
+
+def test_pipeline(depths:list,bandwidths:list,pl_size:int,initLevels:list,seed:int):
+    '''
+    A backpressured pipeline with a primed consumer FIFO must transfer the whole payload
+    and conserve data between adjacent FIFOs
+    '''
+    stall = [False]+[True]*(len(depths)-1)+[False]
+    pipeline = FifoPipeline(depths=depths,bandwidths=bandwidths,pl_size=pl_size,initLevels=initLevels,stall=stall,seed=seed)
+    pipeline.run()
+    print(pipeline)
+
+    assert pipeline.error is None, f"Pipeline error {pipeline.error}"
+    assert pipeline.popCount[-1] == pl_size, "Consumer did not receive the payload"
+    for i in range(len(depths)):
+        assert pipeline.levels[i] == initLevels[i] + pipeline.pushCount[i] - pipeline.popCount[i], f"FIFO {i} level mismatch"
+        assert pipeline.maxLevel[i] <= depths[i], f"FIFO {i} exceeded its depth"
+        if i > 0:
+            assert pipeline.pushCount[i] == pipeline.popCount[i-1], f"Data lost between FIFO {i-1} and {i}"
+
+def test_sweep_resume(grid:dict,trials:int):
+    '''
+    A sweep interrupted part-way (including a partially written record) must resume
+    without re-running completed points and produce the same records as a full sweep.
+    Resuming into a file written with other trials or seed settings must be refused
+    '''
+    def records(path):
+        with open(path) as f:
+            return {SweepRunner.key(r):r['overrun_prob'] for r in map(json.loads,f)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full    = os.path.join(tmp,'full.jsonl')
+        resumed = os.path.join(tmp,'resumed.jsonl')
+        SweepRunner(grid=grid,output=full,trials=trials,seed=5,workers=2).run()
+
+        with open(full) as f:
+            lines = f.readlines()
+        with open(resumed,'w') as f:
+            f.writelines(lines[:len(lines)//2])
+            f.write(lines[-1][:10]) # Simulated crash mid-record
+
+        runner = SweepRunner(grid=grid,output=resumed,trials=trials,seed=5,workers=2)
+        runner.run()
+        assert runner.skipped == len(lines)//2, f"Expected {len(lines)//2} skipped points, got {runner.skipped}"
+        assert records(resumed) == records(full), "Resumed sweep differs from the uninterrupted sweep"
+
+        for settings in ({'trials':trials+1,'seed':5},{'trials':trials,'seed':6}):
+            try:
+                SweepRunner(grid=grid,output=resumed,workers=2,**settings).run()
+            except AssertionError:
+                pass
+            else:
+                assert False, f"Sweep resumed into a file written with other settings ({settings})"
+        assert records(resumed) == records(full)
+
+def test_result_cache(entries:int,maxBytes:int):
+    '''
+    Cache hits must replay the report of the miss, and eviction must drop the least
+    recently used entries first
+    '''
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(tmp,maxBytes=maxBytes)
+        key   = {'engine':'exact','depth':64,'seed':None}
+        runs  = []
+        assert not cache.call(key,lambda: runs.append(print("report line")))
+        assert cache.call(key,lambda: runs.append(None)), "Second call was not a cache hit"
+        assert len(runs) == 1 and cache.get(key)['report'] == "report line\n"
+        assert (cache.hits,cache.misses) == (2,1) and cache.totals() == {'hits':2,'misses':1}
+
+        for i in range(entries):
+            cache.put({'depth':i},{'report':'x'*100})
+            os.utime(cache._entry({'depth':i}),(i,i)) # Deterministic LRU order
+            cache.get({'depth':0}) # Keep the first entry recently used
+        assert cache.get({'depth':0}) is not None, "Recently used entry was evicted"
+        assert cache.get({'depth':1}) is None, "Least recently used entry was not evicted"
+        assert sum(os.path.getsize(e) for e in cache._entries()) <= maxBytes
+        print(cache)
+
+        cache.clear()
+        assert cache.get(key) is None and cache.totals() == {'hits':0,'misses':1}
+
 def main():
     for _ in range(5):
         test(depth=400,pl_size=200,wrbw=110,rdbw=100,il=40,simQuantum=1)
         il = init_level(200,100,110)
         test(depth=400,pl_size=200,wrbw=100,rdbw=110,il=math.ceil(il*3),simQuantum=1)
+        test(depth=400,pl_size=200,wrbw=110,rdbw=100,il=40,simQuantum=1,engine='asyncio')
+
+    test_concurrent(num_sims=200,depth=400,pl_size=200,wrbw=110,rdbw=100,il=40,simQuantum=2)
+
+    for _ in range(5):
+        test(depth=40000,pl_size=200000,wrbw=110,rdbw=100,il=40,simQuantum=1,tol=0.05,engine='vectorized')
+        test_error_step(depth=50,pl_size=100000,wrbw=110,rdbw=100,il=10)
+        test_error_step(depth=5000,pl_size=100000,wrbw=100,rdbw=110,il=1)
+
+    test_seeded_threads(depth=64,pl_size=5000,wrbw=100,rdbw=100,il=32,simQuantum=3,seed=11)
+    test_metrics(depth=64,pl_size=5000,wrbw=100,rdbw=100,il=32,simQuantum=4,seed=2)
+    test_adaptive_quantum(configs=[
+        SimConfig(depth=64,pl_size=5000,initLevel=32),
+        SimConfig(depth=40,pl_size=3000,writeBandwidth=105,initLevel=5),
+        SimConfig(depth=40,pl_size=3000,readBandwidth=104,initLevel=30),
+        SimConfig(depth=300,pl_size=8000,initLevel=150)],seeds=3)
+    test_engine_order(configs=[(16,500,100,100,2,6),(8,400,120,100,1,4),(64,3000,100,105,5,10)],seeds=10)
+    test_library_api(configs=[
+        SimConfig(depth=64,pl_size=5000,initLevel=32,simQuantum=3,seed=5),
+        SimConfig(depth=8,pl_size=5000,writeBandwidth=110,initLevel=4,seed=6),
+        SimConfig(depth=100,pl_size=5000,initLevel=50,engine='asyncio',seed=7,writeModel='burst:4'),
+        SimConfig(depth=200,pl_size=20000,initLevel=100,engine='vectorized',seed=8),
+        SimConfig(depth=40,pl_size=2000,initLevel=20,engine='vectorized',trials=500,seed=9),
+        SimConfig(depth=40,pl_size=300,initLevel=20,engine='exact'),
+        SimConfig(depth=64,pl_size=5000,initLevel=32,simQuantum=0,seed=5)])
+    test_benchmark(plsize=1000,seed=4)
+    test_traffic_models(models=['bernoulli','burst:16','onoff:4.5','periodic:20'],p=0.45,cycles=1000000,seed=8)
+    test_trace(depth=64,pl_size=5000,wrbw=110,rdbw=100,il=32,simQuantum=5,seed=3,every=7)
+    test_replay(depth=200,pl_size=20000,il=100,cycles=20003,pw=0.52,pr=0.5,chunkSize=1000,seed=1)
+    test_replay(depth=200,pl_size=20000,il=100,cycles=20003,pw=0.48,pr=0.5,chunkSize=64,seed=2)
+    test_replay(depth=500,pl_size=2000,il=250,cycles=20003,pw=0.5,pr=0.5,chunkSize=4096,seed=3)
+    test_replay(depth=5000,pl_size=20000,il=2500,cycles=10001,pw=0.5,pr=0.5,chunkSize=800,seed=4)
+    test_cdc(configs=[(200,250,2,200,400,100,1.0,0.8),(3,2,1,12,300,6,0.7,0.9),(5,7,3,20,300,10,0.9,0.8),
+                      (1,1,0,10,300,5,0.6,0.6),(4,1,2,30,200,1,0.3,1.0)],seed=12)
+    test_multiport(depth=48,pl_size=3000,il=24,wbw=[10,10,20,5,15],rbw=[30,25],seed=3)
+    test_pipeline(depths=[1000,16,16,500],bandwidths=[100,130,120,130,100],pl_size=20000,initLevels=[1,0,0,400],seed=3)
+    test_sweep_resume(grid={'depth':'32:128:32','writebw':'100,110','readbw':100,'initlevel':'1,16','plsize':1000},trials=100)
+    test_bulk_ops(depth=8,counts=[3,-2,6,-7,4,2])
+    test_bulk_ops(depth=8,counts=[3,-2,6,-1,4,-9])
+    test_bulk_ops(depth=8,counts=[5,-5,1,-2])
+    test_ring_fifo(depth=1000,size=1000000,chunk=384)
+    test_chunked(depth=1000,pl_size=200000,wrbw=100,rdbw=100,il=500,chunks=[1000,4096,100000],seed=6)
+    test_chunked(depth=300,pl_size=200000,wrbw=100,rdbw=100,il=150,chunks=[777,65536],seed=3)
+    test_monte_carlo(depth=64,pl_size=5000,wrbw=100,rdbw=101,il=32,trials=2000,seed=1)
+    test_result_cache(entries=20,maxBytes=1000)
+    test_exact(depth=64,pl_size=600,wrbw=100,rdbw=100,il=16,trials=20000,seed=5)
+    test_adaptive_monte_carlo(depth=40,pl_size=600,wrbw=100,rdbw=100,il=20,relError=0.1,seed=3)
+    test_rare_event(moderate=(30,1000,100,110,10),rare=(70,1500,100,120,1),trials=5000,seed=2)
+    test_depth_index(pl_size=1000,wrbw=100,rdbw=105,points=[(40,20),(60,5),(25,24),(120,90)],trials=10000,seed=4)
+    test_depth_solver(pl_size=2000,wrbw=110,rdbw=100,target=1e-2,trials=5000,seed=7)
+    test_depth_solver(pl_size=2000,wrbw=100,rdbw=110,target=1e-2,trials=5000,seed=7)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file